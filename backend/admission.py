@@ -0,0 +1,229 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from werkzeug.middleware.proxy_fix import ProxyFix
+from metrics import ADMISSION_QUEUE_WAIT, ADMISSION_QUEUE_DEPTH, ADMISSION_RUNNING, ADMISSION_REJECTIONS
+
+# Endpoints admitted through each class; every other endpoint is served without admission control
+ENDPOINT_CLASSES = {
+    "optimize_portfolio": "optimize",
+    "rebalance_portfolio": "optimize",
+    "revalue_user_portfolios": "optimize",
+    "stress_user_portfolios": "optimize",
+    "recommend_stocks": "recommend",
+    "stream_stock_recommendations": "recommend"
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries its HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status_code, retry_after, reason):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Ticket:
+    """An admitted request's slot; release() is idempotent"""
+
+    def __init__(self, admission_class, user_key):
+        self.admission_class = admission_class
+        self.user_key = user_key
+        self.started_at = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.admission_class._release(self)
+
+
+class AdmissionClass:
+    """At most max_concurrent requests of one class run at once; up to max_queue more wait in FIFO order
+
+    Each user (session user id, else client address) may hold at most
+    per_user running or waiting requests. Requests over the per-user cap are
+    rejected with 429, requests finding the queue full or waiting longer
+    than queue_timeout seconds with 503, both with a Retry-After estimated
+    from the queue depth and the recent service time. A waiting request
+    holds its WSGI worker thread, so with max_queue=0 (the from_env default)
+    requests finding every slot taken are rejected at once instead.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, per_user, queue_timeout=5.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self._queue = deque()
+        self._per_user = {}
+        # Exponentially weighted mean service time, for Retry-After estimates
+        self._service_time = 1.0
+        self._condition = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    def retry_after(self):
+        """Seconds until a new request would likely be admitted"""
+        return max(1, math.ceil((self.waiting + 1) * self._service_time / self.max_concurrent))
+
+    def _reject(self, message, status_code, reason):
+        ADMISSION_REJECTIONS.inc(**{"class": self.name, "reason": reason})
+        raise AdmissionRejected(message, status_code, self.retry_after(), reason)
+
+    def _update_gauges(self):
+        ADMISSION_QUEUE_DEPTH.set(self.waiting, **{"class": self.name})
+        ADMISSION_RUNNING.set(self.running, **{"class": self.name})
+
+    def acquire(self, user_key):
+        """Wait for a slot and return its Ticket; raises AdmissionRejected"""
+        enqueued_at = time.perf_counter()
+        with self._condition:
+            if self._per_user.get(user_key, 0) >= self.per_user:
+                self._reject(f"Too many concurrent {self.name} requests; at most {self.per_user} per user",
+                             429, "user_limit")
+            if self.running >= self.max_concurrent and self.waiting >= self.max_queue:
+                busy = f"{self.name} queue is full" if self.max_queue else f"all {self.name} slots are taken"
+                self._reject(f"Server busy: {busy}", 503, "queue_full")
+
+            waiter = object()
+            self._queue.append(waiter)
+            self._per_user[user_key] = self._per_user.get(user_key, 0) + 1
+            self._update_gauges()
+            deadline = enqueued_at + self.queue_timeout
+            try:
+                # FIFO: only the head of the queue takes a free slot
+                while self.running >= self.max_concurrent or self._queue[0] is not waiter:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._reject(f"Server busy: timed out waiting for a {self.name} slot", 503, "queue_timeout")
+                    self._condition.wait(remaining)
+            except AdmissionRejected:
+                self._queue.remove(waiter)
+                self._leave(user_key)
+                # The head may have changed
+                self._condition.notify_all()
+                raise
+            self._queue.popleft()
+            self.running += 1
+            self._update_gauges()
+            self._condition.notify_all()
+
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - enqueued_at, **{"class": self.name})
+        return Ticket(self, user_key)
+
+    def _leave(self, user_key):
+        count = self._per_user.get(user_key, 0) - 1
+        if count > 0:
+            self._per_user[user_key] = count
+        else:
+            self._per_user.pop(user_key, None)
+        self._update_gauges()
+
+    def _release(self, ticket):
+        with self._condition:
+            self.running -= 1
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - ticket.started_at)
+            self._leave(ticket.user_key)
+            self._condition.notify_all()
+
+    def to_dict(self):
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "per_user": self.per_user
+        }
+
+
+def fit_to_worker_threads(classes, available_threads):
+    """Shrink queues, then concurrency, until running plus waiting requests fit in available_threads
+
+    Every class keeps at least one running slot.
+    """
+    available_threads = max(available_threads, len(classes))
+    requested = {c.name: (c.max_concurrent, c.max_queue) for c in classes}
+    while sum(c.max_concurrent + c.max_queue for c in classes) > available_threads:
+        queued = [c for c in classes if c.max_queue > 0]
+        if queued:
+            max(queued, key=lambda c: c.max_queue).max_queue -= 1
+        else:
+            max(classes, key=lambda c: c.max_concurrent).max_concurrent -= 1
+    for c in classes:
+        if (c.max_concurrent, c.max_queue) != requested[c.name]:
+            print(f"Admission class {c.name} limited to {c.max_concurrent} running + {c.max_queue} waiting "
+                  f"to fit {available_threads} worker threads")
+
+
+def user_key(user_id, remote_addr):
+    """Per-user admission key: the logged-in user, or the client address for anonymous requests"""
+    return f"user:{user_id}" if user_id else f"ip:{remote_addr}"
+
+
+def trust_forwarded_for(app, proxy_count):
+    """Take the client address from X-Forwarded-For as set by proxy_count trusted reverse proxies
+
+    Behind a proxy every client arrives from the proxy's address, so anonymous
+    clients would share one per-user cap. Only the hops appended by the
+    trusted proxies are used; with proxy_count 0 the header is ignored, since
+    clients can forge it.
+    """
+    if proxy_count > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count)
+
+
+class AdmissionController:
+    """Routes requests of CPU-heavy or slow endpoints through their class's AdmissionClass"""
+
+    def __init__(self, classes, endpoint_classes=None, enabled=True):
+        self.classes = {admission_class.name: admission_class for admission_class in classes}
+        self.endpoint_classes = endpoint_classes if endpoint_classes is not None else ENDPOINT_CLASSES
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls):
+        """Classes sized from ADMISSION_<CLASS>_CONCURRENCY / _QUEUE / _PER_USER and ADMISSION_QUEUE_TIMEOUT
+
+        Queues default to 0 (reject at once rather than park worker threads).
+        When ADMISSION_WORKER_THREADS gives the WSGI threads per process, the
+        limits are shrunk so admitted requests leave ADMISSION_RESERVED_THREADS
+        (default 2) threads for the other endpoints.
+        """
+        def setting(name, default):
+            return int(os.getenv(name, default))
+
+        queue_timeout = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5))
+        # Solves are CPU-bound: by default one per core (at least 2)
+        optimize_concurrency = setting('ADMISSION_OPTIMIZE_CONCURRENCY', max(2, os.cpu_count() or 1))
+        # Recommendations mostly wait on Gemini and quote lookups
+        recommend_concurrency = setting('ADMISSION_RECOMMEND_CONCURRENCY', 8)
+        classes = [
+            AdmissionClass("optimize", optimize_concurrency, setting('ADMISSION_OPTIMIZE_QUEUE', 0),
+                           setting('ADMISSION_OPTIMIZE_PER_USER', 2), queue_timeout),
+            AdmissionClass("recommend", recommend_concurrency, setting('ADMISSION_RECOMMEND_QUEUE', 0),
+                           setting('ADMISSION_RECOMMEND_PER_USER', 2), queue_timeout)
+        ]
+        if os.getenv('ADMISSION_WORKER_THREADS'):
+            fit_to_worker_threads(classes, setting('ADMISSION_WORKER_THREADS', 0)
+                                  - setting('ADMISSION_RESERVED_THREADS', 2))
+        return cls(classes, enabled=os.getenv('ADMISSION_CONTROL', 'on') != 'off')
+
+    def admit(self, endpoint, user_key):
+        """Ticket for a request to the endpoint, or None when the endpoint is not admission-controlled"""
+        name = self.endpoint_classes.get(endpoint)
+        if not self.enabled or name is None:
+            return None
+        return self.classes[name].acquire(user_key)
+
+    def to_dict(self):
+        return {name: admission_class.to_dict() for name, admission_class in self.classes.items()}
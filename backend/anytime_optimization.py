@@ -0,0 +1,264 @@
+import time
+import threading
+import numpy as np
+import osqp
+from scipy import sparse
+from scipy.linalg import cho_factor, cho_solve
+from scipy.cluster.hierarchy import linkage, leaves_list
+from scipy.spatial.distance import squareform
+from metrics import STAGE_DURATION
+
+TIERS = ('equal_weight', 'hrp', 'closed_form', 'qp')
+
+# Heuristic solutions within this relative gap of the optimum skip the QP
+GAP_TOLERANCE = 1e-6
+QP_MAX_ITER = 20000
+# Like the regular solver, a long-only max-Sharpe optimum holding a position under
+# this weight is re-solved with 1%-50% per-asset bounds
+MIN_POSITION = 0.005
+
+# OSQP's setup (a KKT factorization) runs before its time limit is checked, so
+# the QP is only started when its setup is predicted to fit the remaining
+# budget. The prediction scales the closed-form tier's Cholesky time by the
+# setup/Cholesky ratio observed on this machine (initially a conservative guess).
+# Shared by concurrent requests, so it is read and updated under a lock.
+_qp_setup_ratio = 15.0
+_qp_setup_lock = threading.Lock()
+
+
+def weight_bounds(method, n_assets, min_allocation=False):
+    """(lower, upper) per-asset weight bounds of the problem each method solves
+
+    max_sharpe is long-only unless min_allocation is set; min_variance and
+    constrained max_sharpe keep the regular 1%-50% bounds, dropping the 1%
+    floor for baskets too large to honour it.
+    """
+    if method == "min_variance" or min_allocation:
+        return (0.01 if n_assets * 0.01 <= 1 else 0.0), 0.5
+    return 0.0, 1.0
+
+
+def project_to_bounds(values, lower, upper, iterations=100):
+    """Euclidean projection onto {lower <= w <= upper, sum(w) == 1} (bisection on the shift)"""
+    low, high = values.min() - upper, values.max() - lower
+    for _ in range(iterations):
+        shift = (low + high) / 2
+        if np.clip(values - shift, lower, upper).sum() > 1:
+            low = shift
+        else:
+            high = shift
+    weights = np.clip(values - (low + high) / 2, lower, upper)
+    return weights / weights.sum()
+
+
+def _best_vertex(gradient, lower, upper):
+    """Feasible point maximizing gradient @ w: fill the highest-gradient assets first"""
+    n_assets = len(gradient)
+    order = np.argsort(-gradient)
+    capacity = np.full(n_assets, upper - lower)
+    remaining = 1 - n_assets * lower
+    filled_before = np.cumsum(capacity) - capacity
+    vertex = np.full(n_assets, lower)
+    vertex[order] += np.clip(remaining - filled_before, 0, capacity)
+    return vertex
+
+
+class AnytimeProblem:
+    """Concave objective of a method over its bounded simplex, with bounds on the gap
+
+    max_sharpe maximizes mu @ w - 0.5 * w' cov w (the regular solver's
+    objective); min_variance maximizes -w' cov w. For a concave objective the
+    Frank-Wolfe gap max_s grad(w) @ (s - w) over the feasible set is an upper
+    bound on how far w is from the optimum, so every candidate is reported
+    with a certified optimality gap.
+    """
+
+    def __init__(self, mu, cov_matrix, method, min_allocation=False):
+        self.mu = np.asarray(mu, dtype=float)
+        self.cov = np.asarray(cov_matrix, dtype=float)
+        self.method = method
+        self.n_assets = len(self.mu)
+        self.lower, self.upper = weight_bounds(method, self.n_assets, min_allocation)
+
+    def objective(self, weights):
+        risk = weights @ self.cov @ weights
+        if self.method == "min_variance":
+            return -risk
+        return self.mu @ weights - 0.5 * risk
+
+    def gradient(self, weights):
+        if self.method == "min_variance":
+            return -2 * self.cov @ weights
+        return self.mu - self.cov @ weights
+
+    def gap(self, weights):
+        gradient = self.gradient(weights)
+        return max(0.0, float(gradient @ (_best_vertex(gradient, self.lower, self.upper) - weights)))
+
+    def project(self, weights):
+        return project_to_bounds(np.asarray(weights, dtype=float), self.lower, self.upper)
+
+
+def hrp_weights(cov_matrix):
+    """Hierarchical Risk Parity: inverse-variance allocation down a correlation clustering tree"""
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    variances = np.maximum(np.diag(cov_matrix), 1e-12)
+    stdev = np.sqrt(variances)
+    corr = np.clip(cov_matrix / np.outer(stdev, stdev), -1, 1)
+    distance = np.sqrt(np.maximum(0.5 * (1 - corr), 0))
+    np.fill_diagonal(distance, 0)
+    order = leaves_list(linkage(squareform(distance, checks=False), method='single'))
+
+    def cluster_variance(members):
+        inverse_variance = 1 / variances[members]
+        cluster_weights = inverse_variance / inverse_variance.sum()
+        return cluster_weights @ cov_matrix[np.ix_(members, members)] @ cluster_weights
+
+    weights = np.ones(len(variances))
+    clusters = [order]
+    while clusters:
+        split = []
+        for members in clusters:
+            if len(members) < 2:
+                continue
+            left, right = members[:len(members) // 2], members[len(members) // 2:]
+            left_variance, right_variance = cluster_variance(left), cluster_variance(right)
+            alpha = 1 - left_variance / (left_variance + right_variance)
+            weights[left] *= alpha
+            weights[right] *= 1 - alpha
+            split.extend([left, right])
+        clusters = split
+    return weights / weights.sum()
+
+
+def closed_form_weights(mu, cov_matrix, method):
+    """Optimum with only the budget constraint (weights may be negative or over the cap)"""
+    n_assets = len(mu)
+    factor = cho_factor(np.asarray(cov_matrix, dtype=float) + np.eye(n_assets) * 1e-10)
+    inv_ones = cho_solve(factor, np.ones(n_assets))
+    if method == "min_variance":
+        return inv_ones / inv_ones.sum()
+    inv_mu = cho_solve(factor, np.asarray(mu, dtype=float))
+    return inv_mu - (inv_mu.sum() - 1) / inv_ones.sum() * inv_ones
+
+
+def _solve_qp(problem, seconds, initial_weights, reference_seconds=None):
+    """OSQP on the bounded-simplex QP, warm-started, with the remaining budget as its time limit
+
+    OSQP is called directly: its time limit covers setup and factorization,
+    whereas the cvxpy compile step in front of it could not be bounded.
+    """
+    global _qp_setup_ratio
+    n_assets = problem.n_assets
+    if problem.method == "min_variance":
+        quadratic, linear = 2 * problem.cov, np.zeros(n_assets)
+    else:
+        quadratic, linear = problem.cov, -problem.mu
+    constraints = sparse.vstack([sparse.csc_matrix(np.ones((1, n_assets))), sparse.eye(n_assets)], format='csc')
+    lower = np.concatenate([[1.0], np.full(n_assets, problem.lower)])
+    upper = np.concatenate([[1.0], np.full(n_assets, problem.upper)])
+
+    solver = osqp.OSQP()
+    solver.setup(P=sparse.triu(sparse.csc_matrix(quadratic), format='csc'), q=linear, A=constraints,
+                 l=lower, u=upper, time_limit=max(seconds, 1e-3), max_iter=QP_MAX_ITER, verbose=False)
+    solver.warm_start(x=initial_weights)
+    result = solver.solve(raise_error=False)
+    if reference_seconds:
+        with _qp_setup_lock:
+            _qp_setup_ratio = 0.7 * _qp_setup_ratio + 0.3 * result.info.setup_time / reference_seconds
+    if result.x is None or not np.all(np.isfinite(result.x)):
+        return None, result.info.status
+    return problem.project(result.x), result.info.status
+
+
+def anytime_optimize(mu, cov_matrix, method, time_budget, start_time=None):
+    """Best feasible weights found within time_budget seconds, and how they were found
+
+    Tiers run cheapest first - equal weights, HRP, the projected closed form,
+    then the QP with OSQP's time limit set to the remaining budget - and stop
+    once the budget is spent or a candidate is provably optimal. As in the
+    regular solver, a max_sharpe result holding a position under 0.5% is
+    re-solved with 1%-50% bounds; its equal-weight tier always runs, so the
+    result honours those bounds even when the budget is spent. The returned
+    info names the winning tier and its optimality gap (absolute, in objective
+    units, and relative to the objective), with the per-tier breakdown.
+    """
+    start_time = start_time if start_time is not None else time.perf_counter()
+    deadline = start_time + time_budget
+
+    attempts = []
+    problem = AnytimeProblem(mu, cov_matrix, method)
+    objective, tier, weights, gap = _run_tiers(problem, deadline, attempts)
+    if method == "max_sharpe" and (weights < MIN_POSITION).any():
+        problem = AnytimeProblem(mu, cov_matrix, method, min_allocation=True)
+        objective, tier, weights, gap = _run_tiers(problem, deadline, attempts)
+
+    info = {
+        "tier": tier,
+        "optimality_gap": gap,
+        "relative_gap": gap / max(abs(objective), 1e-12),
+        "objective": objective,
+        "bounds": [problem.lower, problem.upper],
+        "time_budget": time_budget,
+        "elapsed": time.perf_counter() - start_time,
+        "tiers": attempts
+    }
+    return weights, info
+
+
+def _run_tiers(problem, deadline, attempts):
+    """Run the tiers on one problem until the deadline; returns the best (objective, tier, weights, gap)
+
+    Each tier's attempt is appended to attempts.
+    """
+    candidates = []
+    bounds = [problem.lower, problem.upper]
+
+    def remaining():
+        return deadline - time.perf_counter()
+
+    def record(tier, compute):
+        tier_start = time.perf_counter()
+        status = "ok"
+        try:
+            weights, status = compute()
+        except Exception as e:
+            print(f"Anytime tier {tier} failed: {e}")
+            weights, status = None, "error"
+        elapsed = time.perf_counter() - tier_start
+        STAGE_DURATION.observe(elapsed, stage=f"anytime_{tier}")
+        attempt = {"tier": tier, "status": status, "elapsed": elapsed, "bounds": bounds}
+        if weights is not None:
+            attempt["objective"] = float(problem.objective(weights))
+            attempt["optimality_gap"] = problem.gap(weights)
+            candidates.append((attempt["objective"], tier, weights, attempt["optimality_gap"]))
+        attempts.append(attempt)
+
+    def converged():
+        objective, _, _, gap = max(candidates, key=lambda c: c[0])
+        return gap <= GAP_TOLERANCE * max(abs(objective), 1e-12)
+
+    record("equal_weight", lambda: (problem.project(np.full(problem.n_assets, 1 / problem.n_assets)), "ok"))
+    heuristics = [
+        ("hrp", lambda: (problem.project(hrp_weights(problem.cov)), "ok")),
+        ("closed_form", lambda: (problem.project(closed_form_weights(problem.mu, problem.cov, problem.method)), "ok"))
+    ]
+    closed_form_seconds = None
+    for tier, compute in heuristics:
+        if remaining() <= 0 or converged():
+            break
+        record(tier, compute)
+        if tier == "closed_form" and "objective" in attempts[-1]:
+            closed_form_seconds = attempts[-1]["elapsed"]
+    if remaining() > 0 and not converged():
+        best_weights = max(candidates, key=lambda c: c[0])[2]
+        with _qp_setup_lock:
+            setup_ratio = _qp_setup_ratio
+        estimated_setup = setup_ratio * closed_form_seconds if closed_form_seconds else 0.0
+        if estimated_setup > remaining():
+            attempts.append({"tier": "qp", "status": "skipped", "elapsed": 0.0, "bounds": bounds,
+                             "estimated_setup": estimated_setup})
+        else:
+            record("qp", lambda: _solve_qp(problem, remaining(), best_weights, closed_form_seconds))
+
+    return max(candidates, key=lambda c: c[0])
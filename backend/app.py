@@ -1,28 +1,37 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from gemini import GeminiService
-from portfolio_optimizer import PortfolioOptimizer
-from stock_data_service import StockDataService
 from flask_sqlalchemy import SQLAlchemy
 from models import db 
 from auth import auth_bp
 from flask import session
-from models import db, User, Portfolio, PortfolioStock, ValidatedStock
+from models import db, User, Portfolio, PortfolioStock, ValidatedStock, ensure_indexes
+from database import configure_database
+from portfolio_queries import list_portfolios, parse_portfolio_payload, save_portfolios
+from optimization_pipeline import OptimizationError, parse_optimize_request, run_cached_optimization
+from result_cache import OptimizationResultCache
+from job_queue import LocalJobQueue, QueueFullError
+from metrics import registry, REQUEST_DURATION, IN_FLIGHT_REQUESTS
+from profiling import RequestProfiler
+from lazy_services import LazyService, OncePerProcess, warm_up
+from recommendation_stream import recommendation_payload, recommendation_events, format_event
+from admission import AdmissionController, AdmissionRejected, trust_forwarded_for, user_key
 import json
+import time
 
 load_dotenv()
 
 app = Flask(__name__)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///portfolio.db'
-db.init_app(app)
+# DATABASE_URL selects the database (SQLite file by default); see database.py
+configure_database(app)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback-key-for-development')
 
 # Initialize database tables
 with app.app_context():
     db.create_all()
+    ensure_indexes()
 
 app.register_blueprint(auth_bp, url_prefix="/auth")
 
@@ -32,17 +41,143 @@ CORS(app, origins=[
     "http://127.0.0.1:5173",  # Alternative React port
     "https://didactic-space-robot-jjrjxxp79rqrhpv7g-5173.app.github.dev",  # Codespaces frontend
     "https://optivest-60jv98i2l-davidpascuals-projects.vercel.app",  # Your Vercel URL
-], supports_credentials=True, allow_headers=['Content-Type'], methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+], supports_credentials=True, allow_headers=['Content-Type', 'X-Profile', 'X-Request-Id'],
+   expose_headers=['X-Request-Id'], methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
-# Initialize services
-gemini_service = GeminiService(os.getenv('GEMINI_API_KEY'))
-portfolio_optimizer = PortfolioOptimizer()
-stock_data_service = StockDataService()
+# Initialize services. They are built on first use or by the warm-up below, and
+# import their heavy dependencies (yfinance, cvxpy, scipy, Gemini) only then,
+# so importing the app and answering /api/health stay fast on a cold worker.
+def create_stock_data_service():
+    from stock_data_service import StockDataService
+    service = StockDataService()
+    # Sharpe ratios everywhere use the same background-refreshed risk-free rate. Its
+    # thread is started once the process serves requests, never at import
+    if start_process_threads.started:
+        service.risk_free_rates.start()
+    return service
+
+def create_stock_validator():
+    from stock_validator import StockValidator
+    return StockValidator(stock_data_service.provider, risk_free_rates=stock_data_service.risk_free_rates,
+                          price_store=stock_data_service.price_store)
+
+def create_portfolio_optimizer():
+    from portfolio_optimizer import PortfolioOptimizer
+    return PortfolioOptimizer(risk_free_rates=stock_data_service.risk_free_rates)
+
+def create_gemini_service():
+    from gemini import GeminiService, StubGenerativeModel
+    model = None
+    if os.getenv('GEMINI_MODEL') == 'stub':
+        # Local stand-in (load tests): answers from GEMINI_STUB_CATALOG after GEMINI_STUB_LATENCY seconds
+        model = StubGenerativeModel.from_file(os.getenv('GEMINI_STUB_CATALOG'),
+                                              latency=float(os.getenv('GEMINI_STUB_LATENCY', 0)))
+    return GeminiService(os.getenv('GEMINI_API_KEY'), validator=stock_validator.get(), model=model)
+
+def create_stress_engine():
+    from stress_scenarios import StressScenarioEngine
+    return StressScenarioEngine(stock_data_service.get())
+
+stock_data_service = LazyService("stock_data_service", create_stock_data_service)
+stock_validator = LazyService("stock_validator", create_stock_validator)
+portfolio_optimizer = LazyService("portfolio_optimizer", create_portfolio_optimizer)
+gemini_service = LazyService("gemini_service", create_gemini_service)
+stress_engine = LazyService("stress_engine", create_stress_engine)
+SERVICES = [stock_data_service, portfolio_optimizer, stock_validator, gemini_service, stress_engine]
+optimize_results = OptimizationResultCache(
+    max_entries=int(os.getenv('RESULT_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('RESULT_CACHE_TTL', 900))
+)
+# Job state is shared through JOB_STATE_DIR, so a job can be polled from any worker process
+optimize_jobs = LocalJobQueue(
+    max_workers=int(os.getenv('OPTIMIZE_JOB_WORKERS', 2)),
+    max_pending=int(os.getenv('OPTIMIZE_JOB_MAX_PENDING', 50)),
+    state_dir=os.getenv('JOB_STATE_DIR', os.path.join(app.instance_path, 'jobs'))
+)
+
+# Upper bound on portfolios accepted by one /api/portfolio/import request
+MAX_IMPORT_PORTFOLIOS = int(os.getenv('MAX_IMPORT_PORTFOLIOS', 200))
+
+# Bounded per-class queues and per-user caps for CPU-heavy and slow endpoints (ADMISSION_*)
+admission = AdmissionController.from_env()
+# Number of reverse proxies in front of the app (TRUSTED_PROXY_COUNT), so anonymous
+# clients are told apart by their forwarded address rather than the proxy's
+trust_forwarded_for(app, int(os.getenv('TRUSTED_PROXY_COUNT', 0)))
+
+# Opt-in per-request profiling (X-Profile header carrying PROFILE_TOKEN, or PROFILE_SAMPLE_RATE)
+request_profiler = RequestProfiler(app)
+
+def start_background_threads():
+    # Threads started at import would stay in the master under gunicorn --preload
+    # and not run in the forked workers, so each process starts its own
+    warm_up(SERVICES)
+    if stock_data_service.ready:
+        stock_data_service.risk_free_rates.start()
+
+start_process_threads = OncePerProcess(start_background_threads)
+
+# Eager services are built before the app is served; the rest are built off the
+# request path once each process is serving (WARM_UP: background, lazy or eager)
+if os.getenv('WARM_UP') == 'eager':
+    warm_up(SERVICES)
+
+@app.before_request
+def start_threads_on_first_request():
+    start_process_threads()
+
+@app.before_request
+def track_request_start():
+    g.request_start_time = time.perf_counter()
+    g.metrics_endpoint = request.endpoint or "unknown"
+    IN_FLIGHT_REQUESTS.inc(endpoint=g.metrics_endpoint)
+
+@app.before_request
+def admit_request():
+    """Wait for a slot of the endpoint's class, or reject with 429/503 and Retry-After"""
+    if request.method == 'OPTIONS':
+        return None
+    try:
+        g.admission_ticket = admission.admit(request.endpoint, user_key(session.get('user_id'), request.remote_addr))
+    except AdmissionRejected as e:
+        response = jsonify({"error": e.message, "retry_after": e.retry_after})
+        response.status_code = e.status_code
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+
+@app.after_request
+def hold_admission_until_closed(response):
+    # Streamed responses (SSE) do their work while the body is sent, so they keep their slot until it is closed
+    if response.is_streamed and g.get('admission_ticket') is not None:
+        response.call_on_close(g.pop('admission_ticket').release)
+    return response
+
+@app.teardown_request
+def track_request_end(exc):
+    # Other admitted requests release their slot once the response is built
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        ticket.release()
+    if 'request_start_time' in g:
+        IN_FLIGHT_REQUESTS.dec(endpoint=g.metrics_endpoint)
+        REQUEST_DURATION.observe(time.perf_counter() - g.request_start_time, endpoint=g.metrics_endpoint)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Expose stage latencies, counters and gauges in Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "message": "Portfolio Optimizer API is running"})
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """200 once every service is built (warm), 503 while the worker is still warming up"""
+    pending = [service._name for service in SERVICES if not service.ready]
+    if pending:
+        return jsonify({"status": "warming_up", "pending": pending}), 503
+    return jsonify({"status": "ready"})
+
 @app.route('/api/session/check', methods=['GET'])
 def check_session():
     user_id = session.get('user_id')
@@ -100,8 +235,7 @@ def recommend_stocks():
                 tried.append(company_to_try)
             if not stock_info:
                 return jsonify({"error": f"Could not find a valid stock for your input. Tried: {', '.join(tried)}"}), 404
-            from stock_validator import StockValidator
-            validator = StockValidator()
+            validator = stock_validator
             # Use the symbol from stock_info if available
             symbol = stock_info.get('symbol', symbol_to_try or company_to_try).upper()
             stock_dict = {
@@ -161,41 +295,8 @@ def recommend_stocks():
             for stock in recommendations:
                 # Get current price and market cap from stock data service
                 stock_info = stock_data_service.get_stock_info(stock['symbol'])
-                # Format price for display
-                if stock_info and stock_info['current_price']:
-                    try:
-                        price = float(stock_info['current_price'])
-                        formatted_price = f"${price:.2f}" if price > 0 else 'N/A'
-                    except (ValueError, TypeError):
-                        formatted_price = 'N/A'
-                else:
-                    formatted_price = 'N/A'
-                # Format market cap for display
-                if stock_info and stock_info['market_cap']:
-                    try:
-                        market_cap = float(stock_info['market_cap'])
-                        if market_cap > 1_000_000_000:
-                            formatted_market_cap = f"${market_cap/1_000_000_000:.1f}B"
-                        elif market_cap > 1_000_000:
-                            formatted_market_cap = f"${market_cap/1_000_000:.1f}M"
-                        else:
-                            formatted_market_cap = f"${market_cap:,.0f}"
-                    except (ValueError, TypeError):
-                        formatted_market_cap = 'N/A'
-                else:
-                    formatted_market_cap = 'N/A'
-                # Create a clean JSON-serializable copy
-                clean_stock = {
-                    'symbol': stock['symbol'],
-                    'name': stock['name'],
-                    'industry': stock['industry'],
-                    'description': stock['description'],
-                    'current_price': formatted_price,
-                    'market_cap': formatted_market_cap
-                }
-                # Add quality score if available
-                if 'quality_score' in stock:
-                    clean_stock['quality_score'] = float(stock['quality_score'])
+                # Create a clean JSON-serializable copy with display-formatted price and market cap
+                clean_stock = recommendation_payload(stock, stock_info)
                 json_safe_stocks.append(clean_stock)
             print(f"Returning {len(json_safe_stocks)} validated stocks")
             return jsonify({"stocks": json_safe_stocks})
@@ -210,104 +311,111 @@ def recommend_stocks():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stocks/recommend/stream', methods=['GET', 'POST'])
+def stream_stock_recommendations():
+    """Server-Sent Events stream of industry recommendations: candidates, each validated stock, final ranking"""
+    if request.method == 'POST':
+        selected_industries = (request.get_json(silent=True) or {}).get('industries', [])
+    else:
+        # EventSource can only GET: ?industries=Technology,Finance
+        selected_industries = [industry for industry in request.args.get('industries', '').split(',') if industry]
+    if not selected_industries:
+        return jsonify({"error": "Please select at least one industry"}), 400
+
+    def events():
+        for name, data in recommendation_events(selected_industries, gemini_service, stock_validator,
+                                                stock_data_service):
+            yield format_event(name, data)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/portfolio/optimize', methods=['POST'])
 def optimize_portfolio():
     """Optimize portfolio for selected stocks"""
     try:
-        import time
-        total_start_time = time.time()
-        
-        data = request.get_json()
-        selected_stocks = data.get('stocks', [])
-        investment_amount = data.get('investment_amount', 10000)
-        data_period = data.get('data_period', '2y')  # Default to 2 years
-        
-        print(f"Starting portfolio optimization request...")
-        print(f"Investment amount: ${investment_amount:,.2f}")
-        print(f"Selected stocks: {len(selected_stocks)}")
-        print(f"Data period: {data_period}")
-        
-        if not selected_stocks:
-            return jsonify({"error": "Please select at least 2 stocks"}), 400
-        
-        if len(selected_stocks) < 2:
-            return jsonify({"error": "Portfolio optimization requires at least 2 stocks"}), 400
-        
-        # Get historical data for optimization
-        symbols = [stock['symbol'] for stock in selected_stocks]
-        print(f"Symbols: {symbols}")
-        
-        data_start_time = time.time()
-        historical_data = stock_data_service.get_historical_data(symbols, period=data_period)
-        data_fetch_time = time.time() - data_start_time
-        print(f"Data fetch completed in {data_fetch_time:.2f} seconds")
-        
-        if historical_data.empty:
-            print("Historical data is empty")
-            return jsonify({"error": "Unable to fetch historical data for optimization. Please try again or select different stocks."}), 500
-        
-        print(f"Historical data shape: {historical_data.shape}")
-        print(f"Data columns: {historical_data.columns.tolist()}")
-        
-        # Check if we have enough data points
-        if len(historical_data) < 20:
-            return jsonify({"error": "Insufficient historical data for optimization. Need at least 20 data points."}), 400
-        
-        # Optimize portfolio
-        optimization_start_time = time.time()
-        optimal_weights = portfolio_optimizer.optimize_portfolio(historical_data)
-        optimization_time = time.time() - optimization_start_time
-        print(f"Portfolio optimization completed in {optimization_time:.2f} seconds")
-        
-        if optimal_weights is None or len(optimal_weights) == 0:
-            return jsonify({"error": "Portfolio optimization failed. Please try different stocks."}), 500
-        
-        # Generate explanation
-        explanation_start_time = time.time()
-        explanation = portfolio_optimizer.generate_explanation(
-            symbols, optimal_weights, historical_data
+        params = parse_optimize_request(request.get_json())
+        result, cache_key = run_cached_optimization(
+            params, stock_data_service, portfolio_optimizer, optimize_results
         )
-        explanation_time = time.time() - explanation_start_time
-        print(f"Explanation generated in {explanation_time:.2f} seconds")
-        
-        # Calculate investment allocation
-        allocations = []
-        for i, symbol in enumerate(symbols):
-            allocations.append({
-                "symbol": symbol,
-                "weight": float(optimal_weights[i]),
-                "amount": float(optimal_weights[i] * investment_amount),
-                "name": next((s['name'] for s in selected_stocks if s['symbol'] == symbol), symbol)
-            })
+        if cache_key is None:
+            return jsonify(result)
         
-        # Calculate risk metrics
-        metrics_start_time = time.time()
-        risk_metrics = portfolio_optimizer.calculate_risk_metrics(historical_data, optimal_weights)
-        metrics_time = time.time() - metrics_start_time
-        print(f"Risk metrics calculated in {metrics_time:.2f} seconds")
-        
-        total_time = time.time() - total_start_time
-        print(f"Total optimization request completed in {total_time:.2f} seconds")
-        
-        return jsonify({
-            "allocations": allocations,
-            "explanation": explanation,
-            "total_investment": investment_amount,
-            "risk_metrics": risk_metrics,
-            "performance_info": {
-                "total_time": f"{total_time:.2f}s",
-                "data_fetch_time": f"{data_fetch_time:.2f}s", 
-                "optimization_time": f"{optimization_time:.2f}s",
-                "explanation_time": f"{explanation_time:.2f}s",
-                "metrics_time": f"{metrics_time:.2f}s"
-            }
-        })
+        # Allocations only change when the basket, settings or price data change,
+        # so clients can revalidate with If-None-Match and get a 304
+        etag = optimize_results.make_etag(cache_key, params)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = jsonify(result)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
+    except OptimizationError as e:
+        return jsonify({"error": e.message}), e.status_code
     except Exception as e:
         print(f"Error in portfolio optimization: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Portfolio optimization failed: {str(e)}"}), 500
+
+@app.route('/api/portfolio/optimize/jobs', methods=['POST'])
+def submit_optimize_job():
+    """Queue an optimization and return its job id immediately"""
+    try:
+        params = parse_optimize_request(request.get_json())
+    except OptimizationError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid request: {str(e)}"}), 400
+
+    # Identical requests share one in-flight job
+    job_key = json.dumps(params, sort_keys=True)
+    try:
+        job, created = optimize_jobs.submit(
+            job_key,
+            lambda report: run_cached_optimization(
+                params, stock_data_service, portfolio_optimizer, optimize_results, progress=report
+            )[0]
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    response = jsonify({**job.to_dict(include_result=False), "deduplicated": not created})
+    response.headers['Location'] = f"/api/jobs/{job.id}"
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a job's status, stage, progress and (once finished) result"""
+    job = optimize_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Server-Sent Events stream of a job's progress, ending with its final state"""
+    if optimize_jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last_version = -1
+        while True:
+            job = optimize_jobs.wait_for_update(job_id, last_version)
+            if job is None:
+                return
+            if job.version != last_version:
+                last_version = job.version
+                event = "done" if job.finished else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict(include_result=job.finished))}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job.finished:
+                return
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
     
 
 @app.route('/api/portfolio/save', methods=['POST'])
@@ -321,57 +429,17 @@ def save_portfolio():
         return jsonify({"error": "User not found"}), 401
 
     try:
-        data = request.get_json()
-        portfolio_name = data.get('name', 'My Portfolio')
-        allocations = data.get('allocations', [])
-        projected_return = data.get('projected_return', 0)
-
-        if not allocations:
-            return jsonify({"error": "No allocations provided"}), 400
-
-        # Create new portfolio
-        new_portfolio = Portfolio(
-            user_id=user_id,
-            name=portfolio_name,
-            projected_return=projected_return
-        )
-        db.session.add(new_portfolio)
-        db.session.flush()  # Get the portfolio ID
-
-        # Add portfolio stocks
-        for allocation in allocations:
-            symbol = allocation.get('symbol')
-            weight = allocation.get('weight', 0)
-            name = allocation.get('name', symbol)
-
-            # Get or create validated stock entry
-            validated_stock = ValidatedStock.query.filter_by(symbol=symbol).first()
-            if not validated_stock:
-                # Create new validated stock entry
-                stock_info = stock_data_service.get_stock_info(symbol)
-                validated_stock = ValidatedStock(
-                    symbol=symbol,
-                    name=name,
-                    industry=stock_info.get('sector', 'Unknown') if stock_info else 'Unknown',
-                    current_price=stock_info.get('current_price', 0) if stock_info else 0,
-                    market_cap=stock_info.get('market_cap', 0) if stock_info else 0,
-                    quality_score=allocation.get('quality_score', 0)
-                )
-                db.session.add(validated_stock)
-
-            # Add portfolio stock
-            portfolio_stock = PortfolioStock(
-                portfolio_id=new_portfolio.id,
-                stock_symbol=symbol,
-                weight=weight
-            )
-            db.session.add(portfolio_stock)
+        try:
+            portfolio = parse_portfolio_payload(request.get_json())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
+        portfolio_id, portfolio_name = save_portfolios(user_id, [portfolio], stock_data_service)[0]
         db.session.commit()
         
         return jsonify({
             "message": "Portfolio saved successfully",
-            "portfolio_id": new_portfolio.id,
+            "portfolio_id": portfolio_id,
             "portfolio_name": portfolio_name
         }), 201
 
@@ -380,6 +448,44 @@ def save_portfolio():
         print(f"Error saving portfolio: {e}")
         return jsonify({"error": f"Failed to save portfolio: {str(e)}"}), 500
 
+@app.route('/api/portfolio/import', methods=['POST'])
+def import_portfolios():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 401
+
+    try:
+        data = request.get_json() or {}
+        payloads = data.get('portfolios', [])
+        if not payloads:
+            return jsonify({"error": "No portfolios provided"}), 400
+        if len(payloads) > MAX_IMPORT_PORTFOLIOS:
+            return jsonify({"error": f"At most {MAX_IMPORT_PORTFOLIOS} portfolios per import"}), 400
+
+        portfolios = []
+        for i, payload in enumerate(payloads):
+            try:
+                portfolios.append(parse_portfolio_payload(payload))
+            except ValueError as e:
+                return jsonify({"error": f"Portfolio {i}: {e}"}), 400
+
+        saved = save_portfolios(user_id, portfolios, stock_data_service)
+        db.session.commit()
+
+        return jsonify({
+            "message": f"Imported {len(saved)} portfolios",
+            "portfolios": [{"portfolio_id": portfolio_id, "portfolio_name": name} for portfolio_id, name in saved]
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing portfolios: {e}")
+        return jsonify({"error": f"Failed to import portfolios: {str(e)}"}), 500
+
 @app.route('/api/portfolio/list', methods=['GET'])
 def list_user_portfolios():
     user_id = session.get('user_id')
@@ -391,46 +497,146 @@ def list_user_portfolios():
         return jsonify({"error": "User not found"}), 401
 
     try:
-        portfolios = Portfolio.query.filter_by(user_id=user_id).all()
-        
-        portfolio_list = []
-        for portfolio in portfolios:
-            # Get portfolio stocks with their details
-            portfolio_stocks = []
-            for ps in portfolio.stocks:
-                validated_stock = ValidatedStock.query.filter_by(symbol=ps.stock_symbol).first()
-                if validated_stock:
-                    portfolio_stocks.append({
-                        "symbol": ps.stock_symbol,
-                        "name": validated_stock.name,
-                        "industry": validated_stock.industry,
-                        "weight": ps.weight,
-                        "quality_score": validated_stock.quality_score
-                    })
-                else:
-                    # Fallback if validated stock not found
-                    portfolio_stocks.append({
-                        "symbol": ps.stock_symbol,
-                        "name": ps.stock_symbol,
-                        "industry": "Unknown",
-                        "weight": ps.weight,
-                        "quality_score": 0
-                    })
-
-            portfolio_list.append({
-                "id": portfolio.id,
-                "name": portfolio.name,
-                "created_at": portfolio.created_at.isoformat() + "Z" if portfolio.created_at else None,
-                "projected_return": portfolio.projected_return,
-                "stocks": portfolio_stocks
-            })
-
-        return jsonify({"portfolios": portfolio_list})
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+        if limit is not None and not 1 <= limit <= 500:
+            return jsonify({"error": "limit must be between 1 and 500"}), 400
+
+        portfolio_list, next_cursor = list_portfolios(user_id, limit=limit, cursor=cursor)
+
+        return jsonify({"portfolios": portfolio_list, "next_cursor": next_cursor})
 
     except Exception as e:
         print(f"Error listing portfolios: {e}")
         return jsonify({"error": f"Failed to list portfolios: {str(e)}"}), 500
 
+@app.route('/api/portfolio/revalue', methods=['GET'])
+def revalue_user_portfolios():
+    """Current value, P&L and return since inception of every saved portfolio of the user"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    from revaluation_job import load_holdings, revalue_portfolios, DEFAULT_INVESTMENT_AMOUNT
+
+    investment_amount = request.args.get('investment_amount', DEFAULT_INVESTMENT_AMOUNT, type=float)
+    if investment_amount is None or investment_amount <= 0:
+        return jsonify({"error": "investment_amount must be a positive number"}), 400
+
+    try:
+        start_time = time.time()
+        revaluation = revalue_portfolios(load_holdings(user_id), stock_data_service,
+                                         investment_amount=investment_amount)
+        revaluation["performance_info"] = {"total_time": f"{time.time() - start_time:.2f}s"}
+        return jsonify(revaluation)
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error revaluing portfolios: {e}")
+        return jsonify({"error": f"Failed to revalue portfolios: {str(e)}"}), 500
+
+@app.route('/api/portfolio/<int:portfolio_id>/rebalance', methods=['POST'])
+def rebalance_portfolio(portfolio_id):
+    """Rebalance a saved portfolio with a turnover penalty and return the trade list"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).first()
+    if not portfolio:
+        return jsonify({"error": "Portfolio not found"}), 404
+
+    try:
+        data = request.get_json(silent=True) or {}
+        turnover_penalty = float(data.get('turnover_penalty', 0.005))
+        max_turnover = float(data.get('max_turnover', 0.5))
+        data_period = data.get('data_period', '2y')
+        portfolio_value = data.get('portfolio_value')
+        apply = bool(data.get('apply', False))
+
+        if turnover_penalty < 0 or not 0 <= max_turnover <= 2:
+            return jsonify({"error": "turnover_penalty must be >= 0 and max_turnover between 0 and 2"}), 400
+
+        symbols = [ps.stock_symbol for ps in portfolio.stocks]
+        if len(symbols) < 2:
+            return jsonify({"error": "Rebalancing requires at least 2 stocks"}), 400
+        current_weights = [ps.weight for ps in portfolio.stocks]
+
+        # Real prices only: weights may be persisted, so mock data must never back them
+        historical_data = stock_data_service.get_symbol_histories(symbols, period=data_period)
+        missing = [symbol for symbol in symbols
+                   if symbol not in historical_data.columns or historical_data[symbol].isna().all()]
+        if missing:
+            return jsonify({"error": f"No historical data for: {', '.join(missing)}"}), 503
+        historical_data = historical_data[symbols].dropna()
+        if len(historical_data) < 20:
+            return jsonify({"error": "Insufficient historical data for rebalancing."}), 400
+
+        target_weights = portfolio_optimizer.rebalance_portfolio(
+            historical_data, current_weights,
+            turnover_penalty=turnover_penalty, max_turnover=max_turnover
+        )
+        trades = portfolio_optimizer.generate_trade_list(
+            symbols, current_weights, target_weights,
+            portfolio_value=float(portfolio_value) if portfolio_value is not None else None
+        )
+
+        if apply:
+            for ps, target in zip(portfolio.stocks, target_weights):
+                ps.weight = float(target)
+            db.session.commit()
+
+        return jsonify({
+            "portfolio_id": portfolio.id,
+            "applied": apply,
+            "turnover": float(sum(abs(t["trade_weight"]) for t in trades)),
+            "target_weights": [
+                {"symbol": symbol, "weight": float(weight)} for symbol, weight in zip(symbols, target_weights)
+            ],
+            "trades": trades
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error rebalancing portfolio: {e}")
+        return jsonify({"error": f"Failed to rebalance portfolio: {str(e)}"}), 500
+
+@app.route('/api/stress/scenarios', methods=['GET'])
+def list_stress_scenarios():
+    """List the named stress scenarios"""
+    return jsonify({"scenarios": stress_engine.list_scenarios()})
+
+@app.route('/api/portfolio/stress', methods=['GET'])
+def stress_user_portfolios():
+    """Apply every stress scenario to every saved portfolio of the current user"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    try:
+        scenario_ids = request.args.get('scenarios')
+        scenario_ids = scenario_ids.split(',') if scenario_ids else None
+        unknown = [sid for sid in scenario_ids or [] if sid not in stress_engine.scenarios]
+        if unknown:
+            return jsonify({"error": f"Unknown scenarios: {', '.join(unknown)}"}), 400
+
+        from stress_scenarios import load_portfolio_weights
+        portfolio_weights, industries = load_portfolio_weights(user_id)
+        results = stress_engine.run(portfolio_weights, industries, scenario_ids)
+
+        return jsonify({
+            "scenarios": stress_engine.list_scenarios() if not scenario_ids else [
+                s for s in stress_engine.list_scenarios() if s["id"] in scenario_ids
+            ],
+            "portfolios": [
+                {"portfolio_id": portfolio_id, "results": scenario_results}
+                for portfolio_id, scenario_results in results.items()
+            ]
+        })
+
+    except Exception as e:
+        print(f"Error running stress scenarios: {e}")
+        return jsonify({"error": f"Failed to run stress scenarios: {str(e)}"}), 500
 
 
 if __name__ == '__main__':
@@ -0,0 +1,252 @@
+"""Optimizer micro-benchmarks: scaling curves per phase, checked against a stored baseline
+
+Sweeps basket size at a fixed history length and history length at a fixed
+basket size (or the full grid with --grid) on synthetic prices, for each
+method. Every run of PortfolioOptimizer is split into phases:
+
+    moments       estimate_moments
+    build         problem construction and cvxpy compilation (everything
+                  in optimize_portfolio that is neither moments nor solve)
+    solve         time spent in the solvers (cvxpy solves less their
+                  compilation; methods that do not use cvxpy count here whole)
+    risk_metrics  calculate_risk_metrics
+    explanation   generate_explanation
+
+Medians are compared with a baseline report. A phase regresses when it is
+slower than the baseline by more than --tolerance (relative) and --min-delta
+(seconds). Baseline timings are first scaled by a fixed numpy calibration
+workload, so baselines recorded on another machine stay usable. Any
+regression exits 1.
+
+    python benchmarks/bench_optimizer.py                         # compare with the stored baseline
+    python benchmarks/bench_optimizer.py --save-baseline          # re-record it
+    python benchmarks/bench_optimizer.py --methods max_sharpe --assets 50,500 --days 250 --grid --output run.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import contextlib
+import numpy as np
+import cvxpy as cp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from synthetic_market import SyntheticMarket
+from portfolio_optimizer import PortfolioOptimizer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'bench_optimizer.json')
+PHASES = ('moments', 'build', 'solve', 'risk_metrics', 'explanation')
+# Fixed price history end, so every run sees the same data
+END_DATE = '2024-12-31'
+RISK_FREE_RATE = 0.04
+
+
+def calibrate(repeats=7):
+    """Median time of a fixed dense linear-algebra workload, a proxy for machine speed"""
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((400, 400))
+    spd = a @ a.T + 400 * np.eye(400)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(10):
+            np.linalg.cholesky(spd)
+            spd @ a
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+class PhaseRecorder:
+    """Times the phases of one optimize_portfolio call by wrapping estimate_moments and cvxpy solves"""
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+        self.moments = 0.0
+        self.solve = 0.0
+        self.cvxpy_solves = 0
+
+    def __enter__(self):
+        estimate_moments = self.optimizer.estimate_moments
+        problem_solve = cp.Problem.solve
+        recorder = self
+
+        def timed_moments(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return estimate_moments(*args, **kwargs)
+            finally:
+                recorder.moments += time.perf_counter() - start
+
+        def timed_solve(problem, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return problem_solve(problem, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                recorder.solve += max(elapsed - (problem.compilation_time or 0.0), 0.0)
+                recorder.cvxpy_solves += 1
+
+        self._restore = problem_solve
+        self.optimizer.estimate_moments = timed_moments
+        cp.Problem.solve = timed_solve
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        del self.optimizer.estimate_moments
+        cp.Problem.solve = self._restore
+
+
+def run_case(optimizer, prices, method, time_budget=None):
+    """Phase timings (seconds) of one optimization, its risk metrics and explanation"""
+    symbols = list(prices.columns)
+    with contextlib.redirect_stdout(io.StringIO()):
+        with PhaseRecorder(optimizer) as recorder:
+            start = time.perf_counter()
+            weights = optimizer.optimize_portfolio(prices, method=method, risk_free_rate=RISK_FREE_RATE,
+                                                   time_budget=time_budget)
+            total = time.perf_counter() - start
+        solve = recorder.solve if recorder.cvxpy_solves else total - recorder.moments
+
+        start = time.perf_counter()
+        optimizer.calculate_risk_metrics(prices, weights, risk_free_rate=RISK_FREE_RATE)
+        risk_metrics = time.perf_counter() - start
+
+        start = time.perf_counter()
+        optimizer.generate_explanation(symbols, weights, prices)
+        explanation = time.perf_counter() - start
+
+    return {
+        "moments": recorder.moments,
+        "build": max(total - recorder.moments - solve, 0.0),
+        "solve": solve,
+        "risk_metrics": risk_metrics,
+        "explanation": explanation
+    }
+
+
+def cases(args):
+    if args.grid:
+        return [(n_assets, n_days) for n_assets in args.assets for n_days in args.days]
+    curve = [(n_assets, args.fixed_days) for n_assets in args.assets]
+    curve += [(args.fixed_assets, n_days) for n_days in args.days if (args.fixed_assets, n_days) not in curve]
+    return curve
+
+
+def run_suite(args):
+    market = SyntheticMarket(seed=args.seed)
+    optimizer = PortfolioOptimizer()
+    universe = [f"B{i:05d}" for i in range(max(n for n, _ in cases(args)))]
+    history = market.generate(universe, period='max', end=END_DATE)
+
+    results = []
+    for method in args.methods:
+        for n_assets, n_days in cases(args):
+            if n_days > len(history):
+                print(f"Skipping {n_days} days: the synthetic history has {len(history)} bars")
+                continue
+            prices = history.iloc[-n_days:, :n_assets]
+            # Untimed run: first-call costs (imports, solver setup caches) are not part of the curve
+            run_case(optimizer, prices, method, args.time_budget)
+            runs = [run_case(optimizer, prices, method, args.time_budget) for _ in range(args.repeats)]
+            phases = {phase: {"median_s": statistics.median(run[phase] for run in runs),
+                              "min_s": min(run[phase] for run in runs)} for phase in PHASES}
+            results.append({"method": method, "n_assets": n_assets, "n_days": n_days, "phases": phases})
+            print(f"{method:<13} {n_assets:>5} assets {n_days:>5} days  " +
+                  "  ".join(f"{phase} {phases[phase]['median_s'] * 1000:8.2f}ms" for phase in PHASES))
+    return results
+
+
+def compare(report, baseline, tolerance, min_delta, normalize=True):
+    """Phases slower than the (calibration-scaled) baseline beyond both thresholds"""
+    scale = 1.0
+    if normalize and baseline.get("calibration_s") and report.get("calibration_s"):
+        scale = report["calibration_s"] / baseline["calibration_s"]
+    expected_by_case = {(case["method"], case["n_assets"], case["n_days"]): case["phases"]
+                        for case in baseline.get("results", [])}
+
+    regressions = []
+    compared = 0
+    for case in report["results"]:
+        expected_phases = expected_by_case.get((case["method"], case["n_assets"], case["n_days"]))
+        if not expected_phases:
+            continue
+        for phase, timing in case["phases"].items():
+            if phase not in expected_phases:
+                continue
+            compared += 1
+            expected = expected_phases[phase]["median_s"] * scale
+            actual = timing["median_s"]
+            if actual > expected * (1 + tolerance) and actual - expected > min_delta:
+                regressions.append({"method": case["method"], "n_assets": case["n_assets"],
+                                    "n_days": case["n_days"], "phase": phase, "expected_s": expected,
+                                    "actual_s": actual, "ratio": actual / expected if expected else float('inf')})
+    return regressions, compared, scale
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', type=lambda text: text.split(','), default=['max_sharpe', 'min_variance'],
+                        help="Comma-separated optimize_portfolio methods")
+    parser.add_argument('--assets', type=parse_ints, default=[2, 10, 50, 200, 500, 1000, 2000])
+    parser.add_argument('--days', type=parse_ints, default=[60, 250, 1000, 2500, 5000])
+    parser.add_argument('--fixed-days', type=int, default=1000, help="History length of the basket-size curve")
+    parser.add_argument('--fixed-assets', type=int, default=50, help="Basket size of the history-length curve")
+    parser.add_argument('--grid', action='store_true', help="Full assets x days grid instead of two curves")
+    parser.add_argument('--time-budget', type=float, help="Pass a time budget (anytime mode) to every optimization")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Write this run as the baseline and exit 0")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed relative slowdown per phase")
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help="Slowdowns smaller than this (seconds) never count as regressions")
+    parser.add_argument('--no-normalize', action='store_true', help="Compare raw timings, without calibration")
+    parser.add_argument('--output', help="Write this run's results as JSON to this path")
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    report = {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "calibration_s": calibration,
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ('baseline', 'save_baseline', 'output')},
+        "results": run_suite(args)
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions, compared, scale = compare(report, baseline, args.tolerance, args.min_delta,
+                                           normalize=not args.no_normalize)
+    print(f"\nCompared {compared} phase timings with {args.baseline} (baseline scaled by {scale:.2f})")
+    if regressions:
+        print(f"{len(regressions)} regression(s):")
+        for r in regressions:
+            print(f"  {r['method']} {r['n_assets']} assets {r['n_days']} days {r['phase']}: "
+                  f"{r['actual_s'] * 1000:.2f}ms vs {r['expected_s'] * 1000:.2f}ms ({r['ratio']:.2f}x)")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
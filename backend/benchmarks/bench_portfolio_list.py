@@ -0,0 +1,139 @@
+"""Benchmark /api/portfolio/list query count and latency on a seeded SQLite database
+
+Seeds users with many portfolios, then lists each user's portfolios with the
+previous per-holding lookup (N+1) and with portfolio_queries.list_portfolios,
+reporting SQL statements issued and latency for both.
+
+    python benchmarks/bench_portfolio_list.py --users 20 --portfolios 50 --stocks 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event, insert
+from models import db, User, Portfolio, PortfolioStock, ValidatedStock, ensure_indexes
+from portfolio_queries import list_portfolios
+
+
+def seed(n_users, n_portfolios, n_stocks, n_symbols):
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    db.session.execute(insert(ValidatedStock), [
+        {"symbol": symbol, "name": f"Stock {symbol}", "industry": "Technology", "quality_score": 80.0}
+        for symbol in symbols
+    ])
+    db.session.execute(insert(User), [
+        {"username": f"user{u}", "password_hash": "x"} for u in range(n_users)
+    ])
+    user_ids = [user.id for user in User.query.all()]
+    db.session.execute(insert(Portfolio), [
+        {"user_id": user_id, "name": f"Portfolio {p}", "projected_return": 0.1}
+        for user_id in user_ids for p in range(n_portfolios)
+    ])
+    portfolio_ids = [row[0] for row in db.session.query(Portfolio.id).all()]
+    db.session.execute(insert(PortfolioStock), [
+        {"portfolio_id": portfolio_id, "stock_symbol": symbols[(portfolio_id * 7 + s) % n_symbols],
+         "weight": 1.0 / n_stocks}
+        for portfolio_id in portfolio_ids for s in range(n_stocks)
+    ])
+    db.session.commit()
+    return user_ids
+
+
+def legacy_list(user_id):
+    """The list endpoint before eager loading: lazy holdings plus one lookup per holding"""
+    result = []
+    for portfolio in Portfolio.query.filter_by(user_id=user_id).all():
+        stocks = []
+        for ps in portfolio.stocks:
+            validated_stock = ValidatedStock.query.filter_by(symbol=ps.stock_symbol).first()
+            stocks.append({
+                "symbol": ps.stock_symbol,
+                "name": validated_stock.name if validated_stock else ps.stock_symbol,
+                "weight": ps.weight
+            })
+        result.append({"id": portfolio.id, "stocks": stocks})
+    return result
+
+
+def paginated_list(user_id, page_size):
+    portfolios, cursor = list_portfolios(user_id, limit=page_size)
+    while cursor is not None:
+        page, cursor = list_portfolios(user_id, limit=page_size, cursor=cursor)
+        portfolios.extend(page)
+    return portfolios
+
+
+def measure(fn, user_ids, query_counter):
+    latencies = []
+    queries = []
+    for user_id in user_ids:
+        db.session.expire_all()
+        query_counter["count"] = 0
+        start = time.perf_counter()
+        fn(user_id)
+        latencies.append(time.perf_counter() - start)
+        queries.append(query_counter["count"])
+    latencies.sort()
+    return {
+        "queries_per_call": statistics.mean(queries),
+        "latency_mean_ms": statistics.mean(latencies) * 1000,
+        "latency_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--portfolios', type=int, default=50, help="Portfolios per user")
+    parser.add_argument('--stocks', type=int, default=10, help="Holdings per portfolio")
+    parser.add_argument('--symbols', type=int, default=500, help="Size of the symbol universe")
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            ensure_indexes()
+            seed_start = time.perf_counter()
+            user_ids = seed(args.users, args.portfolios, args.stocks, args.symbols)
+            print(f"Seeded {len(user_ids)} users x {args.portfolios} portfolios x {args.stocks} stocks "
+                  f"in {time.perf_counter() - seed_start:.2f} seconds")
+
+            query_counter = {"count": 0}
+
+            @event.listens_for(db.engine, "before_cursor_execute")
+            def count_query(*_):
+                query_counter["count"] += 1
+
+            results = {
+                "config": vars(args),
+                "legacy_n_plus_1": measure(legacy_list, user_ids, query_counter),
+                "eager_loaded": measure(lambda user_id: list_portfolios(user_id), user_ids, query_counter),
+                "eager_loaded_paginated": measure(lambda user_id: paginated_list(user_id, args.page_size),
+                                                  user_ids, query_counter)
+            }
+
+    for name in ("legacy_n_plus_1", "eager_loaded", "eager_loaded_paginated"):
+        r = results[name]
+        print(f"{name:<24} {r['queries_per_call']:>8.1f} queries  "
+              f"mean {r['latency_mean_ms']:>8.2f} ms  p95 {r['latency_p95_ms']:>8.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
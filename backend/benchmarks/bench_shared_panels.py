@@ -0,0 +1,105 @@
+"""Compare per-worker memory for a shared price panel against private copies
+
+Publishes a synthetic (symbols x dates) panel, then starts worker processes
+that each read every symbol's full history either through SharedPanelStore
+views ("shared") or by loading their own copy ("private"). Reports each
+worker's proportional set size (PSS, Linux only), which splits shared pages
+between the processes mapping them.
+
+    python benchmarks/bench_shared_panels.py --workers 1 2 4 8 --symbols 3000 --days 2520
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_panels import SharedPanelStore
+
+
+def pss_mb():
+    """Proportional set size of this process in MB"""
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run_worker(panel_dir, mode, ready, go, results):
+    store = SharedPanelStore(panel_dir)
+    symbols = store.symbols()
+    baseline = pss_mb()
+
+    if mode == "shared":
+        frame = store.get_prices(symbols)
+    else:
+        frame = pd.DataFrame(np.array(store._load("daily")["array"]).T, columns=symbols)
+    # Touch every price so all pages are resident
+    checksum = float(np.nansum([frame[symbol].to_numpy().sum(dtype=np.float64) for symbol in symbols]))
+
+    # Measure once every worker has its data resident, so shared pages are split between all of them
+    ready.put(True)
+    go.wait()
+    results.put({"pss_mb": pss_mb(), "baseline_mb": baseline, "checksum": checksum})
+
+
+def measure(panel_dir, mode, n_workers):
+    context = multiprocessing.get_context("spawn")
+    ready, results, go = context.Queue(), context.Queue(), context.Event()
+    workers = [context.Process(target=run_worker, args=(panel_dir, mode, ready, go, results)) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.get()
+    go.set()
+    worker_results = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        "workers": n_workers,
+        "total_pss_mb": sum(r["pss_mb"] for r in worker_results),
+        "data_pss_mb_per_worker": float(np.mean([r["pss_mb"] - r["baseline_mb"] for r in worker_results]))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--symbols', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=2520)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=args.days)
+    prices = pd.DataFrame(
+        100 * np.cumprod(1 + rng.normal(0.0003, 0.01, size=(args.days, args.symbols)).astype(np.float32), axis=0),
+        index=dates, columns=[f"S{i:05d}" for i in range(args.symbols)]
+    )
+    panel_mb = prices.size * 4 / 2**20
+
+    results = {"config": vars(args), "panel_mb": panel_mb, "shared": [], "private": []}
+    with tempfile.TemporaryDirectory() as panel_dir:
+        SharedPanelStore(panel_dir).publish(prices)
+        del prices
+        print(f"Panel: {args.symbols} symbols x {args.days} days = {panel_mb:.1f} MB float32")
+        for mode in ("shared", "private"):
+            for n_workers in args.workers:
+                result = measure(panel_dir, mode, n_workers)
+                results[mode].append(result)
+                print(f"{mode:<8} workers={n_workers:<3} total PSS {result['total_pss_mb']:>8.1f} MB  "
+                      f"data per worker {result['data_pss_mb_per_worker']:>7.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
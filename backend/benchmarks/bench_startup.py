@@ -0,0 +1,109 @@
+"""Measure cold-start cost: app import time and time to the first /api/health response
+
+Every run is a fresh interpreter (a cold worker) against a scratch database
+and price store, so the tracked instance/ files are never touched. With
+WARM_UP=background it also reports how long the services take to become
+ready (/api/ready). Exits non-zero when a median exceeds its limit, so it can
+gate CI against import-time regressions.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --warm-up eager
+    python benchmarks/bench_startup.py --max-import 1.0 --max-first-health 1.5 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+status = client.get('/api/health').status_code
+first_health = time.perf_counter()
+ready = None
+if {wait_ready}:
+    while client.get('/api/ready').status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter() - start
+heavy = sorted(name for name in ('numpy', 'pandas', 'scipy', 'cvxpy', 'yfinance', 'google.generativeai')
+               if name in sys.modules)
+print(json.dumps({{"import": imported - start, "first_health": first_health - start, "health_status": status,
+                  "ready": ready, "heavy_modules_loaded": heavy}}))
+"""
+
+
+def run_once(warm_up, scratch_dir, wait_ready):
+    env = dict(os.environ)
+    env.setdefault('GEMINI_API_KEY', 'benchmark')
+    env['WARM_UP'] = warm_up
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch_dir, 'startup.db')}"
+    env['PRICE_STORE_DIR'] = os.path.join(scratch_dir, 'price_store')
+    env['SHARED_PANEL_DIR'] = os.path.join(scratch_dir, 'shared_panels')
+
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD.format(wait_ready=wait_ready)], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    process_time = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = process_time
+    return result
+
+
+def summarize(runs, key):
+    values = [run[key] for run in runs if run[key] is not None]
+    if not values:
+        return None
+    return {"median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warm-up', default='lazy', choices=['background', 'lazy', 'eager'],
+                        help="WARM_UP mode of the measured app")
+    parser.add_argument('--max-import', type=float, help="Fail if the median import time exceeds this (seconds)")
+    parser.add_argument('--max-first-health', type=float,
+                        help="Fail if the median time to the first health response exceeds this (seconds)")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        # One untimed run compiles bytecode and creates the scratch database
+        run_once(args.warm_up, scratch_dir, False)
+        runs = [run_once(args.warm_up, scratch_dir, args.warm_up == 'background') for _ in range(args.runs)]
+
+    results = {
+        "warm_up": args.warm_up,
+        "runs": args.runs,
+        "import_s": summarize(runs, "import"),
+        "first_health_s": summarize(runs, "first_health"),
+        "ready_s": summarize(runs, "ready"),
+        "process_s": summarize(runs, "process"),
+        "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"]
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.max_import is not None and results["import_s"]["median"] > args.max_import:
+        failures.append(f"import {results['import_s']['median']:.3f}s > {args.max_import}s")
+    if args.max_first_health is not None and results["first_health_s"]["median"] > args.max_first_health:
+        failures.append(f"first health {results['first_health_s']['median']:.3f}s > {args.max_first_health}s")
+    if failures:
+        print("Startup regression: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
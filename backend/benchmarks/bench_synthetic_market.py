@@ -0,0 +1,56 @@
+"""Time the synthetic market generator at scale
+
+    python benchmarks/bench_synthetic_market.py --symbols 5000 --period max
+    python benchmarks/bench_synthetic_market.py --fixtures fixtures/ --symbols 500 --period 2y
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_market import SyntheticMarket
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--period', default='max', help="Provider period; 'max' is 20 years")
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', help="Also write replay-provider fixtures for the symbols to this directory")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    market = SyntheticMarket(seed=args.seed)
+    symbols = [f"S{i:05d}" for i in range(args.symbols)]
+    market.generate(symbols[:10], period=args.period, interval=args.interval)
+
+    results = {"config": vars(args)}
+    for dtype in (np.float32, np.float64):
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            prices = market.generate(symbols, period=args.period, interval=args.interval, dtype=dtype)
+            timings.append(time.perf_counter() - start)
+        results[dtype.__name__] = {"shape": list(prices.shape), "best_s": min(timings), "mean_s": float(np.mean(timings))}
+        print(f"{dtype.__name__}: {prices.shape[1]} symbols x {prices.shape[0]} bars "
+              f"best {min(timings):.3f}s mean {np.mean(timings):.3f}s")
+        del prices
+
+    if args.fixtures:
+        start = time.perf_counter()
+        market.write_fixtures(symbols, args.fixtures, period=args.period)
+        print(f"Wrote fixtures to {args.fixtures} in {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""End-to-end HTTP load test of the API with local stand-ins for Gemini and market data
+
+Boots the app in a subprocess (threaded werkzeug server) against a scratch
+database, with the replay market-data provider serving synthetic fixtures
+and the stub Gemini model, each with configurable latency. Virtual users
+then register, and drive a weighted mix of recommend / optimize / save / list
+requests for the run duration at the given concurrency. The report gives
+per-endpoint p50/p95/p99 latency, throughput, status codes and errors as
+JSON, so runs can be compared over time (--compare).
+
+    python benchmarks/loadtest.py --concurrency 8 --duration 30 --output loadtest.json
+    python benchmarks/loadtest.py --provider-latency 0.2 --gemini-latency 1.5 --mix optimize=6,list=3,save=1
+    python benchmarks/loadtest.py --compare loadtest.json --output loadtest-new.json
+    python benchmarks/loadtest.py --url http://localhost:5000 --prepare-only fixtures/   # external server
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from synthetic_market import SyntheticMarket, KNOWN_SYMBOLS, SECTORS
+
+DEFAULT_MIX = "optimize=5,list=3,save=2,recommend=1"
+PERIODS = ['1y', '2y']
+
+SERVER = """
+import os
+from werkzeug.serving import make_server
+import app
+make_server('127.0.0.1', int(os.environ['LOADTEST_PORT']), app.app, threaded=True).serve_forever()
+"""
+
+
+def build_universe(market, symbols_per_sector):
+    """Symbols grouped by the synthetic market's sectors: the well-known ones plus generated tickers"""
+    catalog = {sector: [] for sector in SECTORS}
+    candidates = list(KNOWN_SYMBOLS) + [f"L{i:03d}" for i in range(symbols_per_sector * len(SECTORS) * 3)]
+    for symbol in candidates:
+        sector = market.sector_of(symbol)
+        if len(catalog[sector]) < symbols_per_sector:
+            catalog[sector].append({
+                "symbol": symbol,
+                "name": f"{symbol} Corp.",
+                "description": f"Synthetic {sector.lower()} company for load testing.",
+                "industry": sector
+            })
+    return catalog
+
+
+def prepare(work_dir, args):
+    """Write replay fixtures and the stub Gemini catalog; returns the app's environment"""
+    market = SyntheticMarket(seed=args.seed)
+    catalog = build_universe(market, args.symbols_per_sector)
+    symbols = [stock["symbol"] for stocks in catalog.values() for stock in stocks]
+    fixture_dir = os.path.join(work_dir, 'fixtures')
+    market.write_fixtures(symbols, fixture_dir, period='5y')
+    catalog_path = os.path.join(work_dir, 'gemini_catalog.json')
+    with open(catalog_path, 'w') as f:
+        json.dump(catalog, f)
+
+    env = {
+        'MARKET_DATA_PROVIDER': 'replay',
+        'REPLAY_FIXTURE_DIR': fixture_dir,
+        'REPLAY_LATENCY': str(args.provider_latency),
+        'REPLAY_LATENCY_JITTER': str(args.provider_latency / 2),
+        'REPLAY_ERROR_RATE': str(args.provider_error_rate),
+        'REPLAY_SEED': str(args.seed),
+        'GEMINI_MODEL': 'stub',
+        'GEMINI_STUB_CATALOG': catalog_path,
+        'GEMINI_STUB_LATENCY': str(args.gemini_latency),
+        'GEMINI_API_KEY': 'loadtest',
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'loadtest.db')}",
+        'PRICE_STORE_DIR': os.path.join(work_dir, 'price_store'),
+        'SHARED_PANEL_DIR': os.path.join(work_dir, 'shared_panels'),
+        'WARM_UP': 'eager'
+    }
+    return env, catalog
+
+
+def start_server(env, log_path):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server_env = dict(os.environ, **env, LOADTEST_PORT=str(port))
+    log = open(log_path, 'w')
+    process = subprocess.Popen([sys.executable, '-c', SERVER], cwd=BACKEND_DIR, env=server_env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def wait_until_ready(base_url, timeout=180):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/ready", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} was not ready within {timeout}s")
+
+
+class VirtualUser:
+    """One logged-in client issuing a weighted mix of requests back to back"""
+
+    def __init__(self, base_url, user_index, catalog, mix, rng, timeout):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.catalog = catalog
+        self.symbols = [stock for stocks in catalog.values() for stock in stocks]
+        self.endpoints, weights = zip(*mix.items())
+        self.weights = np.array(weights, dtype=float) / sum(weights)
+        self.rng = rng
+        self.timeout = timeout
+        self.last_allocations = None
+        self.username = f"loadtest-{os.getpid()}-{user_index}-{rng.randrange(1 << 30)}"
+
+    def register(self):
+        response = self.session.post(f"{self.base_url}/auth/register",
+                                     json={"username": self.username, "password": "loadtest"}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def _basket(self):
+        return self.rng.sample(self.symbols, self.rng.randint(3, 8))
+
+    def request(self, endpoint):
+        if endpoint == "recommend":
+            industries = self.rng.sample(list(self.catalog), self.rng.randint(1, 3))
+            return self.session.post(f"{self.base_url}/api/stocks/recommend", json={"industries": industries},
+                                     timeout=self.timeout)
+        if endpoint == "optimize":
+            body = {
+                "stocks": [{"symbol": s["symbol"], "name": s["name"]} for s in self._basket()],
+                "investment_amount": self.rng.choice([1000, 10000, 50000]),
+                "data_period": self.rng.choice(PERIODS)
+            }
+            response = self.session.post(f"{self.base_url}/api/portfolio/optimize", json=body, timeout=self.timeout)
+            if response.status_code == 200:
+                self.last_allocations = response.json().get("allocations")
+            return response
+        if endpoint == "save":
+            allocations = self.last_allocations or [
+                {"symbol": s["symbol"], "name": s["name"], "weight": 1 / 4} for s in self.rng.sample(self.symbols, 4)
+            ]
+            body = {"name": f"Load test {self.rng.randrange(10000)}", "allocations": allocations,
+                    "projected_return": 0.08}
+            return self.session.post(f"{self.base_url}/api/portfolio/save", json=body, timeout=self.timeout)
+        if endpoint == "list":
+            return self.session.get(f"{self.base_url}/api/portfolio/list", timeout=self.timeout)
+        if endpoint == "health":
+            return self.session.get(f"{self.base_url}/api/health", timeout=self.timeout)
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    def run(self, deadline, samples, think_time):
+        while time.time() < deadline:
+            endpoint = self.endpoints[int(np.searchsorted(np.cumsum(self.weights), self.rng.random()))]
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = self.request(endpoint)
+                status = response.status_code
+                retry_after = response.headers.get('Retry-After')
+            except requests.RequestException as e:
+                status = type(e).__name__
+            samples.append((endpoint, status, time.perf_counter() - start, time.time()))
+            if retry_after and status in (429, 503):
+                # Back off as a well-behaved client would when shed by admission control
+                time.sleep(min(float(retry_after), max(deadline - time.time(), 0)))
+            elif think_time:
+                time.sleep(self.rng.expovariate(1 / think_time))
+
+
+def summarize(samples, duration):
+    def stats(rows):
+        latencies = np.array([row[2] for row in rows]) * 1000
+        statuses = {}
+        for row in rows:
+            statuses[str(row[1])] = statuses.get(str(row[1]), 0) + 1
+        errors = sum(1 for row in rows if not (isinstance(row[1], int) and row[1] < 400))
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": errors / len(rows) if rows else 0.0,
+            "throughput_rps": len(rows) / duration,
+            "status_codes": statuses,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "p99": float(np.percentile(latencies, 99)),
+                "mean": float(latencies.mean()),
+                "max": float(latencies.max())
+            } if rows else None
+        }
+
+    endpoints = sorted({row[0] for row in samples})
+    return {
+        "endpoints": {endpoint: stats([row for row in samples if row[0] == endpoint]) for endpoint in endpoints},
+        "overall": stats(samples)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline):
+    """Print p95 latency and throughput changes per endpoint against a previous report"""
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for endpoint, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous or not previous["latency_ms"] or not current["latency_ms"]:
+            continue
+        p95_change = current["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1
+        rps_change = current["throughput_rps"] / previous["throughput_rps"] - 1 if previous["throughput_rps"] else 0
+        print(f"  {endpoint:<10} p95 {p95_change:+.1%}  throughput {rps_change:+.1%}  "
+              f"errors {previous['error_rate']:.1%} -> {current['error_rate']:.1%}")
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<10} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = list(report["endpoints"].items()) + [("overall", report["overall"])]
+    for endpoint, stats in rows:
+        latency = stats["latency_ms"] or {"p50": 0, "p95": 0, "p99": 0}
+        print(f"{endpoint:<10} {stats['requests']:>6} {stats['error_rate'] * 100:>5.1f}% {stats['throughput_rps']:>7.2f} "
+              f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        endpoint, weight = part.split('=')
+        if endpoint not in ("recommend", "optimize", "save", "list", "health"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {endpoint}")
+        mix[endpoint] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8, help="Virtual users issuing requests back to back")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of measured traffic")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean pause between a user's requests (s)")
+    parser.add_argument('--provider-latency', type=float, default=0.05, help="Replay provider latency per call (s)")
+    parser.add_argument('--provider-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-latency', type=float, default=1.0, help="Stub Gemini latency per call (s)")
+    parser.add_argument('--symbols-per-sector', type=int, default=6)
+    parser.add_argument('--timeout', type=float, default=120, help="Per-request client timeout (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help="Drive an already running server instead of starting one")
+    parser.add_argument('--prepare-only', metavar='DIR',
+                        help="Write fixtures and the Gemini catalog to DIR, print the server environment and exit")
+    parser.add_argument('--server-log', help="Keep the started server's output at this path")
+    parser.add_argument('--output', help="Write the JSON report to this path")
+    parser.add_argument('--compare', help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    if args.prepare_only:
+        env, _ = prepare(os.path.abspath(args.prepare_only), args)
+        for key, value in env.items():
+            print(f"export {key}={value}")
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        env, catalog = prepare(work_dir, args)
+        server = None
+        base_url = args.url
+        if base_url is None:
+            server, base_url = start_server(env, args.server_log or os.path.join(work_dir, 'server.log'))
+        try:
+            wait_until_ready(base_url)
+            rng = random.Random(args.seed)
+            users = [VirtualUser(base_url, i, catalog, args.mix, random.Random(rng.random()), args.timeout)
+                     for i in range(args.concurrency)]
+            for user in users:
+                user.register()
+
+            samples = []
+            start = time.time()
+            deadline = start + args.duration
+            threads = [threading.Thread(target=user.run, args=(deadline, samples, args.think_time))
+                       for user in users]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.time() - start
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    report = {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'server_log')},
+        "elapsed_s": elapsed,
+        **summarize(samples, elapsed)
+    }
+    print_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
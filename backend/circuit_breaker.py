@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from collections import deque
+from metrics import CIRCUIT_STATE, CIRCUIT_REJECTIONS
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Failure- and latency-aware circuit breaker for an external provider
+
+    Failures (and calls slower than slow_call_seconds) within the last
+    window_seconds are counted; reaching failure_threshold opens the circuit
+    and callers fail fast for cool_down_seconds. After that a single probe call
+    is let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name, failure_threshold=None, window_seconds=None, cool_down_seconds=None,
+                 slow_call_seconds=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = int(failure_threshold or os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+        self.window_seconds = float(window_seconds or os.getenv('CIRCUIT_WINDOW_SECONDS', 60))
+        self.cool_down_seconds = float(cool_down_seconds or os.getenv('CIRCUIT_COOL_DOWN_SECONDS', 30))
+        self.slow_call_seconds = float(slow_call_seconds or os.getenv('CIRCUIT_SLOW_CALL_SECONDS', 15))
+        self._clock = clock
+        self._failures = deque()
+        self._state = CLOSED
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(0, provider=name)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], provider=self.name)
+        print(f"Circuit breaker {self.name}: {state}")
+
+    def allow_request(self):
+        """Whether a call may go to the provider now; counts a rejection when it may not"""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cool_down_seconds:
+                self._set_state(HALF_OPEN)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        CIRCUIT_REJECTIONS.inc(provider=self.name)
+        return False
+
+    def record_success(self, elapsed=0.0):
+        if elapsed > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN:
+                self._failures.clear()
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            now = self._clock()
+            self._probe_in_flight = False
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window_seconds:
+                self._failures.popleft()
+
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and len(self._failures) >= self.failure_threshold):
+                self._opened_at = now
+                self._set_state(OPEN)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._state,
+                "recent_failures": len(self._failures),
+                "opened_at": self._opened_at
+            }
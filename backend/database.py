@@ -0,0 +1,72 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+
+DEFAULT_DATABASE_URL = 'sqlite:///portfolio.db'
+
+
+def database_url():
+    """DATABASE_URL from the environment, defaulting to the local SQLite file"""
+    url = os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Some hosts still hand out the old postgres:// scheme
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def _is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def _is_sqlite_file(url):
+    return _is_sqlite(url) and make_url(url).database not in (None, '', ':memory:')
+
+
+def engine_options(url):
+    """Per-worker pool settings for the given database URL
+
+    SQLite connections wait up to SQLITE_BUSY_TIMEOUT seconds for a lock
+    instead of failing with "database is locked". Server databases get a
+    bounded pool with pre-ping so connections dropped by the server (or a
+    proxy) are replaced instead of surfacing as request errors.
+    """
+    pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+    if _is_sqlite(url) and not _is_sqlite_file(url):
+        # In-memory databases (tests) keep SQLAlchemy's single-connection pool
+        return {}
+    if _is_sqlite(url):
+        return {
+            "connect_args": {"timeout": float(os.getenv('SQLITE_BUSY_TIMEOUT', 15))},
+            "pool_size": pool_size
+        }
+    return {
+        "pool_size": pool_size,
+        "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        "pool_timeout": int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        "pool_pre_ping": True
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers proceed while one worker writes; NORMAL sync is safe under WAL"""
+    busy_timeout_ms = int(float(os.getenv('SQLITE_BUSY_TIMEOUT', 15)) * 1000)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def configure_database(app, url=None):
+    """Point the app's SQLAlchemy at DATABASE_URL (or url) with multi-worker-safe settings"""
+    url = url or database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    db.init_app(app)
+
+    if _is_sqlite_file(url):
+        with app.app_context():
+            event.listen(db.engine, "connect", _set_sqlite_pragmas)
+    return url
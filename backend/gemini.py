@@ -1,15 +1,56 @@
 import google.generativeai as genai
 import json
 import re
+import time
+from types import SimpleNamespace
 from stock_validator import StockValidator
+from metrics import stage_timer, PROVIDER_FAILURES
+
+
+class StubGenerativeModel:
+    """Local stand-in for the Gemini model, for load tests and offline runs
+
+    Recommendation prompts are answered from catalog ({industry: [stock
+    dicts]}) for the industries named in the prompt; ticker-extraction
+    prompts echo the first word of the message as the ticker. Every call
+    takes latency seconds.
+    """
+
+    def __init__(self, catalog, latency=0.0):
+        self.catalog = catalog
+        self.latency = latency
+
+    @classmethod
+    def from_file(cls, path, latency=0.0):
+        with open(path) as f:
+            return cls(json.load(f), latency=latency)
+
+    def generate_content(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        message = re.search(r'Message: (.*)', prompt)
+        if message:
+            words = message.group(1).split()
+            ticker = words[0].upper() if words else ''
+            return SimpleNamespace(text=f"Ticker: {ticker}\nCompany: {message.group(1)}")
+        requested = re.search(r'industries: (.*?), recommend', prompt)
+        requested = [name.strip() for name in requested.group(1).split(',')] if requested else []
+        stocks = [stock for industry in requested for stock in self.catalog.get(industry, [])]
+        return SimpleNamespace(text=json.dumps(stocks))
+
 
 class GeminiService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, validator=None, model=None):
+        self.validator = validator or StockValidator()
+        if model is not None:
+            # Injected model (e.g. StubGenerativeModel); no API key needed
+            self.model = model
+            return
+        
         if not api_key:
             raise ValueError("GEMINI_API_KEY is required")
         
         genai.configure(api_key=api_key)
-        self.validator = StockValidator()
         
         try:
             self.model = genai.GenerativeModel('gemini-2.5-flash')
@@ -58,7 +99,8 @@ Only include real, currently traded stocks with valid ticker symbols.
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            with stage_timer("gemini_recommendations"):
+                response = self.model.generate_content(prompt)
             
             # Extract JSON from response
             response_text = response.text
@@ -82,6 +124,7 @@ Only include real, currently traded stocks with valid ticker symbols.
                 raise ValueError("Could not parse JSON from Gemini response")
                 
         except Exception as e:
+            PROVIDER_FAILURES.inc(provider="gemini", operation="recommendations")
             print(f"Error getting recommendations from Gemini: {e}")
             # Fallback recommendations
             return self._get_fallback_recommendations(industries)
@@ -144,7 +187,8 @@ Only include real, currently traded stocks with valid ticker symbols.
             "Ticker: <ticker>\nCompany: <company>"
         )
         try:
-            response = self.model.generate_content(prompt)
+            with stage_timer("gemini_extract_symbol"):
+                response = self.model.generate_content(prompt)
             lines = response.text.strip().split('\n')
             ticker = ''
             company = ''
@@ -155,5 +199,6 @@ Only include real, currently traded stocks with valid ticker symbols.
                     company = line.split(':', 1)[1].strip()
             return ticker, company
         except Exception as e:
+            PROVIDER_FAILURES.inc(provider="gemini", operation="extract_symbol")
             print(f"Gemini extraction error: {e}")
             return '', ''
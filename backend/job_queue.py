@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Seconds between reads of a job state file while waiting on another process's job
+STATE_POLL_SECONDS = 0.5
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds its maximum number of pending jobs"""
+
+
+class Job:
+    """A unit of background work with stage-level progress"""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Incremented on every change so subscribers can wait for the next update
+        self.version = 0
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self, include_result=True):
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.error is not None:
+            job["error"] = self.error
+        if include_result and self.result is not None:
+            job["result"] = self.result
+        return job
+
+    def to_state(self):
+        """Everything needed to rebuild the job in another process"""
+        return {**self.to_dict(), "key": self.key, "version": self.version, "status_code": self.status_code}
+
+    @classmethod
+    def from_state(cls, state):
+        """Read-only snapshot of a job published by another process"""
+        job = cls(state["key"])
+        job.id = state["job_id"]
+        for name in ("status", "stage", "progress", "created_at", "started_at", "finished_at", "version",
+                     "status_code"):
+            setattr(job, name, state[name])
+        job.error = state.get("error")
+        job.result = state.get("result")
+        return job
+
+
+class LocalJobQueue:
+    """In-process job backend: a bounded thread pool plus an in-memory job table
+
+    Jobs submitted with the key of a job that is still queued or running are
+    de-duplicated onto that job. Finished jobs are kept for result_ttl seconds.
+
+    With a state_dir, every job change is also written there as <job_id>.json,
+    so any worker process sharing the directory can poll a job that runs in
+    another (de-duplication stays per process).
+    """
+
+    def __init__(self, max_workers=2, max_pending=50, result_ttl=600, state_dir=None):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._jobs = {}
+        self._inflight = {}
+        self._condition = threading.Condition()
+
+    def submit(self, key, fn):
+        """Queue fn(report) and return (job, created)
+
+        fn receives report(stage, progress) to publish progress and its return
+        value becomes the job result. If it raises, the exception message is
+        stored as the job error (with its status_code attribute, if any).
+        """
+        with self._condition:
+            self._prune()
+            existing = self._inflight.get(key)
+            if existing is not None:
+                return existing, False
+
+            pending = sum(1 for job in self._inflight.values() if job.status == "queued")
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs)")
+
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._save(job)
+
+        self._executor.submit(self._run, job, fn)
+        return job, True
+
+    def get(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._load(job_id)
+
+    def wait_for_update(self, job_id, last_version, timeout=15):
+        """Block until the job changes past last_version (or timeout) and return it"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._condition.wait_for(lambda: job.version > last_version or job.finished, timeout=timeout)
+                return job
+
+        # Another process's job: poll its state file
+        deadline = time.monotonic() + timeout
+        job = self._load(job_id)
+        while job is not None and job.version <= last_version and not job.finished and time.monotonic() < deadline:
+            time.sleep(min(STATE_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+            job = self._load(job_id) or job
+        return job
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        """Publish the job's state to the shared directory (caller holds the lock)"""
+        if not self.state_dir:
+            return
+        try:
+            tmp_path = self._state_path(job.id) + f".{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(job.to_state(), f)
+            os.replace(tmp_path, self._state_path(job.id))
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving state of job {job.id}: {e}")
+
+    def _load(self, job_id):
+        """Job published by another process, or None"""
+        if not self.state_dir or not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                return Job.from_state(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _update(self, job, **changes):
+        with self._condition:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            if job.finished and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            self._save(job)
+            self._condition.notify_all()
+
+    def _run(self, job, fn):
+        self._update(job, status="running", stage="starting", started_at=time.time())
+
+        def report(stage, progress):
+            self._update(job, stage=stage, progress=progress)
+
+        try:
+            result = fn(report)
+            self._update(job, status="succeeded", stage="done", progress=1.0,
+                         result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            self._update(job, status="failed", stage="failed", error=str(e),
+                         status_code=getattr(e, "status_code", 500), finished_at=time.time())
+
+    def _prune(self):
+        """Drop finished jobs older than the result TTL (caller holds the lock)"""
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self.state_dir:
+            # Also sweeps files left by other (e.g. restarted) workers; a live job rewrites its file on its next change
+            for name in os.listdir(self.state_dir):
+                path = os.path.join(self.state_dir, name)
+                try:
+                    if name[:32] not in self._jobs and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,95 @@
+import os
+import time
+import threading
+from metrics import STAGE_DURATION
+
+# How the app's services are built: "background" (default) builds them in a
+# thread right after startup, "lazy" on first use, "eager" before startup returns
+WARM_UP_MODES = ('background', 'lazy', 'eager')
+
+
+class LazyService:
+    """Stand-in for a service that is built by its factory on first use
+
+    Attribute access is forwarded to the real service, so a LazyService can
+    be passed anywhere the service itself is expected. Heavy modules are
+    imported inside the factory, which keeps them out of the import path of
+    the app until a request (or the warm-up) needs them.
+    """
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start_time = time.perf_counter()
+                    instance = self._factory()
+                    elapsed = time.perf_counter() - start_time
+                    STAGE_DURATION.observe(elapsed, stage=f"init_{self._name}")
+                    print(f"Initialized {self._name} in {elapsed:.2f}s")
+                    self._instance = instance
+        return self._instance
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+
+class OncePerProcess:
+    """Calls start once in each process: again in a child forked after it ran
+
+    Threads do not survive a fork, so a server that imports the app before
+    forking its workers (gunicorn --preload) must start them in each worker.
+    """
+
+    def __init__(self, start):
+        self._start = start
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        """Whether start has run in this process"""
+        return self._pid == os.getpid()
+
+    def __call__(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._start()
+
+
+def warm_up(services, mode=None):
+    """Build the services now, in a background thread, or not at all (lazy), per mode or WARM_UP
+
+    Returns the warm-up thread in background mode, else None.
+    """
+    mode = mode or os.getenv('WARM_UP', 'background')
+    if mode not in WARM_UP_MODES:
+        raise ValueError(f"Unknown WARM_UP mode: {mode}")
+    if mode == 'lazy':
+        return None
+
+    def build_all():
+        for service in services:
+            try:
+                service.get()
+            except Exception as e:
+                print(f"Error warming up {service._name}: {e}")
+
+    if mode == 'eager':
+        build_all()
+        return None
+    thread = threading.Thread(target=build_all, name="service-warm-up", daemon=True)
+    thread.start()
+    return thread
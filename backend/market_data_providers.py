@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import random
+import threading
+from abc import ABC, abstractmethod
+import pandas as pd
+from shared_panels import period_start
+
+DEFAULT_RISK_FREE_RATE = 0.02
+
+# Resample rule of each bar interval the replay provider builds from its daily fixtures
+REPLAY_RESAMPLE_RULES = {'1d': None, '5d': '5B', '1wk': 'W-FRI', '1mo': 'ME', '3mo': 'QE'}
+# How each OHLCV column is combined when daily bars are resampled
+OHLCV_AGGREGATION = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Adj Close': 'last',
+                     'Volume': 'sum'}
+
+
+class ProviderError(Exception):
+    """Raised by a provider when a request fails"""
+
+
+class MarketDataProvider(ABC):
+    """Interface for market-data backends
+
+    history() returns one symbol's OHLCV bars (yfinance Ticker.history
+    columns), info() its quote/profile fields (yfinance info keys),
+    download() adjusted closes as a (dates x symbols) frame holding the
+    symbols that had data, and risk_free_rate() the annual rate as a decimal.
+    Failures raise; callers own retries and fallbacks.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def history(self, symbol, period="1y", interval="1d"):
+        pass
+
+    @abstractmethod
+    def info(self, symbol):
+        pass
+
+    @abstractmethod
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        pass
+
+    @abstractmethod
+    def risk_free_rate(self):
+        pass
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance through yfinance"""
+
+    name = "yfinance"
+
+    def history(self, symbol, period="1y", interval="1d"):
+        import yfinance as yf
+        return yf.Ticker(symbol).history(period=period, interval=interval)
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        import yfinance as yf
+        if start is not None or end is not None:
+            data = yf.download(symbols, start=start, end=end, interval=interval,
+                               progress=False, auto_adjust=False, timeout=timeout)
+        else:
+            data = yf.download(symbols, period=period, interval=interval,
+                               progress=False, auto_adjust=False, timeout=timeout)
+
+        if data is None or data.empty or 'Adj Close' not in data.columns:
+            return pd.DataFrame()
+        adj_close_data = data['Adj Close']
+        if isinstance(adj_close_data, pd.Series):
+            adj_close_data = adj_close_data.to_frame(symbols[0])
+        return adj_close_data.dropna(axis=1, how='all')
+
+    def risk_free_rate(self):
+        """3-month Treasury bill yield (^IRX)"""
+        data = self.history("^IRX", period="5d")
+        if data.empty:
+            raise ProviderError("No ^IRX data")
+        return float(data['Close'].iloc[-1]) / 100
+
+
+class ReplayProvider(MarketDataProvider):
+    """Offline provider serving recorded fixtures, with injected latency and errors
+
+    fixture_dir holds one <SYMBOL>.csv or <SYMBOL>.parquet per symbol with a
+    date index and at least a Close column (Open/High/Low/Adj Close/Volume are
+    used when present; the price store's CSVs work as is), plus an optional
+    info.json mapping symbols to yfinance-style info and "risk_free_rate" to
+    the annual rate. Periods are measured back from the last recorded date, so
+    replays are reproducible. Fixtures hold daily bars: 5d/1wk/1mo/3mo requests
+    are resampled from them and intraday intervals raise ProviderError. Every call sleeps latency +/- latency_jitter
+    seconds and fails with probability error_rate, drawn from a seeded RNG.
+    """
+
+    name = "replay"
+
+    def __init__(self, fixture_dir, latency=0.0, latency_jitter=0.0, error_rate=0.0, seed=None):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._bars = {}
+        self._bars_lock = threading.Lock()
+
+        info_path = os.path.join(fixture_dir, 'info.json')
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                self._info = json.load(f)
+        else:
+            self._info = {}
+
+    def _simulate_network(self, operation):
+        with self._rng_lock:
+            delay = max(0.0, self.latency + self._rng.uniform(-self.latency_jitter, self.latency_jitter))
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ProviderError(f"Injected replay failure ({operation})")
+
+    def _load_bars(self, symbol):
+        """Recorded bars for a symbol, or None if there is no fixture"""
+        with self._bars_lock:
+            if symbol in self._bars:
+                return self._bars[symbol]
+
+            base = os.path.join(self.fixture_dir, symbol.upper().replace('/', '_'))
+            bars = None
+            if os.path.exists(base + '.parquet'):
+                bars = pd.read_parquet(base + '.parquet')
+            elif os.path.exists(base + '.csv'):
+                bars = pd.read_csv(base + '.csv', index_col=0, parse_dates=True)
+            if bars is not None:
+                bars.index = pd.DatetimeIndex(bars.index).tz_localize(None)
+                bars = bars.sort_index()
+                if 'Volume' not in bars.columns:
+                    bars['Volume'] = self._info.get(symbol, {}).get('averageVolume', 0)
+            self._bars[symbol] = bars
+            return bars
+
+    def _window(self, bars, period=None, start=None, end=None):
+        if start is not None or end is not None:
+            return bars.loc[start:end]
+        first = period_start(period, end=bars.index[-1]) if period else None
+        return bars.loc[first:] if first is not None else bars
+
+    def _resample(self, bars, interval):
+        """Daily bars (an OHLCV frame or a close series) aggregated to the interval"""
+        rule = REPLAY_RESAMPLE_RULES[interval]
+        if rule is None or bars.empty:
+            return bars
+        if isinstance(bars, pd.Series):
+            return bars.resample(rule).last().dropna()
+        aggregation = {column: OHLCV_AGGREGATION.get(column, 'last') for column in bars.columns}
+        return bars.resample(rule).agg(aggregation).dropna(subset=['Close'])
+
+    def _check_interval(self, interval):
+        if interval not in REPLAY_RESAMPLE_RULES:
+            raise ProviderError(f"Replay fixtures hold daily bars; interval {interval} is not supported")
+
+    def history(self, symbol, period="1y", interval="1d"):
+        self._check_interval(interval)
+        self._simulate_network("history")
+        bars = self._load_bars(symbol)
+        if bars is None:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        return self._resample(self._window(bars, period), interval).copy()
+
+    def info(self, symbol):
+        self._simulate_network("info")
+        info = dict(self._info.get(symbol, {}))
+        bars = self._load_bars(symbol)
+        if bars is not None and not bars.empty:
+            info.setdefault('currentPrice', float(bars['Close'].iloc[-1]))
+        return info
+
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        self._check_interval(interval)
+        self._simulate_network("download")
+        columns = {}
+        for symbol in symbols:
+            bars = self._load_bars(symbol)
+            if bars is None:
+                continue
+            close = bars['Adj Close'] if 'Adj Close' in bars.columns else bars['Close']
+            columns[symbol] = self._resample(self._window(close, period, start, end), interval)
+        return pd.DataFrame(columns)
+
+    def risk_free_rate(self):
+        self._simulate_network("risk_free_rate")
+        return float(self._info.get('risk_free_rate', DEFAULT_RISK_FREE_RATE))
+
+
+def create_provider(name=None):
+    """Provider selected by MARKET_DATA_PROVIDER ("yfinance" by default, or "replay")
+
+    The replay provider reads REPLAY_FIXTURE_DIR, REPLAY_LATENCY,
+    REPLAY_LATENCY_JITTER, REPLAY_ERROR_RATE and REPLAY_SEED.
+    """
+    name = name or os.getenv('MARKET_DATA_PROVIDER', 'yfinance')
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'replay':
+        fixture_dir = os.getenv('REPLAY_FIXTURE_DIR')
+        if not fixture_dir:
+            raise ValueError("REPLAY_FIXTURE_DIR is required for the replay provider")
+        seed = os.getenv('REPLAY_SEED')
+        return ReplayProvider(
+            fixture_dir,
+            latency=float(os.getenv('REPLAY_LATENCY', 0)),
+            latency_jitter=float(os.getenv('REPLAY_LATENCY_JITTER', 0)),
+            error_rate=float(os.getenv('REPLAY_ERROR_RATE', 0)),
+            seed=int(seed) if seed is not None else None
+        )
+    raise ValueError(f"Unknown market data provider: {name}")
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Process-wide provider shared by the data service and the validator"""
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = create_provider()
+        return _default_provider
+
+
+def record_fixtures(symbols, fixture_dir, period="2y", provider=None):
+    """Record OHLCV bars and info for the symbols from a live provider into replay fixtures"""
+    provider = provider or YFinanceProvider()
+    os.makedirs(fixture_dir, exist_ok=True)
+    info_path = os.path.join(fixture_dir, 'info.json')
+    infos = {}
+    if os.path.exists(info_path):
+        with open(info_path) as f:
+            infos = json.load(f)
+
+    recorded = []
+    for symbol in symbols:
+        try:
+            bars = provider.history(symbol, period=period)
+            if bars.empty:
+                print(f"No history for {symbol}, skipping")
+                continue
+            bars.index = pd.DatetimeIndex(bars.index).tz_localize(None)
+            bars.index.name = 'Date'
+            bars.to_csv(os.path.join(fixture_dir, f"{symbol.upper().replace('/', '_')}.csv"))
+            info = provider.info(symbol)
+            infos[symbol] = {key: value for key, value in info.items() if isinstance(value, (int, float, str, bool))}
+            recorded.append(symbol)
+        except Exception as e:
+            print(f"Error recording {symbol}: {e}")
+
+    try:
+        infos['risk_free_rate'] = provider.risk_free_rate()
+    except Exception as e:
+        print(f"Error recording risk-free rate: {e}")
+    with open(info_path, 'w') as f:
+        json.dump(infos, f, indent=2)
+    return recorded
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record live market data into replay fixtures")
+    parser.add_argument('fixture_dir')
+    parser.add_argument('--symbols', nargs='+', required=True)
+    parser.add_argument('--period', default='2y')
+    args = parser.parse_args()
+
+    recorded = record_fixtures(args.symbols, args.fixture_dir, period=args.period)
+    print(f"Recorded {len(recorded)} of {len(args.symbols)} symbols into {args.fixture_dir}")
@@ -0,0 +1,198 @@
+import time
+import bisect
+import threading
+
+# Latency buckets in seconds, from fast cache hits up to slow provider calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight"""
+
+    type_name = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, optionally split by labels"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, **labels):
+        counts = self._values.get(_label_key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(counts) for key, counts in self._values.items()}
+        samples = []
+        for key, counts in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, (), counts[-1]))
+            samples.append((f"{self.name}_count", key, (), cumulative))
+        return samples
+
+
+class Timer:
+    """Context manager that records elapsed seconds into a histogram"""
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Holds all metrics of the process and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Shared metrics used across the hot paths
+STAGE_DURATION = registry.histogram(
+    "optivest_stage_duration_seconds", "Latency of pipeline stages")
+REQUEST_DURATION = registry.histogram(
+    "optivest_request_duration_seconds", "Latency of HTTP requests by endpoint")
+IN_FLIGHT_REQUESTS = registry.gauge(
+    "optivest_in_flight_requests", "HTTP requests currently being served by endpoint")
+CACHE_HITS = registry.counter(
+    "optivest_cache_hits_total", "Cache hits by cache")
+CACHE_MISSES = registry.counter(
+    "optivest_cache_misses_total", "Cache misses by cache")
+PROVIDER_FAILURES = registry.counter(
+    "optivest_provider_failures_total", "Failed calls to external providers by provider and operation")
+MOCK_DATA_FALLBACKS = registry.counter(
+    "optivest_mock_data_fallbacks_total", "Times synthetic data was served because real data was unavailable")
+CIRCUIT_STATE = registry.gauge(
+    "optivest_circuit_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open)")
+CIRCUIT_REJECTIONS = registry.counter(
+    "optivest_circuit_rejections_total", "Provider calls skipped because the circuit was open")
+SINGLEFLIGHT_CALLS = registry.counter(
+    "optivest_singleflight_calls_total", "Single-flight calls by group and role (leader ran the call, follower shared it)")
+RISK_FREE_RATE = registry.gauge(
+    "optivest_risk_free_rate", "Annual risk-free rate used in Sharpe ratios, by provider")
+ADMISSION_QUEUE_WAIT = registry.histogram(
+    "optivest_admission_queue_wait_seconds", "Time admitted requests waited for a slot, by endpoint class")
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "optivest_admission_queue_depth", "Requests waiting for a slot, by endpoint class")
+ADMISSION_RUNNING = registry.gauge(
+    "optivest_admission_running", "Admitted requests currently running, by endpoint class")
+ADMISSION_REJECTIONS = registry.counter(
+    "optivest_admission_rejections_total", "Requests rejected by admission control, by endpoint class and reason")
+
+
+def stage_timer(stage):
+    """Time a block of code as a pipeline stage: `with stage_timer("solve") as t: ...`"""
+    return Timer(STAGE_DURATION, {"stage": stage})
@@ -30,7 +30,7 @@ class ValidatedStock(db.Model):
 class Portfolio(db.Model):
     __tablename__ = 'portfolios'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     name = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     projected_return = db.Column(db.Float)
@@ -41,6 +41,13 @@ class Portfolio(db.Model):
 class PortfolioStock(db.Model):
     __tablename__ = 'portfolio_stocks'
     id = db.Column(db.Integer, primary_key=True)
-    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolios.id'), nullable=False)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolios.id'), nullable=False, index=True)
     stock_symbol = db.Column(db.String(10), db.ForeignKey('validated_stocks.symbol'), nullable=False)
     weight = db.Column(db.Float, nullable=False)
+
+
+def ensure_indexes():
+    """Create indexes that db.create_all() does not add to already existing tables"""
+    for table in (Portfolio.__table__, PortfolioStock.__table__):
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Bars per year for each supported bar interval (US equities: 252 sessions of 6.5 hours)
+PERIODS_PER_YEAR = {
+    '1m': 252 * 390,
+    '2m': 252 * 195,
+    '5m': 252 * 78,
+    '15m': 252 * 26,
+    '30m': 252 * 13,
+    '60m': 252 * 6.5,
+    '90m': 252 * 390 / 90,
+    '1h': 252 * 6.5,
+    '1d': 252,
+    '5d': 252 / 5,
+    '1wk': 52,
+    '1mo': 12,
+    '3mo': 4
+}
+
+INTRADAY_INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h')
+
+DEFAULT_CHUNK_ROWS = int(os.getenv('MOMENT_CHUNK_ROWS', 65536))
+
+
+def annualization_factor(interval):
+    """Number of bars per year for a bar interval"""
+    if interval not in PERIODS_PER_YEAR:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return PERIODS_PER_YEAR[interval]
+
+
+def _iter_return_chunks(prices, chunk_rows):
+    """Yield simple returns in float32 chunks, dropping rows with missing values"""
+    rows = prices.iloc if hasattr(prices, 'iloc') else prices
+    n_rows = len(prices)
+    previous = None
+    for start in range(0, n_rows, chunk_rows):
+        chunk = np.asarray(rows[start:start + chunk_rows], dtype=np.float32)
+        # Carry the last row of the previous chunk so returns span chunk boundaries
+        if previous is not None:
+            chunk = np.vstack([previous, chunk])
+        previous = chunk[-1:]
+        if len(chunk) < 2:
+            continue
+        returns = chunk[1:] / chunk[:-1] - 1
+        returns = returns[np.isfinite(returns).all(axis=1)]
+        if len(returns):
+            yield returns
+
+
+def streaming_moments(prices, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Per-bar mean and covariance of returns, streamed over row chunks
+
+    prices may be a DataFrame, ndarray or np.memmap of shape (bars, assets).
+    Only one float32 chunk is held at a time; sums are accumulated in float64
+    around a shift taken from the first chunk to keep the covariance stable.
+    """
+    n_obs = 0
+    shift = None
+    sum_returns = None
+    sum_products = None
+
+    for returns in _iter_return_chunks(prices, chunk_rows):
+        if shift is None:
+            shift = returns.mean(axis=0, dtype=np.float64)
+            sum_returns = np.zeros_like(shift)
+            sum_products = np.zeros((len(shift), len(shift)))
+        centered = returns.astype(np.float64) - shift
+        n_obs += len(centered)
+        sum_returns += centered.sum(axis=0)
+        sum_products += centered.T @ centered
+
+    if n_obs < 2:
+        raise ValueError("Need at least two valid return observations")
+
+    mean = shift + sum_returns / n_obs
+    cov = (sum_products - np.outer(sum_returns, sum_returns) / n_obs) / (n_obs - 1)
+    return mean, cov, n_obs
+
+
+def streaming_portfolio_returns(prices, weights, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Portfolio return series (one float64 per bar) computed chunk by chunk"""
+    weights = np.asarray(weights, dtype=np.float64)
+    parts = [returns @ weights for returns in _iter_return_chunks(prices, chunk_rows)]
+    return np.concatenate(parts) if parts else np.array([])
+
+
+def stacked_returns(prices, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Full float64 returns matrix, for methods that need every observation (e.g. bootstrap)"""
+    parts = list(_iter_return_chunks(prices, chunk_rows))
+    if not parts:
+        return np.empty((0, prices.shape[1]))
+    return np.concatenate(parts).astype(np.float64)
+
+
+def to_float32_memmap(price_data, directory=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Spill a price frame to an anonymous float32 memory-mapped file
+
+    Returns a DataFrame backed by the read-only mapping. The file is unlinked
+    right away, so it disappears once the last reference to the frame is gone.
+    """
+    fd, path = tempfile.mkstemp(suffix='.npy', dir=directory)
+    os.close(fd)
+    try:
+        mapped = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=price_data.shape)
+        for start in range(0, len(price_data), chunk_rows):
+            mapped[start:start + chunk_rows] = price_data.iloc[start:start + chunk_rows].to_numpy(dtype=np.float32)
+        mapped.flush()
+        del mapped
+        mapped = np.load(path, mmap_mode='r')
+    finally:
+        os.unlink(path)
+    frame = pd.DataFrame(mapped, index=price_data.index, columns=price_data.columns, copy=False)
+    frame.attrs.update(price_data.attrs)
+    return frame
@@ -0,0 +1,249 @@
+import os
+import time
+from metrics import STAGE_DURATION, stage_timer
+
+OPTIMIZATION_METHODS = ('max_sharpe', 'min_variance', 'resampled')
+
+# Default solve time budget in seconds (unset: no budget, solve to optimality)
+DEFAULT_TIME_BUDGET = os.getenv('OPTIMIZE_TIME_BUDGET')
+
+
+class OptimizationError(Exception):
+    """Raised when an optimize request cannot be served; carries the HTTP status"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_optimize_request(data):
+    """Validate an optimize request body and return the normalized parameters"""
+    # Imported here so importing the app does not pull in numpy and pandas
+    from moments import PERIODS_PER_YEAR
+    data = data or {}
+    params = {
+        "stocks": data.get('stocks', []),
+        "investment_amount": data.get('investment_amount', 10000),
+        "data_period": data.get('data_period', '2y'),  # Default to 2 years
+        "interval": data.get('interval', '1d'),  # Bar size: daily by default, or intraday e.g. "1h", "5m"
+        "method": data.get('method', 'max_sharpe'),
+        "n_resamples": data.get('n_resamples', 500),
+        # Seconds allowed for the market-data provider before stored or mock data is used
+        "latency_budget": data.get('latency_budget'),
+        # Seconds allowed for the optimizer; the best solution found in time is returned
+        "time_budget": data.get('time_budget', DEFAULT_TIME_BUDGET)
+    }
+
+    if params["interval"] not in PERIODS_PER_YEAR:
+        raise OptimizationError(f"Unsupported interval: {params['interval']}")
+
+    if params["method"] not in OPTIMIZATION_METHODS:
+        raise OptimizationError(f"Unknown optimization method: {params['method']}")
+
+    try:
+        params["n_resamples"] = int(params["n_resamples"])
+    except (TypeError, ValueError):
+        raise OptimizationError("n_resamples must be an integer")
+    if not 1 <= params["n_resamples"] <= 5000:
+        raise OptimizationError("n_resamples must be between 1 and 5000")
+
+    if params["latency_budget"] is not None:
+        try:
+            params["latency_budget"] = float(params["latency_budget"])
+        except (TypeError, ValueError):
+            raise OptimizationError("latency_budget must be a number of seconds")
+        if not 0 < params["latency_budget"] <= 120:
+            raise OptimizationError("latency_budget must be between 0 and 120 seconds")
+
+    if params["time_budget"] is not None:
+        try:
+            params["time_budget"] = float(params["time_budget"])
+        except (TypeError, ValueError):
+            raise OptimizationError("time_budget must be a number of seconds")
+        if not 0 < params["time_budget"] <= 120:
+            raise OptimizationError("time_budget must be between 0 and 120 seconds")
+        if params["method"] == "resampled":
+            if "time_budget" in data:
+                raise OptimizationError("time_budget is not supported by the resampled method")
+            params["time_budget"] = None
+
+    if not params["stocks"]:
+        raise OptimizationError("Please select at least 2 stocks")
+
+    if len(params["stocks"]) < 2:
+        raise OptimizationError("Portfolio optimization requires at least 2 stocks")
+
+    return params
+
+
+def run_optimization(params, stock_data_service, portfolio_optimizer, progress=None):
+    """Run the fetch-solve-explain-metrics pipeline and build the optimize response
+
+    progress, if given, is called as progress(stage, fraction) when each stage starts.
+    """
+    from moments import annualization_factor
+
+    def report(stage, fraction):
+        if progress is not None:
+            progress(stage, fraction)
+
+    total_start_time = time.perf_counter()
+
+    selected_stocks = params["stocks"]
+    investment_amount = params["investment_amount"]
+    data_period = params["data_period"]
+    interval = params["interval"]
+    method = params["method"]
+    periods_per_year = annualization_factor(interval)
+
+    print(f"Starting portfolio optimization request...")
+    print(f"Investment amount: ${investment_amount:,.2f}")
+    print(f"Selected stocks: {len(selected_stocks)}")
+    print(f"Data period: {data_period} ({interval} bars)")
+    print(f"Method: {method}")
+
+    # Get historical data for optimization
+    symbols = [stock['symbol'] for stock in selected_stocks]
+    print(f"Symbols: {symbols}")
+
+    report("fetching_data", 0.0)
+    with stage_timer("data_fetch") as data_timer:
+        historical_data = stock_data_service.get_historical_data(
+            symbols, period=data_period, interval=interval, latency_budget=params.get("latency_budget")
+        )
+
+    # Mock data served while the provider is down; reported to the client and never cached
+    synthetic = bool(historical_data.attrs.get("synthetic"))
+
+    if historical_data.empty:
+        print("Historical data is empty")
+        raise OptimizationError("Unable to fetch historical data for optimization. Please try again or select different stocks.", 500)
+
+    print(f"Historical data shape: {historical_data.shape}")
+    print(f"Data columns: {historical_data.columns.tolist()}")
+
+    # Check if we have enough data points
+    if len(historical_data) < 20:
+        raise OptimizationError("Insufficient historical data for optimization. Need at least 20 data points.")
+
+    # Providers may return columns in a different order (e.g. alphabetical);
+    # weights are matched to symbols by position below
+    if list(historical_data.columns) != symbols and set(symbols) <= set(historical_data.columns):
+        historical_data = historical_data[symbols]
+
+    # One risk-free rate for the whole request, so the solve and the reported Sharpe agree
+    risk_free_rate, risk_free_rate_as_of = stock_data_service.risk_free_rates.get()
+
+    # Optimize portfolio
+    report("optimizing", 0.4)
+    optimization_info = {}
+    with stage_timer("optimization") as optimization_timer:
+        optimal_weights = portfolio_optimizer.optimize_portfolio(
+            historical_data, method=method, n_resamples=params["n_resamples"], diagnostics=optimization_info,
+            periods_per_year=periods_per_year, risk_free_rate=risk_free_rate, time_budget=params.get("time_budget")
+        )
+
+    if optimal_weights is None or len(optimal_weights) == 0:
+        raise OptimizationError("Portfolio optimization failed. Please try different stocks.", 500)
+
+    # Generate explanation
+    report("explaining", 0.8)
+    with stage_timer("explanation") as explanation_timer:
+        explanation = portfolio_optimizer.generate_explanation(
+            symbols, optimal_weights, historical_data
+        )
+
+    # Calculate investment allocation
+    allocations = []
+    for i, symbol in enumerate(symbols):
+        allocations.append({
+            "symbol": symbol,
+            "weight": float(optimal_weights[i]),
+            "amount": float(optimal_weights[i] * investment_amount),
+            "name": next((s['name'] for s in selected_stocks if s['symbol'] == symbol), symbol)
+        })
+
+    # Calculate risk metrics
+    report("computing_metrics", 0.9)
+    with stage_timer("risk_metrics") as metrics_timer:
+        risk_metrics = portfolio_optimizer.calculate_risk_metrics(
+            historical_data, optimal_weights, periods_per_year=periods_per_year, risk_free_rate=risk_free_rate
+        )
+    risk_metrics["risk_free_rate_as_of"] = risk_free_rate_as_of
+
+    total_time = time.perf_counter() - total_start_time
+    STAGE_DURATION.observe(total_time, stage="optimize_request")
+
+    # Stage latencies are recorded in the metrics registry (/api/metrics);
+    # the per-request breakdown is still returned for clients
+    performance_info = {
+        "total_time": f"{total_time:.2f}s",
+        "data_fetch_time": f"{data_timer.elapsed:.2f}s",
+        "optimization_time": f"{optimization_timer.elapsed:.2f}s",
+        "explanation_time": f"{explanation_timer.elapsed:.2f}s",
+        "metrics_time": f"{metrics_timer.elapsed:.2f}s",
+        "data_source": "synthetic" if synthetic else "market"
+    }
+    if "resampling" in optimization_info:
+        resampling = optimization_info["resampling"]
+        performance_info["resampling"] = {
+            "n_resamples": resampling["n_resamples"],
+            "n_solved": resampling["n_solved"],
+            "resample_time_mean": f"{resampling['resample_time_mean'] * 1000:.1f}ms",
+            "resample_time_p95": f"{resampling['resample_time_p95'] * 1000:.1f}ms",
+            "resample_time_max": f"{resampling['resample_time_max'] * 1000:.1f}ms"
+        }
+
+    if "anytime" in optimization_info:
+        anytime = optimization_info["anytime"]
+        performance_info["optimization_tier"] = anytime["tier"]
+        performance_info["optimality_gap"] = anytime["optimality_gap"]
+        performance_info["relative_gap"] = anytime["relative_gap"]
+        performance_info["time_budget"] = f"{anytime['time_budget']:.2f}s"
+        performance_info["tiers"] = [
+            {"tier": attempt["tier"], "status": attempt["status"], "time": f"{attempt['elapsed'] * 1000:.1f}ms",
+             "optimality_gap": attempt.get("optimality_gap"), "bounds": attempt.get("bounds")}
+            for attempt in anytime["tiers"]
+        ]
+
+    return {
+        "allocations": allocations,
+        "explanation": explanation,
+        "total_investment": investment_amount,
+        "method": method,
+        "risk_metrics": risk_metrics,
+        "performance_info": performance_info
+    }
+
+
+def run_cached_optimization(params, stock_data_service, portfolio_optimizer, result_cache, progress=None):
+    """Serve the optimization from the result cache, or run it and cache the result
+
+    Returns (response, cache_key); cache_key is None when the request's data
+    cannot be versioned (e.g. intraday bars) or the result was computed from
+    synthetic fallback data, and the cache was bypassed.
+    """
+    symbols = [stock['symbol'] for stock in params["stocks"]]
+    data_version = stock_data_service.data_version(symbols, params["interval"])
+    if data_version is None:
+        return run_optimization(params, stock_data_service, portfolio_optimizer, progress), None
+
+    cache_key = result_cache.make_key(params, data_version, stock_data_service.risk_free_rates.get()[0])
+    entry = result_cache.get(cache_key)
+    if entry is not None:
+        return result_cache.build_response(entry, params), cache_key
+
+    response = run_optimization(params, stock_data_service, portfolio_optimizer, progress)
+    if response["performance_info"]["data_source"] == "synthetic":
+        # Caching it would keep serving mock results after the provider recovers
+        response["performance_info"]["cache"] = "bypass"
+        return response, None
+    response["performance_info"]["cache"] = "miss"
+
+    # The fetch may have appended new prices, and the rate may have been refreshed, so key the
+    # entry by the version and rate it was computed from
+    cache_key = result_cache.make_key(params, stock_data_service.data_version(symbols, params["interval"]),
+                                      response["risk_metrics"]["risk_free_rate"])
+    result_cache.put(cache_key, response)
+    return response, cache_key
@@ -2,57 +2,106 @@ import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
 import cvxpy as cp
+import threading
+import time
+from resampling import resampled_max_sharpe
+from anytime_optimization import anytime_optimize
+from metrics import stage_timer
+from moments import streaming_moments, streaming_portfolio_returns, stacked_returns
+from market_data_providers import DEFAULT_RISK_FREE_RATE
 
 class PortfolioOptimizer:
-    def __init__(self):
-        pass
+    def __init__(self, periods_per_year=252, risk_free_rates=None):
+        # Bars per year used to annualize moments (252 for daily bars)
+        self.periods_per_year = periods_per_year
+        # Source of the last known risk-free rate (RiskFreeRateService) used in every Sharpe computation
+        self.risk_free_rates = risk_free_rates
+        # Compiled rebalance problems keyed by number of assets, reused across solves
+        self._rebalance_problems = {}
+        self._rebalance_lock = threading.Lock()
     
-    def calculate_portfolio_metrics(self, returns, weights):
+    def calculate_portfolio_metrics(self, returns, weights, periods_per_year=None):
         """Calculate portfolio return, volatility, and Sharpe ratio"""
-        portfolio_return = np.sum(returns.mean() * weights) * 252  # Annualized
-        portfolio_volatility = np.sqrt(np.dot(weights.T, np.dot(returns.cov() * 252, weights)))
+        periods_per_year = periods_per_year or self.periods_per_year
+        portfolio_return = np.sum(returns.mean() * weights) * periods_per_year  # Annualized
+        portfolio_volatility = np.sqrt(np.dot(weights.T, np.dot(returns.cov() * periods_per_year, weights)))
         
         return portfolio_return, portfolio_volatility
     
-    def optimize_portfolio(self, price_data, method="max_sharpe"):
-        """Optimize portfolio using Modern Portfolio Theory"""
-        import time
-        start_time = time.time()
-        
+    def risk_free_rate(self, risk_free_rate=None):
+        """The given rate, else the service's last known rate, else the default"""
+        if risk_free_rate is not None:
+            return risk_free_rate
+        if self.risk_free_rates is not None:
+            return self.risk_free_rates.get()[0]
+        return DEFAULT_RISK_FREE_RATE
+    
+    def estimate_moments(self, price_data, periods_per_year=None):
+        """Annualized mean returns and covariance, streamed in float32 chunks
+
+        Works on DataFrames, arrays and memory-mapped arrays, so peak memory is
+        bounded by the chunk size rather than the history length.
+        """
+        periods_per_year = periods_per_year or self.periods_per_year
+        mean, cov, n_obs = streaming_moments(price_data)
+        columns = price_data.columns if hasattr(price_data, 'columns') else None
+        mu = pd.Series(mean * periods_per_year, index=columns)
+        cov_matrix = pd.DataFrame(cov * periods_per_year, index=columns, columns=columns)
+        return mu, cov_matrix, n_obs
+    
+    def optimize_portfolio(self, price_data, method="max_sharpe", n_resamples=500, diagnostics=None,
+                           periods_per_year=None, risk_free_rate=None, time_budget=None):
+        """Optimize portfolio using Modern Portfolio Theory
+
+        If a diagnostics dict is passed it is filled with method-specific details
+        (e.g. per-resample timings for the resampled method). With a time_budget
+        (seconds, max_sharpe and min_variance only) the best solution found in
+        time is returned and diagnostics["anytime"] says which tier found it.
+        """
+        start_time = time.perf_counter()
         print(f"Starting portfolio optimization...")
         print(f"Data shape: {price_data.shape}")
         print(f"Method: {method}")
         
-        # Calculate returns
-        returns = price_data.pct_change().dropna()
-        
-        n_assets = len(returns.columns)
-        print(f"Number of assets: {n_assets}")
-        print(f"Data points: {len(returns)}")
+        periods_per_year = periods_per_year or self.periods_per_year
+        risk_free_rate = self.risk_free_rate(risk_free_rate)
         
-        # Mean returns (annualized)
-        mu = returns.mean() * 252
+        # Annualized mean returns and covariance matrix
+        with stage_timer("moment_estimation"):
+            mu, cov_matrix, n_obs = self.estimate_moments(price_data, periods_per_year)
         
-        # Covariance matrix (annualized)
-        cov_matrix = returns.cov() * 252
+        n_assets = len(mu)
+        print(f"Number of assets: {n_assets}")
+        print(f"Data points: {n_obs}")
         
         print(f"Computing optimization...")
         
-        if method == "max_sharpe":
-            result = self._maximize_sharpe_ratio(mu, cov_matrix, n_assets)
-        elif method == "min_variance":
-            result = self._minimize_variance(cov_matrix, n_assets)
-        else:
-            # Default to equal weights if optimization fails
-            result = np.array([1/n_assets] * n_assets)
-        
-        end_time = time.time()
-        optimization_time = end_time - start_time
-        print(f"Optimization completed in {optimization_time:.2f} seconds")
+        with stage_timer(f"solve_{method}"):
+            if time_budget is not None and method in ("max_sharpe", "min_variance"):
+                excess_mu = mu.values - risk_free_rate if method == "max_sharpe" else mu.values
+                result, anytime_info = anytime_optimize(excess_mu, cov_matrix.values, method, time_budget,
+                                                        start_time=start_time)
+                print(f"Anytime optimization: {anytime_info['tier']} tier, gap {anytime_info['optimality_gap']:.2e}")
+                if diagnostics is not None:
+                    diagnostics["anytime"] = anytime_info
+            elif method == "max_sharpe":
+                result = self._maximize_sharpe_ratio(mu, cov_matrix, n_assets, risk_free_rate)
+            elif method == "min_variance":
+                result = self._minimize_variance(cov_matrix, n_assets)
+            elif method == "resampled":
+                result, resample_stats = resampled_max_sharpe(
+                    stacked_returns(price_data), n_resamples=n_resamples, periods_per_year=periods_per_year,
+                    risk_free_rate=risk_free_rate
+                )
+                if diagnostics is not None:
+                    diagnostics["resampling"] = resample_stats
+            else:
+                # Default to equal weights if optimization fails
+                result = np.array([1/n_assets] * n_assets)
         
         return result
     
-    def _maximize_sharpe_ratio(self, mu, cov_matrix, n_assets, risk_free_rate=0.02):
+    def _maximize_sharpe_ratio(self, mu, cov_matrix, n_assets, risk_free_rate=None):
         """Maximize Sharpe ratio using convex optimization"""
         try:
             print(f"Setting up optimization problem...")
@@ -61,8 +110,9 @@ class PortfolioOptimizer:
             # Define optimization variables
             weights = cp.Variable(n_assets)
             
-            # Portfolio return and risk
-            portfolio_return = cp.sum(cp.multiply(mu.values, weights))
+            # Portfolio excess return and risk
+            excess_mu = mu.values - self.risk_free_rate(risk_free_rate)
+            portfolio_return = cp.sum(cp.multiply(excess_mu, weights))
             portfolio_risk = cp.quad_form(weights, cov_matrix.values)
             
             print(f"Trying unconstrained optimization first...")
@@ -161,17 +211,113 @@ class PortfolioOptimizer:
             print(f"Error in variance minimization: {e}")
             return np.array([1/n_assets] * n_assets)
     
-    def calculate_risk_metrics(self, price_data, weights):
+    def rebalance_portfolio(self, price_data, current_weights, turnover_penalty=0.005, max_turnover=0.5,
+                            periods_per_year=None):
+        """Rebalance existing holdings towards the max-Sharpe portfolio, penalizing turnover"""
+        mu, cov_matrix, _ = self.estimate_moments(price_data, periods_per_year)
+        return self.rebalance_weights(mu.values, cov_matrix.values, current_weights,
+                                      turnover_penalty=turnover_penalty, max_turnover=max_turnover)
+    
+    def rebalance_weights(self, mu, cov_matrix, current_weights, turnover_penalty=0.005, max_turnover=0.5):
+        """Solve the turnover-aware rebalance QP from precomputed moments
+
+        Maximizes return - 0.5 * risk - turnover_penalty * |w - w0|_1 subject to
+        |w - w0|_1 <= max_turnover, where w0 are the current weights. The compiled
+        problem is reused, so OSQP warm-starts from the previous rebalance solve.
+        """
+        n_assets = len(current_weights)
+        current_weights = np.maximum(np.array(current_weights, dtype=float), 0)
+        if current_weights.sum() > 0:
+            current_weights = current_weights / current_weights.sum()
+        else:
+            current_weights = np.array([1 / n_assets] * n_assets)
+        
+        try:
+            chol_factor = np.linalg.cholesky(np.array(cov_matrix) + np.eye(n_assets) * 1e-10)
+            
+            with self._rebalance_lock:
+                problem, weights, params = self._get_rebalance_problem(n_assets)
+                params["mu"].value = np.array(mu, dtype=float)
+                params["chol"].value = chol_factor
+                params["current"].value = current_weights
+                params["penalty"].value = float(turnover_penalty)
+                params["max_turnover"].value = float(max_turnover)
+                
+                try:
+                    problem.solve(solver=cp.OSQP, warm_start=True, verbose=False)
+                except cp.error.SolverError:
+                    problem.solve(verbose=False)
+                
+                if problem.status in [cp.OPTIMAL, cp.OPTIMAL_INACCURATE] and weights.value is not None:
+                    target_weights = np.maximum(np.array(weights.value), 0)
+                    return target_weights / np.sum(target_weights)
+            
+            print(f"Rebalance optimization status: {problem.status}, keeping current weights")
+            return current_weights
+        
+        except Exception as e:
+            print(f"Error in rebalance optimization: {e}")
+            return current_weights
+    
+    def _get_rebalance_problem(self, n_assets):
+        """Build (once per basket size) the parametrized rebalance problem"""
+        if n_assets not in self._rebalance_problems:
+            weights = cp.Variable(n_assets)
+            params = {
+                "mu": cp.Parameter(n_assets),
+                "chol": cp.Parameter((n_assets, n_assets)),
+                "current": cp.Parameter(n_assets, nonneg=True),
+                "penalty": cp.Parameter(nonneg=True),
+                "max_turnover": cp.Parameter(nonneg=True)
+            }
+            # Trades get their own variable so the penalty * turnover product stays DPP
+            trades = cp.Variable(n_assets)
+            turnover = cp.norm1(trades)
+            objective = cp.Maximize(
+                params["mu"] @ weights
+                - 0.5 * cp.sum_squares(params["chol"].T @ weights)
+                - params["penalty"] * turnover
+            )
+            constraints = [
+                trades == weights - params["current"],
+                cp.sum(weights) == 1,
+                weights >= 0,
+                turnover <= params["max_turnover"]
+            ]
+            self._rebalance_problems[n_assets] = (cp.Problem(objective, constraints), weights, params)
+        return self._rebalance_problems[n_assets]
+    
+    def generate_trade_list(self, symbols, current_weights, target_weights, portfolio_value=None, min_trade=1e-4):
+        """List the trades needed to move from current to target weights"""
+        trades = []
+        for symbol, current, target in zip(symbols, current_weights, target_weights):
+            delta = float(target) - float(current)
+            if abs(delta) < min_trade:
+                continue
+            trade = {
+                "symbol": symbol,
+                "action": "buy" if delta > 0 else "sell",
+                "current_weight": float(current),
+                "target_weight": float(target),
+                "trade_weight": delta
+            }
+            if portfolio_value is not None:
+                trade["trade_amount"] = delta * portfolio_value
+            trades.append(trade)
+        return trades
+    
+    def calculate_risk_metrics(self, price_data, weights, periods_per_year=None, risk_free_rate=None):
         """Calculate risk metrics for the optimized portfolio"""
-        returns = price_data.pct_change().dropna()
+        periods_per_year = periods_per_year or self.periods_per_year
+        risk_free_rate = self.risk_free_rate(risk_free_rate)
         
-        # Portfolio returns
-        portfolio_returns = (returns * weights).sum(axis=1)
+        # Portfolio returns (one value per bar, computed chunk by chunk)
+        portfolio_returns = pd.Series(streaming_portfolio_returns(price_data, weights))
         
         # Annualized metrics
-        annual_return = portfolio_returns.mean() * 252
-        annual_volatility = portfolio_returns.std() * np.sqrt(252)
-        sharpe_ratio = annual_return / annual_volatility if annual_volatility > 0 else 0
+        annual_return = portfolio_returns.mean() * periods_per_year
+        annual_volatility = portfolio_returns.std() * np.sqrt(periods_per_year)
+        sharpe_ratio = (annual_return - risk_free_rate) / annual_volatility if annual_volatility > 0 else 0
         
         # Value at Risk (95% confidence)
         var_95 = np.percentile(portfolio_returns, 5)
@@ -187,14 +333,13 @@ class PortfolioOptimizer:
             "annual_volatility": float(annual_volatility),
             "sharpe_ratio": float(sharpe_ratio),
             "var_95": float(var_95),
-            "max_drawdown": float(max_drawdown)
+            "max_drawdown": float(max_drawdown),
+            "risk_free_rate": float(risk_free_rate)
         }
     
     def generate_explanation(self, symbols, weights, price_data):
         """Generate beginner-friendly explanation of the optimization"""
-        try:            
-            returns = price_data.pct_change().dropna()
-            
+        try:
             # Ensure symbols is a list and weights is a numpy array
             if not isinstance(symbols, list):
                 symbols = list(symbols)
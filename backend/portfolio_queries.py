@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload, load_only
+from models import db, Portfolio, PortfolioStock, ValidatedStock
+
+# Concurrent quote lookups when saving portfolios with unknown symbols
+METADATA_FETCH_WORKERS = 8
+
+
+def list_portfolios(user_id, limit=None, cursor=None):
+    """Serialize a user's portfolios with their holdings in a constant number of queries
+
+    Portfolios are returned in id order. With a limit, at most that many are
+    returned along with the cursor (last portfolio id) to pass for the next
+    page; the cursor is None on the last page.
+    """
+    query = (
+        Portfolio.query
+        .options(selectinload(Portfolio.stocks))
+        .filter(Portfolio.user_id == user_id)
+        .order_by(Portfolio.id)
+    )
+    if cursor is not None:
+        query = query.filter(Portfolio.id > cursor)
+    if limit is not None:
+        # Fetch one extra row to know whether another page exists
+        query = query.limit(limit + 1)
+    portfolios = query.all()
+
+    next_cursor = None
+    if limit is not None and len(portfolios) > limit:
+        portfolios = portfolios[:limit]
+        next_cursor = portfolios[-1].id
+
+    # One bulk lookup for the details of every held symbol
+    symbols = {ps.stock_symbol for portfolio in portfolios for ps in portfolio.stocks}
+    validated_stocks = {}
+    if symbols:
+        rows = (
+            ValidatedStock.query
+            .options(load_only(ValidatedStock.symbol, ValidatedStock.name,
+                               ValidatedStock.industry, ValidatedStock.quality_score))
+            .filter(ValidatedStock.symbol.in_(symbols))
+            .all()
+        )
+        validated_stocks = {row.symbol: row for row in rows}
+
+    portfolio_list = []
+    for portfolio in portfolios:
+        portfolio_stocks = []
+        for ps in portfolio.stocks:
+            validated_stock = validated_stocks.get(ps.stock_symbol)
+            if validated_stock:
+                portfolio_stocks.append({
+                    "symbol": ps.stock_symbol,
+                    "name": validated_stock.name,
+                    "industry": validated_stock.industry,
+                    "weight": ps.weight,
+                    "quality_score": validated_stock.quality_score
+                })
+            else:
+                # Fallback if validated stock not found
+                portfolio_stocks.append({
+                    "symbol": ps.stock_symbol,
+                    "name": ps.stock_symbol,
+                    "industry": "Unknown",
+                    "weight": ps.weight,
+                    "quality_score": 0
+                })
+
+        portfolio_list.append({
+            "id": portfolio.id,
+            "name": portfolio.name,
+            "created_at": portfolio.created_at.isoformat() + "Z" if portfolio.created_at else None,
+            "projected_return": portfolio.projected_return,
+            "stocks": portfolio_stocks
+        })
+
+    return portfolio_list, next_cursor
+
+
+def parse_portfolio_payload(data):
+    """Validate one portfolio body ({name, allocations, projected_return}); raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("Portfolio must be an object")
+    allocations = data.get('allocations') or []
+    if not allocations:
+        raise ValueError("No allocations provided")
+
+    parsed_allocations = []
+    for allocation in allocations:
+        symbol = allocation.get('symbol') if isinstance(allocation, dict) else None
+        if not symbol:
+            raise ValueError("Every allocation needs a symbol")
+        try:
+            weight = float(allocation.get('weight', 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid weight for {symbol}")
+        parsed_allocations.append({
+            "symbol": symbol,
+            "weight": weight,
+            "name": allocation.get('name', symbol),
+            "quality_score": allocation.get('quality_score', 0)
+        })
+
+    return {
+        "name": data.get('name', 'My Portfolio'),
+        "projected_return": data.get('projected_return', 0),
+        "allocations": parsed_allocations
+    }
+
+
+def fetch_missing_stock_metadata(portfolios, stock_data_service, max_workers=METADATA_FETCH_WORKERS):
+    """Build ValidatedStock rows for held symbols that are not in the database yet
+
+    Known symbols are found with one bulk query; quotes for the rest are
+    fetched concurrently. No transaction is held while the quotes are fetched.
+    """
+    allocations_by_symbol = {}
+    for portfolio in portfolios:
+        for allocation in portfolio["allocations"]:
+            allocations_by_symbol.setdefault(allocation["symbol"], allocation)
+
+    known = {
+        symbol for (symbol,) in
+        db.session.query(ValidatedStock.symbol).filter(ValidatedStock.symbol.in_(allocations_by_symbol))
+    }
+    missing = [symbol for symbol in allocations_by_symbol if symbol not in known]
+    # Release the connection before the network calls
+    db.session.rollback()
+    if not missing:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+        infos = list(executor.map(stock_data_service.get_stock_info, missing))
+
+    rows = []
+    for symbol, stock_info in zip(missing, infos):
+        allocation = allocations_by_symbol[symbol]
+        rows.append({
+            "symbol": symbol,
+            "name": allocation["name"],
+            "industry": stock_info.get('sector', 'Unknown') if stock_info else 'Unknown',
+            "current_price": stock_info.get('current_price', 0) if stock_info else 0,
+            "market_cap": stock_info.get('market_cap', 0) if stock_info else 0,
+            "quality_score": allocation["quality_score"]
+        })
+    return rows
+
+
+def save_portfolios(user_id, portfolios, stock_data_service):
+    """Save parsed portfolios for a user in one transaction with bulk inserts
+
+    Returns [(portfolio_id, name)] in input order. The caller commits or
+    rolls back the session.
+    """
+    stock_rows = fetch_missing_stock_metadata(portfolios, stock_data_service)
+
+    if stock_rows:
+        # Another request may have added some of these while quotes were fetched
+        existing = {
+            symbol for (symbol,) in
+            db.session.query(ValidatedStock.symbol).filter(
+                ValidatedStock.symbol.in_([row["symbol"] for row in stock_rows]))
+        }
+        stock_rows = [row for row in stock_rows if row["symbol"] not in existing]
+        if stock_rows:
+            db.session.execute(insert(ValidatedStock), stock_rows)
+
+    # Ids must come back in input order; SQLAlchemy batches this where the
+    # backend can guarantee that and falls back to one row per statement on SQLite
+    portfolio_ids = db.session.execute(
+        insert(Portfolio).returning(Portfolio.id, sort_by_parameter_order=True),
+        [
+            {"user_id": user_id, "name": portfolio["name"], "projected_return": portfolio["projected_return"]}
+            for portfolio in portfolios
+        ]
+    ).scalars().all()
+
+    db.session.execute(insert(PortfolioStock), [
+        {"portfolio_id": portfolio_id, "stock_symbol": allocation["symbol"], "weight": allocation["weight"]}
+        for portfolio_id, portfolio in zip(portfolio_ids, portfolios)
+        for allocation in portfolio["allocations"]
+    ])
+
+    return [(portfolio_id, portfolio["name"]) for portfolio_id, portfolio in zip(portfolio_ids, portfolios)]
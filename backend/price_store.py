@@ -0,0 +1,128 @@
+import os
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'price_store')
+# Exchange time zone and the local time after which the day's closing bar is final
+# (the closing auction prints after 16:00, so a margin is left)
+MARKET_TIMEZONE = os.getenv('MARKET_TIMEZONE', 'America/New_York')
+MARKET_CLOSE_TIME = os.getenv('MARKET_CLOSE_TIME', '16:30')
+
+
+def last_closed_session(now=None):
+    """Date of the most recent session whose closing bar is final"""
+    now = now or datetime.now(ZoneInfo(MARKET_TIMEZONE))
+    today = pd.Timestamp(now.date())
+    if now.strftime('%H:%M') < MARKET_CLOSE_TIME:
+        return today - pd.Timedelta(days=1)
+    return today
+
+
+def closed_sessions(series):
+    """Drop bars of sessions that have not closed yet
+
+    Providers return the current session's bar while it trades; storing it
+    would leave a partial close that later reads as a corporate action when
+    the final close is fetched.
+    """
+    return series[pd.DatetimeIndex(series.index).normalize() <= last_closed_session()]
+
+
+class PriceStore:
+    """Local on-disk store of daily adjusted close prices, one CSV per symbol"""
+
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir or os.getenv('PRICE_STORE_DIR', DEFAULT_STORE_DIR)
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._series = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol):
+        return os.path.join(self.root_dir, f"{symbol.upper().replace('/', '_')}.csv")
+
+    def _file_version(self, symbol):
+        try:
+            stat = os.stat(self._path(symbol))
+            return f"{stat.st_mtime_ns}-{stat.st_size}"
+        except FileNotFoundError:
+            return None
+
+    def get_series(self, symbol):
+        """Return the stored close series for a symbol, or None if it is not stored"""
+        version = self._file_version(symbol)
+        if version is None:
+            return None
+        with self._lock:
+            # Reload when another worker or process appended to the file
+            if self._versions.get(symbol) != version:
+                series = pd.read_csv(self._path(symbol), index_col=0, parse_dates=True)['Close']
+                series.name = symbol
+                self._series[symbol] = series
+                self._versions[symbol] = version
+            return self._series[symbol]
+
+    def get_prices(self, symbols, start=None, end=None):
+        """Return aligned close prices for the symbols between start and end (inclusive)"""
+        columns = {}
+        for symbol in symbols:
+            series = self.get_series(symbol)
+            if series is None:
+                return pd.DataFrame()
+            columns[symbol] = series.loc[start:end]
+        return pd.DataFrame(columns).dropna()
+
+    def append_bars(self, symbol, bars):
+        """Merge a provider's OHLCV bars for one symbol (adjusted closes) into the store"""
+        close = bars['Adj Close'] if 'Adj Close' in bars.columns else bars['Close']
+        close = close.dropna()
+        if close.empty:
+            return
+        index = pd.DatetimeIndex(close.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        self.append(pd.DataFrame({symbol: close.to_numpy()}, index=index.normalize()))
+
+    def replace(self, symbol, series):
+        """Overwrite the stored close series of a symbol (e.g. after the provider re-adjusted history)"""
+        series = closed_sessions(series.dropna()).sort_index()
+        series = series[~series.index.duplicated(keep='last')]
+        series.index.name = 'Date'
+        tmp_path = self._path(symbol) + '.tmp'
+        series.to_frame('Close').to_csv(tmp_path)
+        os.replace(tmp_path, self._path(symbol))
+
+    def append(self, price_data):
+        """Merge new rows of a (dates x symbols) price frame into the store
+
+        Every write (fetched histories, validation bars, incremental tails)
+        goes through here or replace, which both keep closed sessions only.
+        """
+        for symbol in price_data.columns:
+            new_rows = closed_sessions(price_data[symbol].dropna())
+            if new_rows.empty:
+                continue
+            existing = self.get_series(symbol)
+            if existing is not None:
+                new_rows = new_rows[~new_rows.index.isin(existing.index)]
+                if new_rows.empty:
+                    continue
+                merged = pd.concat([existing, new_rows]).sort_index()
+            else:
+                merged = new_rows.sort_index()
+
+            merged.index.name = 'Date'
+            frame = merged.to_frame('Close')
+            tmp_path = self._path(symbol) + '.tmp'
+            frame.to_csv(tmp_path)
+            os.replace(tmp_path, self._path(symbol))
+
+    def symbols(self):
+        """List the symbols currently held in the store"""
+        return sorted(name[:-4] for name in os.listdir(self.root_dir) if name.endswith('.csv'))
+
+    def version(self, symbols):
+        """Version token for the stored data of the symbols; changes whenever any of them is appended to"""
+        return "|".join(f"{symbol}:{self._file_version(symbol)}" for symbol in sorted(symbols))
@@ -0,0 +1,112 @@
+import os
+import hmac
+import uuid
+import random
+import pstats
+import cProfile
+from flask import g, request
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'profiles')
+
+
+class RequestProfiler:
+    """Opt-in cProfile wrapper for individual requests
+
+    A request is profiled when its `X-Profile` header carries the configured
+    token (PROFILE_TOKEN; without one the header is ignored) or it is picked
+    by the sampling rate. The profile is saved as <profile_dir>/<request_id>.prof,
+    keeping only the newest max_files dumps, and the top-N functions by self
+    time are added to JSON responses under "profile". Unprofiled requests only
+    pay for a header lookup and, if sampling is on, one random draw.
+    """
+
+    def __init__(self, app=None, sample_rate=None, profile_dir=None, top_n=None, token=None, max_files=None):
+        self.sample_rate = float(sample_rate if sample_rate is not None else os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.profile_dir = profile_dir or os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        self.top_n = int(top_n or os.getenv('PROFILE_TOP_N', 20))
+        # The X-Profile header must carry this token; unset, only sampling profiles requests
+        self.token = token or os.getenv('PROFILE_TOKEN')
+        # Older dumps beyond this many are deleted
+        self.max_files = int(max_files or os.getenv('PROFILE_MAX_FILES', 200))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _requested(self):
+        header = request.headers.get('X-Profile')
+        if header and self.token:
+            return hmac.compare_digest(header.encode(), self.token.encode())
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._requested():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return
+        g.profiler = profiler
+        g.profile_request_id = request.headers.get('X-Request-Id') or uuid.uuid4().hex
+
+    def _finish(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+
+        request_id = "".join(c for c in g.profile_request_id if c.isalnum() or c in '-_')[:64] or uuid.uuid4().hex
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile_path = os.path.join(self.profile_dir, f"{request_id}.prof")
+            profiler.dump_stats(profile_path)
+            self._rotate()
+        except OSError as e:
+            print(f"Error saving profile {request_id}: {e}")
+
+        response.headers['X-Request-Id'] = request_id
+        if response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                body["profile"] = {
+                    "request_id": request_id,
+                    "top_functions": self.top_functions(profiler)
+                }
+                response.set_data(response.json_module.dumps(body))
+        return response
+
+    def _rotate(self):
+        """Delete the oldest dumps beyond max_files"""
+        dumps = []
+        for name in os.listdir(self.profile_dir):
+            if name.endswith('.prof'):
+                path = os.path.join(self.profile_dir, name)
+                try:
+                    dumps.append((os.path.getmtime(path), path))
+                except OSError:
+                    # Removed by a concurrent rotation
+                    continue
+        dumps.sort()
+        for _, path in dumps[:max(0, len(dumps) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def top_functions(self, profiler):
+        """Top-N functions by self time"""
+        stats = pstats.Stats(profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+        return [
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": primitive_calls,
+                "self_time": round(self_time, 6),
+                "cumulative_time": round(cumulative_time, 6)
+            }
+            for (filename, line, name), (primitive_calls, _, self_time, cumulative_time, _) in rows
+        ]
@@ -0,0 +1,105 @@
+import time
+import argparse
+import numpy as np
+from models import db, Portfolio
+
+# Fewest daily closes common to a portfolio's holdings to estimate its moments from
+MIN_COMMON_BARS = 20
+
+
+def rebalance_portfolios(portfolios, stock_data_service, portfolio_optimizer, data_period='2y',
+                         turnover_penalty=0.005, max_turnover=0.5, apply=False):
+    """Rebalance many saved portfolios with one data fetch
+
+    History is fetched once for the union of all held symbols, real prices
+    only and each symbol's series kept as is (get_symbol_histories), so a
+    late-listed symbol does not truncate everyone's history. Moments are
+    estimated per portfolio over the window all its symbols trade, and each
+    portfolio solves with the optimizer's compiled rebalance problem. A
+    portfolio with a symbol that has no real prices, or too short a common
+    window, is reported as an error and never has its weights changed.
+    """
+    start_time = time.time()
+
+    holdings = {}
+    for portfolio in portfolios:
+        if portfolio.stocks:
+            holdings[portfolio.id] = (portfolio, [(ps.stock_symbol, ps.weight) for ps in portfolio.stocks])
+
+    universe = sorted({symbol for _, stocks in holdings.values() for symbol, _ in stocks})
+    if not universe:
+        return []
+
+    historical_data = stock_data_service.get_symbol_histories(universe, period=data_period)
+    available = {symbol for symbol in historical_data.columns if historical_data[symbol].notna().any()}
+
+    results = []
+    applied = 0
+    for portfolio, stocks in holdings.values():
+        symbols = [symbol for symbol, _ in stocks]
+        missing = [symbol for symbol in symbols if symbol not in available]
+        if missing:
+            results.append({
+                "portfolio_id": portfolio.id,
+                "error": f"No historical data for: {', '.join(missing)}"
+            })
+            continue
+
+        common = historical_data[symbols].dropna()
+        if len(common) < MIN_COMMON_BARS:
+            results.append({
+                "portfolio_id": portfolio.id,
+                "error": f"Only {len(common)} days of history common to all holdings"
+            })
+            continue
+
+        mu, cov_matrix, _ = portfolio_optimizer.estimate_moments(common)
+        current_weights = np.array([weight for _, weight in stocks], dtype=float)
+        target_weights = portfolio_optimizer.rebalance_weights(
+            mu.values, cov_matrix.values, current_weights,
+            turnover_penalty=turnover_penalty, max_turnover=max_turnover
+        )
+
+        if apply:
+            for ps, target in zip(portfolio.stocks, target_weights):
+                ps.weight = float(target)
+            applied += 1
+
+        results.append({
+            "portfolio_id": portfolio.id,
+            "turnover": float(np.abs(target_weights - current_weights / current_weights.sum()).sum()),
+            "trades": portfolio_optimizer.generate_trade_list(symbols, current_weights, target_weights)
+        })
+
+    if applied:
+        db.session.commit()
+
+    print(f"Rebalanced {len(results)} portfolios over {len(universe)} symbols in {time.time() - start_time:.2f} seconds")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Nightly rebalance of saved portfolios")
+    parser.add_argument('--user-id', type=int, help="Only rebalance this user's portfolios")
+    parser.add_argument('--period', default='2y')
+    parser.add_argument('--turnover-penalty', type=float, default=0.005)
+    parser.add_argument('--max-turnover', type=float, default=0.5)
+    parser.add_argument('--apply', action='store_true', help="Persist the new weights")
+    args = parser.parse_args()
+
+    from app import app, stock_data_service, portfolio_optimizer
+
+    with app.app_context():
+        query = Portfolio.query.options(db.selectinload(Portfolio.stocks))
+        if args.user_id:
+            query = query.filter_by(user_id=args.user_id)
+        results = rebalance_portfolios(
+            query.all(), stock_data_service, portfolio_optimizer,
+            data_period=args.period, turnover_penalty=args.turnover_penalty,
+            max_turnover=args.max_turnover, apply=args.apply
+        )
+        for result in results:
+            if "error" in result:
+                print(f"Portfolio {result['portfolio_id']}: {result['error']}")
+            else:
+                print(f"Portfolio {result['portfolio_id']}: {len(result['trades'])} trades, turnover {result['turnover']:.1%}")
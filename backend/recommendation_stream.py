@@ -0,0 +1,100 @@
+import json
+import time
+import traceback
+
+# Recommendations kept after validation, as in GeminiService.get_validated_stock_recommendations
+MAX_RECOMMENDATIONS = 20
+
+
+def format_price(value):
+    try:
+        price = float(value)
+    except (ValueError, TypeError):
+        return 'N/A'
+    return f"${price:.2f}" if price > 0 else 'N/A'
+
+
+def format_market_cap(value):
+    if not value:
+        return 'N/A'
+    try:
+        market_cap = float(value)
+    except (ValueError, TypeError):
+        return 'N/A'
+    if market_cap > 1_000_000_000:
+        return f"${market_cap/1_000_000_000:.1f}B"
+    if market_cap > 1_000_000:
+        return f"${market_cap/1_000_000:.1f}M"
+    return f"${market_cap:,.0f}"
+
+
+def recommendation_payload(stock, stock_info):
+    """JSON-safe recommended stock with its display-formatted price and market cap"""
+    payload = {
+        'symbol': stock['symbol'],
+        'name': stock['name'],
+        'industry': stock['industry'],
+        'description': stock['description'],
+        'current_price': format_price(stock_info['current_price']) if stock_info else 'N/A',
+        'market_cap': format_market_cap(stock_info['market_cap']) if stock_info else 'N/A'
+    }
+    if 'quality_score' in stock:
+        payload['quality_score'] = float(stock['quality_score'])
+    return payload
+
+
+def recommendation_events(industries, gemini_service, validator, stock_data_service, max_stocks=MAX_RECOMMENDATIONS):
+    """(event, data) pairs for a recommendation request, yielded as each stage completes
+
+    started -> generated (Gemini's candidate tickers) -> one stock or rejected
+    event per candidate as it is validated (passing stocks with their score
+    and formatted quote) -> done with the final ranking, the same list
+    /api/stocks/recommend returns. Failures end the stream with a failed
+    event (not "error", which EventSource reserves for connection errors).
+    Every event carries the seconds elapsed since the start.
+    """
+    start_time = time.perf_counter()
+
+    def event(name, **data):
+        data["elapsed"] = round(time.perf_counter() - start_time, 3)
+        return name, data
+
+    try:
+        yield event("started", industries=industries)
+
+        candidates = gemini_service.get_stock_recommendations(industries)
+        yield event("generated", count=len(candidates), stocks=[
+            {"symbol": stock['symbol'], "name": stock['name'], "industry": stock['industry']} for stock in candidates
+        ])
+        if not candidates:
+            yield event("failed", error="No recommendations received from Gemini")
+            return
+
+        passed = []
+        payloads = {}
+        for stock, validation_result in validator.iter_validate(candidates):
+            if not validation_result['is_valid']:
+                yield event("rejected", symbol=stock['symbol'], reason=validation_result['failure_reason'])
+                continue
+            enhanced_stock = {**stock, **validation_result}
+            passed.append(enhanced_stock)
+            payloads[stock['symbol']] = recommendation_payload(
+                enhanced_stock, stock_data_service.get_stock_info(stock['symbol'])
+            )
+            yield event("stock", stock=payloads[stock['symbol']])
+
+        ranked = validator.rank(passed, max_stocks, original_count=len(candidates))
+        if not ranked:
+            yield event("failed", error="No stocks passed quality validation")
+            return
+        yield event("done", stocks=[payloads[stock['symbol']] for stock in ranked])
+
+    except Exception as e:
+        print(f"Recommendation stream error: {e}")
+        traceback.print_exc()
+        yield event("failed", error=f"Stock recommendation failed: {str(e)}")
+
+
+def format_event(name, data):
+    """One Server-Sent Events message"""
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
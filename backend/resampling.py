@@ -0,0 +1,133 @@
+import os
+import time
+import numpy as np
+import cvxpy as cp
+from concurrent.futures import ProcessPoolExecutor
+from metrics import STAGE_DURATION
+
+# Compiled max-Sharpe problems, cached per worker process and keyed by number of assets
+_compiled_problems = {}
+
+# Process pool shared by every resampled optimization request, and its worker count
+_pool = None
+_pool_workers = 0
+
+
+def _get_pool():
+    """Lazily create the process pool used for resampled solves"""
+    global _pool, _pool_workers
+    if _pool is None:
+        _pool_workers = int(os.getenv('RESAMPLE_WORKERS', os.cpu_count() or 1))
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+    return _pool
+
+
+def shutdown_pool():
+    """Shut down the shared process pool (used on app teardown and in tests)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def _get_compiled_problem(n_assets):
+    """Build (once per process) a parametrized long-only max-Sharpe problem"""
+    if n_assets not in _compiled_problems:
+        weights = cp.Variable(n_assets)
+        mu = cp.Parameter(n_assets)
+        # Covariance enters through its Cholesky factor so the problem stays DPP
+        # and cvxpy only canonicalizes it once
+        chol = cp.Parameter((n_assets, n_assets))
+
+        objective = cp.Maximize(mu @ weights - 0.5 * cp.sum_squares(chol.T @ weights))
+        constraints = [
+            cp.sum(weights) == 1,
+            weights >= 0
+        ]
+        _compiled_problems[n_assets] = (cp.Problem(objective, constraints), weights, mu, chol)
+    return _compiled_problems[n_assets]
+
+
+def _solve_resample_chunk(returns, seeds, periods_per_year, risk_free_rate):
+    """Solve the max-Sharpe problem for one bootstrap resample per seed"""
+    n_obs, n_assets = returns.shape
+    problem, weights, mu, chol = _get_compiled_problem(n_assets)
+
+    results = []
+    for seed in seeds:
+        start_time = time.time()
+        rng = np.random.default_rng(seed)
+        sample = returns[rng.integers(0, n_obs, size=n_obs)]
+
+        sample_cov = np.cov(sample, rowvar=False) * periods_per_year
+        # Small ridge keeps the factorization stable for short or collinear samples
+        sample_cov += np.eye(n_assets) * 1e-10
+        mu.value = sample.mean(axis=0) * periods_per_year - risk_free_rate
+        chol.value = np.linalg.cholesky(sample_cov)
+
+        resample_weights = None
+        try:
+            problem.solve(verbose=False)
+            if problem.status in [cp.OPTIMAL, cp.OPTIMAL_INACCURATE] and weights.value is not None:
+                resample_weights = np.maximum(np.array(weights.value), 0)
+                resample_weights = resample_weights / np.sum(resample_weights)
+        except Exception as e:
+            print(f"Resample {seed} failed: {e}")
+
+        results.append((seed, resample_weights, time.time() - start_time))
+    return results
+
+
+def resampled_max_sharpe(returns, n_resamples=500, periods_per_year=252, risk_free_rate=0.0,
+                         seed=None, n_workers=None):
+    """Average max-Sharpe weights over bootstrap resamples of the returns matrix
+
+    Resamples are split into one chunk per worker and solved in the shared
+    process pool. Returns the averaged weights and per-resample statistics.
+    """
+    returns = np.ascontiguousarray(returns, dtype=np.float64)
+    n_assets = returns.shape[1]
+
+    seed_sequence = np.random.SeedSequence(seed)
+    seeds = [int(s.generate_state(1)[0]) for s in seed_sequence.spawn(n_resamples)]
+
+    pool = _get_pool()
+    n_chunks = n_workers or _pool_workers
+    chunks = [chunk.tolist() for chunk in np.array_split(seeds, n_chunks) if len(chunk) > 0]
+
+    start_time = time.time()
+    futures = [
+        pool.submit(_solve_resample_chunk, returns, chunk, periods_per_year, risk_free_rate)
+        for chunk in chunks
+    ]
+
+    solved = []
+    resample_times = []
+    for future in futures:
+        for _, resample_weights, elapsed in future.result():
+            resample_times.append(elapsed)
+            STAGE_DURATION.observe(elapsed, stage="resample_solve")
+            if resample_weights is not None:
+                solved.append(resample_weights)
+    wall_time = time.time() - start_time
+
+    if solved:
+        averaged = np.mean(solved, axis=0)
+        averaged = averaged / np.sum(averaged)
+    else:
+        averaged = np.array([1 / n_assets] * n_assets)
+
+    resample_times = np.array(resample_times)
+    stats = {
+        "n_resamples": n_resamples,
+        "n_solved": len(solved),
+        "n_chunks": len(chunks),
+        "wall_time": wall_time,
+        "resample_time_mean": float(resample_times.mean()) if len(resample_times) else 0.0,
+        "resample_time_p95": float(np.percentile(resample_times, 95)) if len(resample_times) else 0.0,
+        "resample_time_max": float(resample_times.max()) if len(resample_times) else 0.0,
+        "weights_std": np.std(solved, axis=0).tolist() if solved else [0.0] * n_assets
+    }
+    if len(solved) < n_resamples:
+        print(f"Resampled max-Sharpe: {n_resamples - len(solved)} of {n_resamples} resamples failed")
+    return averaged, stats
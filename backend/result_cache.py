@@ -0,0 +1,91 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from metrics import CACHE_HITS, CACHE_MISSES
+
+
+class OptimizationResultCache:
+    """LRU cache of optimize responses keyed by basket, period, method, data version and risk-free rate
+
+    Entries store weights per symbol, so a hit can serve any request for the
+    same symbol set: allocations are rebuilt in the request's order and
+    amounts are rescaled to its investment_amount. The price-data version is
+    part of the key, so appending new prices for any symbol in the basket
+    makes older entries unreachable; so does a refresh that changes the
+    risk-free rate, which moves max-Sharpe weights and the reported Sharpe.
+    """
+
+    def __init__(self, max_entries=512, ttl=900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, params, data_version, risk_free_rate):
+        key_fields = {
+            "symbols": sorted(stock['symbol'] for stock in params["stocks"]),
+            "data_period": params["data_period"],
+            "interval": params["interval"],
+            "method": params["method"],
+            "n_resamples": params["n_resamples"] if params["method"] == "resampled" else None,
+            "time_budget": params.get("time_budget"),
+            "data_version": data_version,
+            "risk_free_rate": float(risk_free_rate)
+        }
+        return hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode()).hexdigest()
+
+    def make_etag(self, key, params):
+        """Validator for the exact response body: cache key plus amount, order and names"""
+        body_fields = [key, params["investment_amount"],
+                       [(stock['symbol'], stock.get('name')) for stock in params["stocks"]]]
+        return hashlib.sha256(json.dumps(body_fields).encode()).hexdigest()[:32]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["stored_at"] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                CACHE_MISSES.inc(cache="optimize_result")
+                return None
+            self._entries.move_to_end(key)
+        CACHE_HITS.inc(cache="optimize_result")
+        return entry
+
+    def put(self, key, response):
+        entry = {
+            "stored_at": time.time(),
+            "weights": {allocation["symbol"]: allocation["weight"] for allocation in response["allocations"]},
+            "response": response
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def build_response(self, entry, params):
+        """Rebuild a cached response for this request's stock order, names and amount"""
+        investment_amount = params["investment_amount"]
+        allocations = [
+            {
+                "symbol": stock['symbol'],
+                "weight": entry["weights"][stock['symbol']],
+                "amount": float(entry["weights"][stock['symbol']] * investment_amount),
+                "name": stock.get('name', stock['symbol'])
+            }
+            for stock in params["stocks"]
+        ]
+        return {
+            **entry["response"],
+            "allocations": allocations,
+            "total_investment": investment_amount,
+            "performance_info": {"cache": "hit", "cached_at": entry["stored_at"], "data_source": "market"}
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
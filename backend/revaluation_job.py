@@ -0,0 +1,172 @@
+import time
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy.orm import selectinload
+from models import db, Portfolio
+from shared_panels import period_start
+
+# Saved portfolios store weights only, so values are reported for this initial investment
+DEFAULT_INVESTMENT_AMOUNT = 10000
+# Shortest provider period covering the oldest inception date is fetched
+REVALUATION_PERIODS = ('1mo', '3mo', '6mo', '1y', '2y', '5y', '10y')
+
+
+def load_holdings(user_id=None):
+    """Plain (id, name, created_at, [(symbol, weight)]) tuples for a user's portfolios, or everyone's
+
+    Read in two queries; the connection is released before any prices are fetched.
+    """
+    query = Portfolio.query.options(selectinload(Portfolio.stocks)).order_by(Portfolio.id)
+    if user_id is not None:
+        query = query.filter(Portfolio.user_id == user_id)
+    holdings = [
+        (portfolio.id, portfolio.name, portfolio.created_at, [(ps.stock_symbol, ps.weight) for ps in portfolio.stocks])
+        for portfolio in query.all()
+    ]
+    db.session.rollback()
+    return holdings
+
+
+def revaluation_period(inception_dates, now=None):
+    """Shortest provider period whose history starts before every inception date"""
+    earliest = min(inception_dates)
+    for period in REVALUATION_PERIODS:
+        # A few days of slack so the inception bar itself is included
+        if period_start(period, end=now) <= earliest - pd.Timedelta(days=7):
+            return period
+    return 'max'
+
+
+def revalue_portfolios(holdings, stock_data_service, investment_amount=DEFAULT_INVESTMENT_AMOUNT):
+    """Mark every portfolio to market with one price fetch and one sparse product
+
+    Each portfolio is treated as bought and held at the close on or before
+    its creation date. History is fetched once for the union of held symbols,
+    each symbol's series kept as is (outer-joined, so a late-listed symbol
+    does not truncate everyone's history) and real prices only: a symbol
+    without real prices is reported as an error, never valued with mock data.
+    The units held per unit of initial value, weight / inception price, form a
+    sparse (portfolios x symbols) matrix; multiplying it by the latest price
+    vector gives every portfolio's growth since inception at once.
+    """
+    start_time = time.time()
+    holdings = [holding for holding in holdings if holding[3]]
+    universe = sorted({symbol for _, _, _, stocks in holdings for symbol, _ in stocks})
+    if not universe:
+        return {"as_of": None, "investment_amount": investment_amount, "symbols": 0, "portfolios": []}
+
+    inception_dates = [pd.Timestamp(created_at or pd.Timestamp.now()).normalize() for _, _, created_at, _ in holdings]
+    historical_data = stock_data_service.get_symbol_histories(universe, period=revaluation_period(inception_dates))
+    if historical_data.empty:
+        return {"as_of": None, "investment_amount": investment_amount, "symbols": len(universe), "portfolios": [
+            {"portfolio_id": portfolio_id, "name": name, "error": "No price data"}
+            for portfolio_id, name, _, _ in holdings
+        ]}
+    # Carry each symbol's last close over bars it did not trade; bars before its first close stay NaN
+    historical_data = historical_data.sort_index().ffill()
+    dates = pd.DatetimeIndex(historical_data.index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    prices = historical_data.to_numpy(dtype=float)
+    latest_prices = prices[-1]
+    column_index = {symbol: i for i, symbol in enumerate(historical_data.columns)}
+
+    results = []
+    rows, cols, units, valued = [], [], [], []
+    for (portfolio_id, name, created_at, stocks), inception in zip(holdings, inception_dates):
+        result = {
+            "portfolio_id": portfolio_id,
+            "name": name,
+            "created_at": created_at.isoformat() + "Z" if created_at else None
+        }
+        results.append(result)
+
+        missing = [symbol for symbol, _ in stocks if symbol not in column_index]
+        # Last bar on or before the inception date
+        bar = dates.searchsorted(inception, side='right') - 1
+        if missing:
+            result["error"] = f"No price data for: {', '.join(missing)}"
+            continue
+        if bar < 0:
+            result["error"] = "No price data at inception"
+            continue
+
+        idx = np.array([column_index[symbol] for symbol, _ in stocks])
+        weights = np.array([weight for _, weight in stocks], dtype=float)
+        inception_prices = prices[bar, idx]
+        if np.isnan(inception_prices).any():
+            unpriced = [symbol for (symbol, _), price in zip(stocks, inception_prices) if np.isnan(price)]
+            result["error"] = f"No price data at inception for: {', '.join(unpriced)}"
+            continue
+        if weights.sum() <= 0 or not np.all(inception_prices > 0):
+            result["error"] = "Invalid weights or inception prices"
+            continue
+
+        row = len(valued)
+        rows.extend([row] * len(idx))
+        cols.extend(idx)
+        units.extend(weights / weights.sum() / inception_prices)
+        valued.append((result, stocks, dates[bar], inception_prices))
+
+    if valued:
+        unit_matrix = sparse.csr_matrix((units, (rows, cols)), shape=(len(valued), len(column_index)))
+        growth = unit_matrix @ latest_prices
+        # Value of each holding per unit of initial value, in the same sparse layout
+        holding_values = unit_matrix.multiply(latest_prices).tocsr()
+
+        for row, (result, stocks, inception_date, inception_prices) in enumerate(valued):
+            current_value = float(investment_amount * growth[row])
+            start, end = holding_values.indptr[row], holding_values.indptr[row + 1]
+            values = dict(zip(holding_values.indices[start:end], holding_values.data[start:end]))
+            result.update({
+                "inception_date": inception_date.strftime('%Y-%m-%d'),
+                "initial_value": float(investment_amount),
+                "current_value": current_value,
+                "pnl": current_value - investment_amount,
+                "return_since_inception": float(growth[row] - 1),
+                "holdings": [
+                    {
+                        "symbol": symbol,
+                        "weight": float(weight),
+                        "current_weight": float(values.get(column_index[symbol], 0.0) / growth[row]),
+                        "inception_price": float(inception_price),
+                        "current_price": float(latest_prices[column_index[symbol]]),
+                        "return_since_inception": float(latest_prices[column_index[symbol]] / inception_price - 1)
+                    }
+                    for (symbol, weight), inception_price in zip(stocks, inception_prices)
+                ]
+            })
+
+    print(f"Revalued {len(valued)} portfolios over {len(universe)} symbols in {time.time() - start_time:.2f} seconds")
+    return {
+        "as_of": dates[-1].strftime('%Y-%m-%d'),
+        "investment_amount": investment_amount,
+        "symbols": len(universe),
+        "portfolios": results
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mark saved portfolios to market")
+    parser.add_argument('--user-id', type=int, help="Only revalue this user's portfolios")
+    parser.add_argument('--investment-amount', type=float, default=DEFAULT_INVESTMENT_AMOUNT)
+    parser.add_argument('--output', help="Write the revaluation as JSON to this path")
+    args = parser.parse_args()
+
+    from app import app, stock_data_service
+
+    with app.app_context():
+        revaluation = revalue_portfolios(load_holdings(args.user_id), stock_data_service,
+                                         investment_amount=args.investment_amount)
+    for result in revaluation["portfolios"]:
+        if "error" in result:
+            print(f"Portfolio {result['portfolio_id']}: {result['error']}")
+        else:
+            print(f"Portfolio {result['portfolio_id']}: {result['current_value']:,.2f} "
+                  f"({result['return_since_inception']:+.2%} since {result['inception_date']})")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(revaluation, f, indent=2)
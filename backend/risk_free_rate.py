@@ -0,0 +1,71 @@
+import os
+import time
+import threading
+from market_data_providers import DEFAULT_RISK_FREE_RATE
+from metrics import PROVIDER_FAILURES, RISK_FREE_RATE
+
+
+class RiskFreeRateService:
+    """Risk-free rate refreshed in the background and served instantly
+
+    get() returns the last known (rate, as_of) without touching the provider;
+    until the first successful fetch that is (DEFAULT_RISK_FREE_RATE, None).
+    start() launches a daemon thread that fetches immediately and then every
+    refresh_seconds (RISK_FREE_REFRESH_SECONDS, default 1h), retrying failed
+    fetches after retry_seconds while the previous value keeps being served.
+    """
+
+    def __init__(self, provider, refresh_seconds=None, retry_seconds=None, default_rate=DEFAULT_RISK_FREE_RATE,
+                 clock=time.time):
+        self.provider = provider
+        self.refresh_seconds = float(refresh_seconds or os.getenv('RISK_FREE_REFRESH_SECONDS', 3600))
+        self.retry_seconds = float(retry_seconds or os.getenv('RISK_FREE_RETRY_SECONDS', 60))
+        self._clock = clock
+        self._rate = default_rate
+        self._as_of = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        RISK_FREE_RATE.set(default_rate, provider=provider.name)
+
+    def get(self):
+        """Last known (annual rate as a decimal, fetch time in epoch seconds or None)"""
+        with self._lock:
+            return self._rate, self._as_of
+
+    def refresh(self):
+        """Fetch the rate from the provider now; returns whether it succeeded"""
+        try:
+            rate = float(self.provider.risk_free_rate())
+        except Exception as e:
+            PROVIDER_FAILURES.inc(provider=self.provider.name, operation="risk_free_rate")
+            print(f"Error refreshing risk-free rate: {e}")
+            return False
+
+        with self._lock:
+            self._rate = rate
+            self._as_of = self._clock()
+        RISK_FREE_RATE.set(rate, provider=self.provider.name)
+        return True
+
+    def start(self):
+        """Start the background refresh thread (once per process; a forked child starts its own)"""
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="risk-free-rate-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.refresh_seconds if self.refresh() else self.retry_seconds
+            self._stop.wait(wait)
+
+    def to_dict(self):
+        rate, as_of = self.get()
+        return {"rate": rate, "as_of": as_of, "provider": self.provider.name}
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import uuid
+import threading
+import numpy as np
+import pandas as pd
+
+DEFAULT_PANEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'shared_panels')
+
+# Panels whose last bar is older than this are not served (covers weekends and holidays)
+PANEL_MAX_STALENESS_DAYS = int(os.getenv('PANEL_MAX_STALENESS_DAYS', 4))
+
+PERIOD_OFFSETS = {
+    '5d': pd.DateOffset(days=5), '1mo': pd.DateOffset(months=1), '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6), '1y': pd.DateOffset(years=1), '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5), '10y': pd.DateOffset(years=10)
+}
+
+
+def period_start(period, end=None):
+    """First date covered by a provider period string ("2y", "6mo", "ytd"); None for "max" or unknown"""
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize()
+    if period == 'ytd':
+        return pd.Timestamp(year=end.year, month=1, day=1)
+    if period in PERIOD_OFFSETS:
+        return end - PERIOD_OFFSETS[period]
+    return None
+
+
+class SharedPanelStore:
+    """Daily price panels shared by every worker process through memory-mapped files
+
+    A loader publishes a (symbols x dates) float32 array as a .npy file plus a
+    small JSON index of symbols and dates. Workers map the file read-only and
+    serve requests as DataFrames of per-symbol views into it, so the pages
+    live once in the OS page cache however many workers there are. Publishing
+    writes a new file and swaps the index with os.replace; workers pick up the
+    new panel on their next read, and old files stay valid until unmapped.
+    """
+
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir or os.getenv('SHARED_PANEL_DIR', DEFAULT_PANEL_DIR)
+        self._panels = {}
+        self._lock = threading.Lock()
+
+    def _index_path(self, name):
+        return os.path.join(self.root_dir, f"{name}.json")
+
+    def publish(self, price_data, name="daily"):
+        """Publish a (dates x symbols) price frame as the shared panel"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        price_data = price_data.sort_index().ffill()
+        symbols = [str(symbol) for symbol in price_data.columns]
+
+        array_file = f"{name}-{uuid.uuid4().hex}.npy"
+        array_path = os.path.join(self.root_dir, array_file)
+        panel = np.lib.format.open_memmap(array_path + ".tmp", mode='w+', dtype=np.float32,
+                                          shape=(len(symbols), len(price_data)))
+        panel[:] = price_data.to_numpy(dtype=np.float32).T
+        panel.flush()
+        del panel
+        os.replace(array_path + ".tmp", array_path)
+
+        index = {
+            "array": array_file,
+            "symbols": symbols,
+            "dates": pd.DatetimeIndex(price_data.index).as_unit('ns').asi8.tolist(),
+            "published_at": time.time()
+        }
+        index_path = self._index_path(name)
+        with open(index_path + ".tmp", 'w') as f:
+            json.dump(index, f)
+        previous = self._read_index(name)
+        os.replace(index_path + ".tmp", index_path)
+
+        # Workers that still map the previous array keep a valid view of it
+        if previous and previous["array"] != array_file:
+            try:
+                os.remove(os.path.join(self.root_dir, previous["array"]))
+            except OSError:
+                pass
+        return index
+
+    def _read_index(self, name):
+        try:
+            with open(self._index_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, name):
+        """Map the current panel, reusing this process's mapping while the index is unchanged"""
+        try:
+            stat = os.stat(self._index_path(name))
+        except FileNotFoundError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._panels.get(name)
+            if cached is not None and cached["version"] == version:
+                return cached
+
+            index = self._read_index(name)
+            if index is None:
+                return None
+            try:
+                array = np.load(os.path.join(self.root_dir, index["array"]), mmap_mode='r')
+            except OSError as e:
+                print(f"Error mapping shared panel {name}: {e}")
+                return None
+
+            panel = {
+                "version": version,
+                "array": array,
+                "dates": pd.DatetimeIndex(np.array(index["dates"], dtype='datetime64[ns]')),
+                "positions": {symbol: i for i, symbol in enumerate(index["symbols"])},
+                "published_at": index["published_at"]
+            }
+            self._panels[name] = panel
+            return panel
+
+    def symbols(self, name="daily"):
+        panel = self._load(name)
+        return list(panel["positions"]) if panel else []
+
+    def get_prices(self, symbols, period=None, name="daily"):
+        """Zero-copy (dates x symbols) frame for the period, or None if the panel cannot serve it
+
+        Rows start at the later of the period start and the first date on
+        which every requested symbol has a price.
+        """
+        panel = self._load(name)
+        if panel is None or not all(symbol in panel["positions"] for symbol in symbols):
+            return None
+
+        dates = panel["dates"]
+        if len(dates) == 0 or dates[-1] < pd.Timestamp.now() - pd.Timedelta(days=PANEL_MAX_STALENESS_DAYS):
+            return None
+
+        start = period_start(period) if period else None
+        if start is not None and dates[0] > start + pd.Timedelta(days=7):
+            # The panel does not reach back far enough for this period
+            return None
+
+        rows = [panel["array"][panel["positions"][symbol]] for symbol in symbols]
+        first_row = int(dates.searchsorted(start)) if start is not None else 0
+        for row in rows:
+            valid = np.flatnonzero(~np.isnan(row))
+            if len(valid) == 0:
+                return None
+            first_row = max(first_row, int(valid[0]))
+
+        return pd.DataFrame(
+            {symbol: row[first_row:] for symbol, row in zip(symbols, rows)},
+            index=dates[first_row:],
+            copy=False
+        )
+
+
+def publish_from_store(price_store, panel_store, symbols=None, name="daily"):
+    """Publish the stored daily closes of the symbols (all stored symbols by default)"""
+    symbols = symbols or price_store.symbols()
+    columns = {}
+    for symbol in symbols:
+        series = price_store.get_series(symbol)
+        if series is not None and not series.empty:
+            columns[symbol] = series
+    if not columns:
+        return None
+    return panel_store.publish(pd.DataFrame(columns), name=name)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish the hot price panel shared by all workers")
+    parser.add_argument('--symbols', nargs='*', help="Symbols to publish (default: every saved or stored symbol)")
+    parser.add_argument('--period', default='2y', help="History to refresh from the provider first")
+    parser.add_argument('--no-refresh', action='store_true', help="Publish the local price store as is")
+    args = parser.parse_args()
+
+    from app import app, stock_data_service
+    from models import ValidatedStock
+
+    with app.app_context():
+        symbols = args.symbols or sorted(
+            {row.symbol for row in ValidatedStock.query.all()} | set(stock_data_service.price_store.symbols())
+        )
+
+    if not args.no_refresh and symbols:
+        # Fetching writes the real closes through to the price store
+        stock_data_service.get_historical_data(symbols, period=args.period, use_shared_panel=False)
+
+    index = publish_from_store(stock_data_service.price_store, stock_data_service.shared_panels, symbols)
+    if index is None:
+        print("No stored prices to publish")
+    else:
+        print(f"Published {len(index['symbols'])} symbols x {len(index['dates'])} dates")
@@ -0,0 +1,62 @@
+import threading
+from metrics import SINGLEFLIGHT_CALLS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for it and share its result or
+    exception, or give up with TimeoutError after their own timeout.
+    Nothing is cached: once the call finishes, the next caller for the key
+    runs it again.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """Run fn() once per in-flight key; returns (result, shared) where shared is True for followers
+
+        timeout (seconds) bounds how long a follower waits for the leader.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            SINGLEFLIGHT_CALLS.inc(group=self.name, role="follower")
+            if not call.done.wait(timeout):
+                SINGLEFLIGHT_CALLS.inc(group=self.name, role="follower_timeout")
+                raise TimeoutError(f"{self.name} call for {key} still in flight after {timeout:.1f}s")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        SINGLEFLIGHT_CALLS.inc(group=self.name, role="leader")
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -1,9 +1,20 @@
-import yfinance as yf
 import requests
+import pandas as pd
 from datetime import datetime, timedelta
+from metrics import stage_timer, PROVIDER_FAILURES
+from market_data_providers import get_provider, DEFAULT_RISK_FREE_RATE
+
+# History fetched per stock; matches the optimizer's default data period so the
+# stored history can later serve /api/portfolio/optimize without a re-fetch
+VALIDATION_HISTORY_PERIOD = "2y"
 
 class StockValidator:
-    def __init__(self):
+    def __init__(self, provider=None, risk_free_rates=None, price_store=None):
+        self.provider = provider or get_provider()
+        # Last known risk-free rate (RiskFreeRateService); the default rate when not given
+        self.risk_free_rates = risk_free_rates
+        # Price store shared with StockDataService; fetched histories are written through to it
+        self.price_store = price_store
         self.quality_thresholds = {
             'min_market_cap': 10_000_000_000,  # $10B minimum market cap
             'min_volume': 1_000_000,           # Daily volume > 1M shares
@@ -14,16 +25,18 @@ class StockValidator:
     
     def validate_stocks(self, stocks, max_stocks=20):
         """Validate and filter stocks based on quality metrics"""
+        with stage_timer("validate_stocks"):
+            return self._validate_stocks(stocks, max_stocks)
+    
+    def _validate_stocks(self, stocks, max_stocks):
         print(f"\nSTOCK VALIDATION: Analyzing {len(stocks)} Gemini recommendations...")
         print("-" * 60)
         
         validated_stocks = []
         
-        for i, stock in enumerate(stocks, 1):
+        for i, (stock, validation_result) in enumerate(self.iter_validate(stocks), 1):
             symbol = stock['symbol']
-            print(f"   {i:2d}. Validating {symbol}...")
-            
-            validation_result = self._validate_single_stock(stock)
+            print(f"   {i:2d}. Validated {symbol}")
             
             if validation_result['is_valid']:
                 # Add validation metrics to stock data
@@ -33,8 +46,19 @@ class StockValidator:
             else:
                 print(f"       FAILED - {validation_result['failure_reason']}")
         
+        return self.rank(validated_stocks, max_stocks, original_count=len(stocks))
+    
+    def iter_validate(self, stocks):
+        """Yield (stock, validation_result) for each stock as soon as it has been validated"""
+        for stock in stocks:
+            with stage_timer("validate_single_stock"):
+                validation_result = self._validate_single_stock(stock)
+            yield stock, validation_result
+    
+    def rank(self, validated_stocks, max_stocks, original_count=None):
+        """Best max_stocks of the passing stocks by quality score; empty if fewer than 2 passed"""
         # Sort by quality score (highest first)
-        validated_stocks.sort(key=lambda x: x['quality_score'], reverse=True)
+        validated_stocks = sorted(validated_stocks, key=lambda x: x['quality_score'], reverse=True)
         
         # Limit to max_stocks best candidates
         if len(validated_stocks) > max_stocks:
@@ -42,7 +66,8 @@ class StockValidator:
             print(f"\nSelected top {max_stocks} highest quality stocks")
         
         print(f"\nVALIDATION COMPLETE:")
-        print(f"   Original recommendations: {len(stocks)}")
+        if original_count is not None:
+            print(f"   Original recommendations: {original_count}")
         print(f"   Passed validation: {len(validated_stocks)}")
         print(f"   Quality threshold: High-grade stocks only")
         
@@ -59,9 +84,11 @@ class StockValidator:
         
         try:
             # Get stock data
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="1y")
+            info = self.provider.info(symbol)
+            history = self.provider.history(symbol, period=VALIDATION_HISTORY_PERIOD)
+            self._store_history(symbol, history)
+            # Quality metrics are measured over the last year
+            hist = history.loc[history.index[-1] - pd.DateOffset(years=1):] if len(history) else history
             
             if len(hist) < self.quality_thresholds['min_data_points']:
                 return {
@@ -104,12 +131,22 @@ class StockValidator:
             }
             
         except Exception as e:
+            PROVIDER_FAILURES.inc(provider=self.provider.name, operation="validation")
             return {
                 'is_valid': False,
                 'failure_reason': f'Data fetch error: {str(e)}',
                 'quality_score': 0.0
             }
     
+    def _store_history(self, symbol, history):
+        """Write the fetched closes through to the shared price store"""
+        if self.price_store is None or history.empty:
+            return
+        try:
+            self.price_store.append_bars(symbol, history)
+        except Exception as e:
+            print(f"Error storing validation history for {symbol}: {e}")
+    
     def _calculate_quality_metrics(self, info, hist):
         """Calculate quality metrics for a stock"""
         # Market cap
@@ -122,10 +159,11 @@ class StockValidator:
         returns = hist['Close'].pct_change().dropna()
         volatility = returns.std() * (252 ** 0.5) if len(returns) > 0 else 1.0
         
-        # Sharpe ratio (simplified)
+        # Sharpe ratio (simplified), in excess of the risk-free rate
         if len(returns) > 0:
             mean_return = returns.mean() * 252
-            sharpe_ratio = mean_return / volatility if volatility > 0 else 0
+            risk_free_rate = self.risk_free_rates.get()[0] if self.risk_free_rates else DEFAULT_RISK_FREE_RATE
+            sharpe_ratio = (mean_return - risk_free_rate) / volatility if volatility > 0 else 0
         else:
             sharpe_ratio = 0
         
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from scipy import sparse
+
+# Library of named stress scenarios. Historical scenarios replay the price move
+# of each symbol over a date window; factor scenarios apply a shock per industry.
+# Bump a scenario's version whenever its definition changes so cached results
+# computed under the old definition are ignored.
+SCENARIOS = {
+    "gfc_2008": {
+        "name": "2008 Financial Crisis",
+        "type": "historical",
+        "start": "2008-09-01",
+        "end": "2009-03-09",
+        "default_shock": -0.45,
+        "version": 1
+    },
+    "covid_crash_2020": {
+        "name": "2020 COVID Crash",
+        "type": "historical",
+        "start": "2020-02-19",
+        "end": "2020-03-23",
+        "default_shock": -0.34,
+        "version": 1
+    },
+    "rate_hikes_2022": {
+        "name": "2022 Rate Hikes",
+        "type": "historical",
+        "start": "2022-01-03",
+        "end": "2022-10-12",
+        "default_shock": -0.25,
+        "version": 1
+    },
+    "rate_shock": {
+        "name": "Rate Shock (+200bp)",
+        "type": "factor",
+        "shocks": {
+            "Technology": -0.18,
+            "Real Estate": -0.20,
+            "Utilities": -0.12,
+            "Telecommunications": -0.10,
+            "Consumer Goods": -0.08,
+            "Healthcare": -0.06,
+            "Finance": 0.03,
+            "Energy": -0.04
+        },
+        "default_shock": -0.10,
+        "version": 1
+    }
+}
+
+# Marks a cached default shock for a symbol that has no history in the scenario window
+NO_HISTORY = "no_history"
+
+
+class StressScenarioEngine:
+    """Apply the scenario library to many portfolios with one weight-matrix product"""
+
+    def __init__(self, stock_data_service, cache_dir=None, scenarios=None):
+        self.stock_data_service = stock_data_service
+        self.scenarios = scenarios or SCENARIOS
+        self.cache_dir = cache_dir or os.path.join(stock_data_service.price_store.root_dir, 'scenario_cache')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # (scenario_id, version) -> {symbol: [shock, True]} for measured shocks, or
+        # [default_shock, False, "no_history"] when the symbol has no history in the window
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def list_scenarios(self):
+        """Describe the available scenarios"""
+        return [
+            {"id": scenario_id, "name": scenario["name"], "type": scenario["type"], "version": scenario["version"]}
+            for scenario_id, scenario in self.scenarios.items()
+        ]
+
+    def _cache_path(self, scenario_id, version):
+        return os.path.join(self.cache_dir, f"{scenario_id}_v{version}.json")
+
+    def _load_cache(self, scenario_id, version):
+        key = (scenario_id, version)
+        if key not in self._cache:
+            try:
+                with open(self._cache_path(scenario_id, version)) as f:
+                    # Files written before outcomes were told apart may hold failed-fetch fallbacks
+                    self._cache[key] = {symbol: shock for symbol, shock in json.load(f).items()
+                                        if shock[1] or shock[2:] == [NO_HISTORY]}
+            except (FileNotFoundError, ValueError):
+                self._cache[key] = {}
+        return self._cache[key]
+
+    def _save_cache(self, scenario_id, version):
+        tmp_path = self._cache_path(scenario_id, version) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._cache[(scenario_id, version)], f)
+        os.replace(tmp_path, self._cache_path(scenario_id, version))
+
+    def _historical_shocks(self, scenario, symbols):
+        """Window return of each symbol over the scenario dates
+
+        Symbols without a measured shock fall back to the market-level move. When
+        the provider answered but has no history in the window (e.g. listed later)
+        the fallback is final and marked NO_HISTORY; when the fetch failed it is not.
+        """
+        prices, unavailable = self.stock_data_service.get_price_window(symbols, scenario["start"], scenario["end"])
+        shocks = {}
+        for symbol in symbols:
+            if symbol in prices.columns:
+                series = prices[symbol].dropna()
+                if len(series) >= 2 and series.iloc[0] > 0:
+                    shocks[symbol] = [float(series.iloc[-1] / series.iloc[0] - 1), True]
+                    continue
+            if symbol in unavailable:
+                shocks[symbol] = [scenario["default_shock"], False]
+            else:
+                shocks[symbol] = [scenario["default_shock"], False, NO_HISTORY]
+        return shocks
+
+    def scenario_shocks(self, scenario_id, symbols, industries=None):
+        """Per-symbol shock for one scenario, computed once per scenario version and cached"""
+        scenario = self.scenarios[scenario_id]
+        industries = industries or {}
+
+        with self._lock:
+            cached = self._load_cache(scenario_id, scenario["version"])
+            if scenario["type"] == "factor":
+                return {
+                    symbol: [scenario["shocks"].get(industries.get(symbol), scenario["default_shock"]),
+                             industries.get(symbol) in scenario["shocks"]]
+                    for symbol in symbols
+                }
+
+            shocks = {symbol: cached[symbol] for symbol in symbols if symbol in cached}
+            missing = [symbol for symbol in symbols if symbol not in cached]
+            if missing:
+                shocks.update(self._historical_shocks(scenario, missing))
+                # Measured shocks and "no history in window" are final; fallbacks from a
+                # failed fetch are retried on the next run
+                settled = {symbol: shock for symbol, shock in shocks.items()
+                           if symbol in missing and (shock[1] or shock[2:] == [NO_HISTORY])}
+                if settled:
+                    cached.update(settled)
+                    self._save_cache(scenario_id, scenario["version"])
+            return {symbol: shocks[symbol][:2] for symbol in symbols}
+
+    def run(self, portfolio_weights, industries=None, scenario_ids=None):
+        """Stress every portfolio under every scenario
+
+        portfolio_weights maps portfolio id -> {symbol: weight}. Returns
+        portfolio id -> {scenario_id: {"return": ..., "coverage": ...}} where
+        coverage is the share of weight priced from real scenario history.
+        """
+        start_time = time.time()
+        scenario_ids = scenario_ids or list(self.scenarios)
+        portfolio_ids = list(portfolio_weights)
+        universe = sorted({symbol for weights in portfolio_weights.values() for symbol in weights})
+        column_index = {symbol: i for i, symbol in enumerate(universe)}
+
+        # Sparse (portfolios x symbols) weight matrix
+        rows, cols, values = [], [], []
+        for row, portfolio_id in enumerate(portfolio_ids):
+            for symbol, weight in portfolio_weights[portfolio_id].items():
+                rows.append(row)
+                cols.append(column_index[symbol])
+                values.append(weight)
+        weight_matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(portfolio_ids), len(universe)))
+
+        # (symbols x scenarios) shock and coverage matrices
+        shock_matrix = np.zeros((len(universe), len(scenario_ids)))
+        coverage_matrix = np.zeros((len(universe), len(scenario_ids)))
+        for j, scenario_id in enumerate(scenario_ids):
+            shocks = self.scenario_shocks(scenario_id, universe, industries)
+            for symbol, (shock, from_history) in shocks.items():
+                shock_matrix[column_index[symbol], j] = shock
+                coverage_matrix[column_index[symbol], j] = 1.0 if from_history else 0.0
+
+        portfolio_returns = weight_matrix @ shock_matrix
+        coverage = weight_matrix @ coverage_matrix
+        total_weight = np.asarray(weight_matrix.sum(axis=1)).ravel()
+        total_weight[total_weight == 0] = 1.0
+        coverage = coverage / total_weight[:, None]
+
+        results = {
+            portfolio_id: {
+                scenario_id: {
+                    "return": float(portfolio_returns[i, j]),
+                    "coverage": float(coverage[i, j])
+                }
+                for j, scenario_id in enumerate(scenario_ids)
+            }
+            for i, portfolio_id in enumerate(portfolio_ids)
+        }
+        print(f"Stressed {len(portfolio_ids)} portfolios x {len(scenario_ids)} scenarios "
+              f"over {len(universe)} symbols in {time.time() - start_time:.2f} seconds")
+        return results
+
+
+def load_portfolio_weights(user_id=None):
+    """Load {portfolio id: {symbol: weight}} and symbol industries for one user or all portfolios"""
+    from models import db, Portfolio, PortfolioStock, ValidatedStock
+
+    query = db.session.query(PortfolioStock.portfolio_id, PortfolioStock.stock_symbol, PortfolioStock.weight)
+    if user_id is not None:
+        query = query.join(Portfolio, Portfolio.id == PortfolioStock.portfolio_id).filter(Portfolio.user_id == user_id)
+
+    portfolio_weights = {}
+    for portfolio_id, symbol, weight in query.all():
+        portfolio_weights.setdefault(portfolio_id, {})
+        portfolio_weights[portfolio_id][symbol] = portfolio_weights[portfolio_id].get(symbol, 0) + weight
+
+    symbols = {symbol for weights in portfolio_weights.values() for symbol in weights}
+    industries = dict(
+        db.session.query(ValidatedStock.symbol, ValidatedStock.industry)
+        .filter(ValidatedStock.symbol.in_(symbols)).all()
+    ) if symbols else {}
+    return portfolio_weights, industries
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Batch stress report over saved portfolios")
+    parser.add_argument('--user-id', type=int, help="Only stress this user's portfolios")
+    parser.add_argument('--output', help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    from app import app, stock_data_service
+
+    with app.app_context():
+        portfolio_weights, industries = load_portfolio_weights(args.user_id)
+        engine = StressScenarioEngine(stock_data_service)
+        report = engine.run(portfolio_weights, industries)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        for portfolio_id, scenarios in report.items():
+            summary = ", ".join(f"{sid}: {r['return']:.1%}" for sid, r in scenarios.items())
+            print(f"Portfolio {portfolio_id}: {summary}")
@@ -0,0 +1,153 @@
+import os
+import json
+import zlib
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from moments import PERIODS_PER_YEAR
+from price_store import last_closed_session
+from shared_panels import period_start
+
+SECTORS = [
+    "Technology", "Healthcare", "Finance", "Energy", "Nuclear Energy", "Consumer Goods",
+    "Real Estate", "Utilities", "Telecommunications", "Transportation", "Materials", "Aerospace & Defense"
+]
+
+# Sector and starting price for well-known symbols; others are assigned by hash
+KNOWN_SYMBOLS = {
+    'AAPL': ("Technology", 150), 'MSFT': ("Technology", 300), 'GOOGL': ("Technology", 100),
+    'AMZN': ("Consumer Goods", 120), 'TSLA': ("Consumer Goods", 200), 'META': ("Technology", 250),
+    'NVDA': ("Technology", 400), 'BRK-B': ("Finance", 300), 'JNJ': ("Healthcare", 160),
+    'V': ("Finance", 220), 'PG': ("Consumer Goods", 140), 'HD': ("Consumer Goods", 300),
+    'MA': ("Finance", 350), 'UNH': ("Healthcare", 450), 'DIS': ("Telecommunications", 100),
+    'ADBE': ("Technology", 400), 'NFLX': ("Telecommunications", 350), 'XOM': ("Energy", 100),
+    'BAC': ("Finance", 30), 'ABBV': ("Healthcare", 140)
+}
+
+BAR_FREQUENCIES = {
+    '1m': 'min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min', '60m': 'h', '90m': '90min',
+    '1h': 'h', '1d': 'B', '5d': '5B', '1wk': 'W-FRI', '1mo': 'BME', '3mo': 'BQE'
+}
+
+
+class SyntheticMarket:
+    """Seeded factor-model price generator used when real data is unavailable and in benchmarks
+
+    Each bar's return is drift + beta * market + loading * sector + idiosyncratic
+    noise. Market and sector factors are Student-t (fat tails) and share a
+    persistent volatility regime, which gives realistic cross-asset and
+    within-sector correlation and volatility clustering. Factors depend only
+    on (seed, date grid) and each symbol's parameters and noise only on (seed,
+    symbol), so a symbol's path is the same in every basket. Prices are one
+    cumprod over the (symbols x bars) return matrix.
+    """
+
+    def __init__(self, seed=None, market_vol=0.16, sector_vol=0.12, factor_df=4):
+        self.seed = int(seed if seed is not None else os.getenv('SYNTHETIC_MARKET_SEED', 0))
+        self.market_vol = market_vol
+        self.sector_vol = sector_vol
+        self.factor_df = factor_df
+
+    def sector_of(self, symbol):
+        if symbol in KNOWN_SYMBOLS:
+            return KNOWN_SYMBOLS[symbol][0]
+        return SECTORS[zlib.crc32(symbol.encode()) % len(SECTORS)]
+
+    def date_grid(self, period='1y', interval='1d', end=None):
+        """Bar timestamps covering the period, ending at end (default: now)"""
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now()
+        if period == 'max':
+            start = end - pd.DateOffset(years=20)
+        else:
+            start = period_start(period, end=end.normalize()) or end - pd.DateOffset(years=1)
+
+        freq = BAR_FREQUENCIES.get(interval, 'B')
+        if interval in PERIODS_PER_YEAR and PERIODS_PER_YEAR[interval] > 252:
+            # Intraday history is only offered for short look-backs
+            start = max(start, end - pd.Timedelta(days=7 if interval == '1m' else 60))
+            end = end.floor(freq)
+        else:
+            end = end.normalize()
+        if freq == 'B':
+            # Same grid as freq='B', without stepping the business-day offset one bar at a time
+            days = pd.date_range(start=start.normalize(), end=end, freq='D')
+            return days[days.dayofweek < 5]
+        return pd.date_range(start=start, end=end, freq=freq)
+
+    def _factor_returns(self, dates, bars_per_year):
+        """Market and sector factor returns over the date grid, (1 + n_sectors) x n_bars"""
+        n_bars = len(dates)
+        # Seeded by the grid itself (first and last bar, in epoch seconds, and its length)
+        grid_key = [int(dates[0].timestamp()), int(dates[-1].timestamp())] if n_bars else [0, 0]
+        rng = np.random.default_rng([self.seed, n_bars] + grid_key)
+        # Unit-variance Student-t draws
+        scale = np.sqrt((self.factor_df - 2) / self.factor_df)
+        shocks = rng.standard_t(self.factor_df, size=(1 + len(SECTORS), n_bars)) * scale
+
+        # Persistent log-volatility regime shared by all factors (AR(1), half-life ~ 1 month of daily bars)
+        log_vol = lfilter([1.0], [1.0, -0.97], rng.standard_normal(n_bars) * 0.05)
+        regime = np.exp(log_vol - log_vol.var() / 2)
+
+        vols = np.array([self.market_vol] + [self.sector_vol] * len(SECTORS)) / np.sqrt(bars_per_year)
+        return (shocks * vols[:, None] * regime[None, :]).astype(np.float32)
+
+    def generate(self, symbols, period='1y', interval='1d', end=None, dtype=np.float64):
+        """(bars x symbols) price frame for the period"""
+        dates = self.date_grid(period, interval, end)
+        n_bars = len(dates)
+        bars_per_year = PERIODS_PER_YEAR.get(interval, 252)
+        factors = self._factor_returns(dates, bars_per_year)
+
+        n_symbols = len(symbols)
+        returns = np.empty((n_symbols, n_bars), dtype=np.float32)
+        params = np.empty((n_symbols, 5))
+        for i, symbol in enumerate(symbols):
+            rng = np.random.Generator(np.random.SFC64([self.seed, zlib.crc32(symbol.encode())]))
+            params[i] = rng.random(5)
+            rng.standard_normal(n_bars, dtype=np.float32, out=returns[i])
+        beta, sector_loading, idio_vol, annual_drift, price = params.T
+
+        sector_index = {sector: i for i, sector in enumerate(SECTORS)}
+        loadings = np.zeros((n_symbols, 1 + len(SECTORS)), dtype=np.float32)
+        loadings[:, 0] = 0.6 + 0.8 * beta
+        loadings[np.arange(n_symbols), [1 + sector_index[self.sector_of(symbol)] for symbol in symbols]] = \
+            0.3 + 0.6 * sector_loading
+        drift = ((0.02 + 0.12 * annual_drift) / bars_per_year).astype(np.float32)
+        base_prices = np.array([KNOWN_SYMBOLS[symbol][1] if symbol in KNOWN_SYMBOLS else 20 + 380 * p
+                                for symbol, p in zip(symbols, price)], dtype=np.float32)
+
+        returns *= ((0.15 + 0.20 * idio_vol) / np.sqrt(bars_per_year)).astype(np.float32)[:, None]
+        returns += loadings @ factors
+        returns += drift[:, None]
+        # Gross returns, floored so a single bar never loses more than half its value
+        returns += 1.0
+        np.maximum(returns, 0.5, out=returns)
+        returns[:, 0] = base_prices
+        np.cumprod(returns, axis=1, out=returns)
+
+        prices = returns if dtype == np.float32 else returns.astype(dtype)
+        return pd.DataFrame(prices.T, index=dates, columns=list(symbols), copy=False)
+
+    def write_fixtures(self, symbols, fixture_dir, period='2y'):
+        """Write replay-provider fixtures (daily bars plus info.json) for the symbols
+
+        Recorded history ends at the last closed session, as a replayed day's bar is final.
+        """
+        os.makedirs(fixture_dir, exist_ok=True)
+        prices = self.generate(symbols, period=period, end=last_closed_session())
+        info = {"risk_free_rate": 0.04}
+        for symbol in symbols:
+            close = prices[symbol]
+            volume = 2_000_000 + zlib.crc32(symbol.encode()) % 20_000_000
+            bars = pd.DataFrame({"Open": close, "High": close * 1.005, "Low": close * 0.995,
+                                 "Close": close, "Volume": volume})
+            bars.index.name = 'Date'
+            bars.to_csv(os.path.join(fixture_dir, f"{symbol.upper().replace('/', '_')}.csv"))
+            info[symbol] = {
+                "sector": self.sector_of(symbol),
+                "marketCap": float(close.iloc[-1]) * 1e9,
+                "averageVolume": volume
+            }
+        with open(os.path.join(fixture_dir, 'info.json'), 'w') as f:
+            json.dump(info, f, indent=2)
+        return prices
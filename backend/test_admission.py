@@ -0,0 +1,158 @@
+import os
+import time
+import threading
+import unittest
+from unittest import mock
+from flask import Flask, jsonify, request
+from admission import (AdmissionClass, AdmissionController, AdmissionRejected, fit_to_worker_threads,
+                       trust_forwarded_for, user_key)
+from metrics import ADMISSION_REJECTIONS
+
+
+class TestAdmissionClass(unittest.TestCase):
+    def acquire_in_thread(self, admission_class, user_key, results):
+        def run():
+            try:
+                results.append((user_key, admission_class.acquire(user_key)))
+            except AdmissionRejected as e:
+                results.append((user_key, e))
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def wait_for_waiting(self, admission_class, count):
+        deadline = time.time() + 5
+        while admission_class.waiting < count and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(admission_class.waiting, count)
+
+    def test_limits_concurrency_and_admits_waiters_in_order(self):
+        admission_class = AdmissionClass("test", max_concurrent=1, max_queue=5, per_user=5)
+        first = admission_class.acquire("a")
+        results = []
+        threads = []
+        for user_key in ("b", "c"):
+            threads.append(self.acquire_in_thread(admission_class, user_key, results))
+            self.wait_for_waiting(admission_class, len(threads))
+        self.assertEqual(admission_class.running, 1)
+
+        first.release()
+        first.release()  # idempotent
+        threads[0].join(timeout=5)
+        self.assertEqual([user_key for user_key, _ in results], ["b"])
+        results[0][1].release()
+        threads[1].join(timeout=5)
+        self.assertEqual([user_key for user_key, _ in results], ["b", "c"])
+        results[1][1].release()
+        self.assertEqual((admission_class.running, admission_class.waiting), (0, 0))
+
+    def test_full_queue_is_rejected_with_503(self):
+        admission_class = AdmissionClass("full", max_concurrent=1, max_queue=1, per_user=5)
+        ticket = admission_class.acquire("a")
+        results = []
+        waiter = self.acquire_in_thread(admission_class, "b", results)
+        self.wait_for_waiting(admission_class, 1)
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission_class.acquire("c")
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(raised.exception.reason, "queue_full")
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(ADMISSION_REJECTIONS.value(**{"class": "full", "reason": "queue_full"}), 1)
+        ticket.release()
+        waiter.join(timeout=5)
+        results[0][1].release()
+
+    def test_per_user_cap_is_rejected_with_429(self):
+        admission_class = AdmissionClass("user", max_concurrent=4, max_queue=4, per_user=1)
+        ticket = admission_class.acquire("user:1")
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission_class.acquire("user:1")
+        self.assertEqual(raised.exception.status_code, 429)
+        # Other users are unaffected, and the cap frees up on release
+        admission_class.acquire("user:2").release()
+        ticket.release()
+        admission_class.acquire("user:1").release()
+
+    def test_queue_timeout_leaves_the_queue(self):
+        admission_class = AdmissionClass("timeout", max_concurrent=1, max_queue=2, per_user=5, queue_timeout=0.05)
+        ticket = admission_class.acquire("a")
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission_class.acquire("b")
+        self.assertEqual(raised.exception.reason, "queue_timeout")
+        self.assertEqual(admission_class.waiting, 0)
+        ticket.release()
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_only_mapped_endpoints_are_admitted(self):
+        controller = AdmissionController([AdmissionClass("optimize", 1, 0, 1)],
+                                         endpoint_classes={"optimize_portfolio": "optimize"})
+        self.assertIsNone(controller.admit("health_check", "ip:1"))
+        ticket = controller.admit("optimize_portfolio", "ip:1")
+        self.assertEqual(controller.to_dict()["optimize"]["running"], 1)
+        with self.assertRaises(AdmissionRejected):
+            controller.admit("optimize_portfolio", "ip:2")
+        ticket.release()
+
+        controller.enabled = False
+        self.assertIsNone(controller.admit("optimize_portfolio", "ip:1"))
+
+    def test_default_classes_reject_instead_of_queueing(self):
+        with mock.patch.dict(os.environ, {"ADMISSION_OPTIMIZE_CONCURRENCY": "1"}):
+            controller = AdmissionController.from_env()
+        ticket = controller.admit("optimize_portfolio", "ip:1")
+        start = time.monotonic()
+        with self.assertRaises(AdmissionRejected) as raised:
+            controller.admit("optimize_portfolio", "ip:2")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(raised.exception.status_code, 503)
+        ticket.release()
+
+    def test_limits_fit_the_worker_threads(self):
+        classes = [AdmissionClass("optimize", 4, 8, 2), AdmissionClass("recommend", 8, 4, 2)]
+        fit_to_worker_threads(classes, 10)
+        self.assertLessEqual(sum(c.max_concurrent + c.max_queue for c in classes), 10)
+        self.assertEqual([c.max_queue for c in classes], [0, 0])
+        self.assertTrue(all(c.max_concurrent >= 1 for c in classes))
+
+        with mock.patch.dict(os.environ, {"ADMISSION_WORKER_THREADS": "4", "ADMISSION_OPTIMIZE_QUEUE": "6"}):
+            limits = AdmissionController.from_env().to_dict()
+        self.assertLessEqual(sum(c["max_concurrent"] + c["max_queue"] for c in limits.values()), 2)
+
+
+class TestAnonymousClientsBehindProxy(unittest.TestCase):
+    def make_app(self, proxy_count):
+        app = Flask(__name__)
+        trust_forwarded_for(app, proxy_count)
+        controller = AdmissionController([AdmissionClass("optimize", 8, 0, 1)],
+                                         endpoint_classes={"optimize": "optimize"})
+
+        # Holds its slot, like a long-running solve
+        @app.route('/optimize')
+        def optimize():
+            key = user_key(None, request.remote_addr)
+            try:
+                controller.admit(request.endpoint, key)
+            except AdmissionRejected as e:
+                return jsonify({"key": key}), e.status_code
+            return jsonify({"key": key})
+        return app.test_client()
+
+    def get(self, client, forwarded_for):
+        # Every request reaches the app from the proxy's address
+        return client.get('/optimize', headers={"X-Forwarded-For": forwarded_for},
+                          environ_base={"REMOTE_ADDR": "10.0.0.1"})
+
+    def test_clients_behind_a_trusted_proxy_have_their_own_cap(self):
+        client = self.make_app(proxy_count=1)
+        self.assertEqual(self.get(client, "203.0.113.5").get_json()["key"], "ip:203.0.113.5")
+        self.assertEqual(self.get(client, "198.51.100.7").status_code, 200)
+        self.assertEqual(self.get(client, "203.0.113.5").status_code, 429)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        client = self.make_app(proxy_count=0)
+        self.assertEqual(self.get(client, "203.0.113.5").get_json()["key"], "ip:10.0.0.1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+import pandas as pd
+from anytime_optimization import AnytimeProblem, anytime_optimize, hrp_weights, project_to_bounds
+from optimization_pipeline import OptimizationError, parse_optimize_request
+from portfolio_optimizer import PortfolioOptimizer
+
+
+def random_moments(n_assets, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n_assets, 3)) * 0.1
+    cov = factors @ factors.T + np.diag(rng.uniform(0.01, 0.05, n_assets))
+    mu = rng.normal(0.08, 0.05, n_assets)
+    return mu, cov
+
+
+class TestAnytimeOptimization(unittest.TestCase):
+    def test_projection_and_hrp_are_feasible(self):
+        weights = project_to_bounds(np.array([3.0, -1.0, 0.2, 0.1]), 0.01, 0.5)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        self.assertTrue(((weights >= 0.01 - 1e-9) & (weights <= 0.5 + 1e-9)).all())
+
+        _, cov = random_moments(40)
+        hrp = hrp_weights(cov)
+        self.assertAlmostEqual(hrp.sum(), 1.0)
+        self.assertTrue((hrp > 0).all())
+
+    def test_generous_budget_reaches_the_optimum(self):
+        mu, cov = random_moments(30)
+        weights, info = anytime_optimize(mu, cov, "max_sharpe", time_budget=30)
+        self.assertIn(info["tier"], ("closed_form", "qp"))
+        self.assertLess(info["relative_gap"], 1e-3)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        self.assertTrue((weights >= -1e-9).all())
+        self.assertEqual([attempt["tier"] for attempt in info["tiers"]][:2], ["equal_weight", "hrp"])
+
+    def test_max_sharpe_bounds_match_the_regular_solver(self):
+        mu, cov = random_moments(30)
+        regular = PortfolioOptimizer()._maximize_sharpe_ratio(pd.Series(mu), pd.DataFrame(cov), 30,
+                                                              risk_free_rate=0.0)
+        weights, info = anytime_optimize(mu, cov, "max_sharpe", time_budget=30)
+        # The long-only optimum holds tiny positions, so both re-solve with 1%-50% bounds
+        self.assertEqual(info["bounds"], [0.01, 0.5])
+        self.assertTrue(((weights >= 0.01 - 1e-6) & (weights <= 0.5 + 1e-6)).all())
+        np.testing.assert_allclose(weights, regular, atol=2e-3)
+
+        # Even with no budget left the result honours the bounds
+        weights, info = anytime_optimize(mu, cov, "max_sharpe", time_budget=1e-9)
+        self.assertTrue((weights >= 0.01 - 1e-9).all())
+
+    def test_gap_bounds_the_distance_to_the_optimum(self):
+        mu, cov = random_moments(25, seed=1)
+        problem = AnytimeProblem(mu, cov, "min_variance")
+        optimum, _ = anytime_optimize(mu, cov, "min_variance", time_budget=30)
+        for weights in (np.full(25, 1 / 25), problem.project(hrp_weights(cov))):
+            self.assertGreaterEqual(problem.gap(weights) + 1e-9,
+                                    problem.objective(optimum) - problem.objective(weights))
+
+    def test_spent_budget_falls_back_to_a_feasible_heuristic(self):
+        mu, cov = random_moments(50)
+        weights, info = anytime_optimize(mu, cov, "max_sharpe", time_budget=1e-9)
+        self.assertEqual(info["tier"], "equal_weight")
+        self.assertEqual(len(info["tiers"]), 1)
+        self.assertGreater(info["optimality_gap"], 0)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+
+    def test_optimizer_reports_the_tier(self):
+        rng = np.random.default_rng(2)
+        prices = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0.0004, 0.01, (300, 6)), axis=0),
+                              columns=list("ABCDEF"))
+        diagnostics = {}
+        weights = PortfolioOptimizer().optimize_portfolio(prices, diagnostics=diagnostics, time_budget=10,
+                                                          risk_free_rate=0.02)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        self.assertIn(diagnostics["anytime"]["tier"], ("equal_weight", "hrp", "closed_form", "qp"))
+
+    def test_time_budget_validation(self):
+        stocks = [{"symbol": "A"}, {"symbol": "B"}]
+        self.assertEqual(parse_optimize_request({"stocks": stocks, "time_budget": "2"})["time_budget"], 2.0)
+        with self.assertRaises(OptimizationError):
+            parse_optimize_request({"stocks": stocks, "time_budget": 0})
+        with self.assertRaises(OptimizationError):
+            parse_optimize_request({"stocks": stocks, "time_budget": 1, "method": "resampled"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import time
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from price_store import PriceStore
+from shared_panels import SharedPanelStore
+from stock_data_service import StockDataService
+from market_data_providers import MarketDataProvider, ProviderError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DownProvider(MarketDataProvider):
+    """Provider whose downloads always fail"""
+
+    name = "down_stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.download_calls = 0
+
+    def download(self, *args, **kwargs):
+        self.download_calls += 1
+        time.sleep(self.delay)
+        raise ConnectionError("provider unavailable")
+
+    def history(self, symbol, period="1y", interval="1d"):
+        raise ProviderError("not recorded")
+
+    def info(self, symbol):
+        raise ProviderError("not recorded")
+
+    def risk_free_rate(self):
+        raise ProviderError("not recorded")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("test", failure_threshold=3, window_seconds=60, cool_down_seconds=30,
+                                      slow_call_seconds=5, clock=self.clock)
+
+    def test_opens_after_threshold_and_probes_after_cool_down(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+        self.clock.now = 31
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 31
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now = 40
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_old_failures_expire_and_slow_calls_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 100
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_success(6.0)
+        self.breaker.record_success(6.0)
+        self.assertEqual(self.breaker.state, OPEN)
+
+
+class TestProviderFallback(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.price_store = PriceStore(self.tmp_dir.name)
+        # Stored history ends two weeks ago, so serving it needs a fetch of the missing bars
+        dates = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.offsets.BDay(10), periods=300)
+        self.price_store.append(pd.DataFrame(
+            {"AAA": np.linspace(10, 20, len(dates)), "BBB": np.linspace(30, 25, len(dates))}, index=dates
+        ))
+        self.provider = DownProvider()
+        self.service = StockDataService(
+            price_store=self.price_store,
+            shared_panels=SharedPanelStore(self.tmp_dir.name + "/panels"),
+            provider=self.provider
+        )
+        self.service.provider_breaker = CircuitBreaker("test", failure_threshold=2, cool_down_seconds=60)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_open_circuit_serves_stored_prices_without_calling_provider(self):
+        provider = self.provider
+        with mock.patch("stock_data_service.RETRY_BACKOFF", 0):
+            first = self.service.get_historical_data(["BBB", "AAA"], period="6mo")
+            self.assertEqual(provider.download_calls, 2)
+            self.assertEqual(self.service.provider_breaker.state, OPEN)
+
+            second = self.service.get_historical_data(["BBB", "AAA"], period="6mo")
+        self.assertEqual(provider.download_calls, 2)
+        self.assertEqual(list(second.columns), ["BBB", "AAA"])
+        self.assertAlmostEqual(second["AAA"].iloc[-1], 20.0)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_latency_budget_bounds_provider_time(self):
+        provider = self.provider
+        provider.delay = 0.3
+        with mock.patch("stock_data_service.MIN_PROVIDER_TIMEOUT", 0.1):
+            start = time.monotonic()
+            data = self.service.get_historical_data(["AAA", "BBB"], period="6mo", latency_budget=0.35)
+            elapsed = time.monotonic() - start
+        self.assertEqual(provider.download_calls, 1)
+        self.assertLess(elapsed, 1.5)
+        self.assertGreaterEqual(len(data), 20)
+
+    def test_empty_downloads_do_not_open_the_circuit(self):
+        self.provider.download = lambda *args, **kwargs: pd.DataFrame()
+        for _ in range(3):
+            self.service.get_historical_data(["ZZZZ", "YYYY"], period="6mo")
+        self.assertEqual(self.service.provider_breaker.state, CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
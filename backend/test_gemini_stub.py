@@ -0,0 +1,45 @@
+import os
+import json
+import tempfile
+import unittest
+from gemini import GeminiService, StubGenerativeModel
+
+CATALOG = {
+    "Technology": [{"symbol": "AAPL", "name": "Apple Inc.", "description": "Consumer electronics",
+                    "industry": "Technology"}],
+    "Energy": [{"symbol": "XOM", "name": "Exxon Mobil", "description": "Oil and gas", "industry": "Energy"}]
+}
+
+
+class PassThroughValidator:
+    def validate_stocks(self, stocks, max_stocks=20):
+        return stocks[:max_stocks]
+
+    def display_validation_summary(self, stocks):
+        pass
+
+
+class TestStubGenerativeModel(unittest.TestCase):
+    def setUp(self):
+        self.service = GeminiService(None, validator=PassThroughValidator(), model=StubGenerativeModel(CATALOG))
+
+    def test_recommendations_come_from_the_catalog_for_requested_industries(self):
+        stocks = self.service.get_validated_stock_recommendations(["Energy"])
+        self.assertEqual([stock["symbol"] for stock in stocks], ["XOM"])
+
+    def test_extract_symbol_echoes_the_first_word(self):
+        self.assertEqual(self.service.extract_stock_symbol("nvda please")[0], "NVDA")
+
+    def test_from_file_and_no_api_key_needed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.json")
+            with open(path, "w") as f:
+                json.dump(CATALOG, f)
+            model = StubGenerativeModel.from_file(path, latency=0.01)
+        self.assertEqual(json.loads(model.generate_content("Given the following industries: Technology, recommend 3").text)[0]["symbol"], "AAPL")
+        with self.assertRaises(ValueError):
+            GeminiService(None, validator=PassThroughValidator())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from market_data_providers import ReplayProvider
+from price_store import PriceStore
+from shared_panels import SharedPanelStore
+from stock_data_service import StockDataService
+from stock_validator import StockValidator
+from synthetic_market import SyntheticMarket
+
+SYMBOLS = ["AAA", "BBB", "CCC"]
+
+
+class CountingReplayProvider(ReplayProvider):
+    def __init__(self, fixture_dir):
+        super().__init__(fixture_dir)
+        self.downloads = []
+
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        self.downloads.append({"symbols": list(symbols), "period": period, "start": start})
+        return super().download(symbols, period=period, interval=interval, start=start, end=end, timeout=timeout)
+
+
+class TestIncrementalHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.prices = SyntheticMarket(seed=5).write_fixtures(SYMBOLS, self.tmp_dir.name + "/fixtures", period="5y")
+        self.provider = CountingReplayProvider(self.tmp_dir.name + "/fixtures")
+        self.price_store = PriceStore(self.tmp_dir.name + "/store")
+        self.service = StockDataService(
+            price_store=self.price_store,
+            shared_panels=SharedPanelStore(self.tmp_dir.name + "/panels"),
+            provider=self.provider
+        )
+        validator = StockValidator(self.provider, price_store=self.price_store)
+        for symbol in SYMBOLS:
+            validator._validate_single_stock({"symbol": symbol})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_validated_history_serves_optimize_without_fetching(self):
+        data = self.service.get_historical_data(["CCC", "AAA"], period="2y")
+        self.assertEqual(self.provider.downloads, [])
+        self.assertEqual(list(data.columns), ["CCC", "AAA"])
+        self.assertGreater(len(data), 480)
+        np.testing.assert_allclose(data["AAA"].iloc[-1], self.prices["AAA"].iloc[-1], rtol=1e-6)
+
+    def test_stale_history_fetches_only_missing_bars(self):
+        cutoff = self.prices.index[-6]
+        for symbol in SYMBOLS:
+            self.price_store.replace(symbol, self.price_store.get_series(symbol).loc[:cutoff])
+
+        data = self.service.get_historical_data(SYMBOLS, period="1y")
+        self.assertEqual(self.provider.downloads, [{"symbols": SYMBOLS, "period": None, "start": cutoff}])
+        self.assertEqual(data.index[-1], self.prices.index[-1])
+
+        # Recently checked symbols are not fetched again
+        self.service.get_historical_data(SYMBOLS, period="1y")
+        self.assertEqual(len(self.provider.downloads), 1)
+
+    def test_readjusted_provider_history_rescales_the_store(self):
+        cutoff = self.prices.index[-3]
+        stored = self.price_store.get_series("BBB").loc[:cutoff]
+        # Stored before a 2:1 split the provider has since back-adjusted
+        self.price_store.replace("BBB", stored * 2)
+
+        data = self.service.get_historical_data(["AAA", "BBB"], period="1y")
+        self.assertEqual(len(self.provider.downloads), 1)
+        expected = self.prices["BBB"].loc[data.index]
+        np.testing.assert_allclose(data["BBB"], expected, rtol=1e-5)
+
+    def test_open_session_bar_is_not_stored(self):
+        session, previous = self.prices.index[-1], self.prices.index[-2]
+        self.price_store.replace("AAA", self.price_store.get_series("AAA").loc[:previous])
+        # Validated mid-session: the provider's bar for today carries a partial close
+        intraday_dir = self.tmp_dir.name + "/intraday"
+        shutil.copytree(self.tmp_dir.name + "/fixtures", intraday_dir)
+        bars = pd.read_csv(intraday_dir + "/AAA.csv", index_col=0)
+        bars.iloc[-1, bars.columns.get_loc("Close")] *= 1.01
+        bars.to_csv(intraday_dir + "/AAA.csv")
+        with mock.patch("price_store.last_closed_session", return_value=previous):
+            StockValidator(ReplayProvider(intraday_dir), price_store=self.price_store)._validate_single_stock({"symbol": "AAA"})
+        self.assertEqual(self.price_store.get_series("AAA").index[-1], previous)
+
+        # After the close the final bar extends the store without rescaling it
+        with mock.patch("price_store.last_closed_session", return_value=session):
+            self.service.get_historical_data(["AAA"], period="1y")
+        stored = self.price_store.get_series("AAA")
+        self.assertEqual(stored.index[-1], session)
+        np.testing.assert_allclose(stored, self.prices["AAA"].loc[stored.index], rtol=1e-6)
+
+    def test_gapped_store_fetches_in_full(self):
+        # The store holds an old window (as a stress scenario would write) plus the last year
+        for symbol in SYMBOLS:
+            series = self.prices[symbol]
+            self.price_store.replace(symbol, pd.concat([series.iloc[:60], series.iloc[-252:]]))
+
+        data = self.service.get_historical_data(SYMBOLS, period="2y")
+        self.assertEqual(self.provider.downloads, [{"symbols": SYMBOLS, "period": "2y", "start": None}])
+        self.assertGreater(len(data), 480)
+
+        # The download filled the hole, so the store now covers the period
+        self.service.get_historical_data(SYMBOLS, period="2y")
+        self.assertEqual(len(self.provider.downloads), 1)
+
+    def test_period_beyond_stored_history_fetches_in_full(self):
+        self.service.get_historical_data(SYMBOLS, period="5y")
+        self.assertEqual(self.provider.downloads, [{"symbols": SYMBOLS, "period": "5y", "start": None}])
+
+    def test_weekly_requests_do_not_use_the_daily_store(self):
+        self.assertIsNone(self.service.data_version(SYMBOLS, interval="1wk"))
+        self.assertIsNotNone(self.service.data_version(SYMBOLS, interval="1d"))
+
+        def unavailable(*args, **kwargs):
+            raise ConnectionError("provider down")
+        self.provider.download = unavailable
+        # Stored daily closes are not served as weekly bars when the provider is down
+        data = self.service.get_historical_data(SYMBOLS, period="2y", interval="1wk")
+        self.assertLess(len(data), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
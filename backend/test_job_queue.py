@@ -0,0 +1,108 @@
+import tempfile
+import threading
+import unittest
+from job_queue import LocalJobQueue, QueueFullError
+
+
+class TestLocalJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = LocalJobQueue(max_workers=1, max_pending=1)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.queue.shutdown()
+
+    def blocking_job(self, report):
+        report("working", 0.5)
+        self.release.wait(5)
+        return {"answer": 42}
+
+    def wait_until_finished(self, job):
+        version = -1
+        while not job.finished:
+            job = self.queue.wait_for_update(job.id, version, timeout=5)
+            version = job.version
+        return job
+
+    def test_job_reports_progress_and_result(self):
+        job, created = self.queue.submit("a", self.blocking_job)
+        self.assertTrue(created)
+        job = self.queue.wait_for_update(job.id, 0, timeout=5)
+        self.assertIn(job.status, ("running", "succeeded"))
+
+        self.release.set()
+        job = self.wait_until_finished(job)
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.result, {"answer": 42})
+        self.assertEqual(job.progress, 1.0)
+
+    def test_identical_inflight_jobs_are_deduplicated(self):
+        first, _ = self.queue.submit("same", self.blocking_job)
+        second, created = self.queue.submit("same", self.blocking_job)
+        self.assertFalse(created)
+        self.assertIs(first, second)
+
+        self.release.set()
+        self.wait_until_finished(first)
+        third, created = self.queue.submit("same", self.blocking_job)
+        self.assertTrue(created)
+        self.assertIsNot(third, first)
+
+    def test_failed_job_keeps_error(self):
+        def failing_job(report):
+            raise ValueError("no data")
+
+        job, _ = self.queue.submit("fail", failing_job)
+        job = self.wait_until_finished(job)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "no data")
+
+    def test_queue_rejects_jobs_when_full(self):
+        running, _ = self.queue.submit("running", self.blocking_job)
+        self.queue.wait_for_update(running.id, 0, timeout=5)
+        self.queue.submit("pending", self.blocking_job)
+        with self.assertRaises(QueueFullError):
+            self.queue.submit("overflow", self.blocking_job)
+
+
+class TestSharedJobState(unittest.TestCase):
+    def setUp(self):
+        self.state_dir = tempfile.TemporaryDirectory()
+        # Two worker processes sharing one state directory
+        self.worker = LocalJobQueue(max_workers=1, state_dir=self.state_dir.name)
+        self.other_worker = LocalJobQueue(max_workers=1, state_dir=self.state_dir.name)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.worker.shutdown()
+        self.other_worker.shutdown()
+        self.state_dir.cleanup()
+
+    def test_job_can_be_polled_from_another_worker(self):
+        def job_fn(report):
+            report("working", 0.5)
+            self.release.wait(5)
+            return {"answer": 42}
+
+        job, _ = self.worker.submit("a", job_fn)
+        seen = self.other_worker.wait_for_update(job.id, 0, timeout=5)
+        self.assertIn(seen.status, ("running", "succeeded"))
+
+        self.release.set()
+        version = seen.version
+        while not seen.finished:
+            seen = self.other_worker.wait_for_update(job.id, version, timeout=5)
+            version = seen.version
+        self.assertEqual(seen.to_dict(), self.worker.get(job.id).to_dict())
+        self.assertEqual(seen.result, {"answer": 42})
+
+    def test_unknown_or_malformed_job_ids_are_not_found(self):
+        self.assertIsNone(self.other_worker.get("0" * 32))
+        self.assertIsNone(self.other_worker.get("../" + "0" * 29))
+        self.assertIsNone(self.other_worker.wait_for_update("0" * 32, 0, timeout=0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import time
+import threading
+import unittest
+from unittest import mock
+from lazy_services import LazyService, OncePerProcess, warm_up
+
+
+class Service:
+    def __init__(self):
+        self.value = 42
+
+    def double(self):
+        return self.value * 2
+
+
+class TestLazyService(unittest.TestCase):
+    def setUp(self):
+        self.builds = 0
+
+    def factory(self):
+        self.builds += 1
+        time.sleep(0.05)
+        return Service()
+
+    def test_builds_once_on_first_use_and_forwards_attributes(self):
+        service = LazyService("service", self.factory)
+        self.assertFalse(service.ready)
+        self.assertEqual(self.builds, 0)
+
+        threads = [threading.Thread(target=service.double) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.builds, 1)
+        self.assertTrue(service.ready)
+        self.assertEqual(service.value, 42)
+        self.assertIs(service.get(), service.get())
+
+    def test_warm_up_modes(self):
+        lazy = LazyService("lazy", self.factory)
+        self.assertIsNone(warm_up([lazy], mode="lazy"))
+        self.assertFalse(lazy.ready)
+
+        warm_up([lazy], mode="eager")
+        self.assertTrue(lazy.ready)
+
+        background = LazyService("background", self.factory)
+        warm_up([background], mode="background").join(5)
+        self.assertTrue(background.ready)
+        with self.assertRaises(ValueError):
+            warm_up([background], mode="sometimes")
+
+    def test_failed_warm_up_retries_on_first_use(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("not configured")
+            return Service()
+
+        service = LazyService("flaky", flaky)
+        warm_up([service], mode="eager")
+        self.assertFalse(service.ready)
+        self.assertEqual(service.value, 42)
+
+
+class TestOncePerProcess(unittest.TestCase):
+    def test_runs_once_and_again_after_a_fork(self):
+        calls = []
+        start = OncePerProcess(lambda: calls.append(1))
+        self.assertFalse(start.started)
+        start()
+        start()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(start.started)
+
+        # A forked worker has a new pid, and the parent's threads did not come with it
+        with mock.patch("lazy_services.os.getpid", return_value=-1):
+            self.assertFalse(start.started)
+            start()
+            start()
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
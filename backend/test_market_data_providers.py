@@ -0,0 +1,95 @@
+import json
+import time
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from market_data_providers import MarketDataProvider, ReplayProvider, ProviderError
+from stock_validator import StockValidator
+
+
+def write_fixtures(fixture_dir, symbols, n_days=400):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end="2024-06-28", periods=n_days)
+    for i, symbol in enumerate(symbols):
+        close = 100 * np.cumprod(1 + rng.normal(0.001, 0.01, n_days))
+        bars = pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                             "Volume": 5_000_000 + i}, index=pd.DatetimeIndex(dates, name="Date"))
+        bars.to_csv(f"{fixture_dir}/{symbol}.csv")
+    with open(f"{fixture_dir}/info.json", "w") as f:
+        json.dump({"risk_free_rate": 0.045, **{symbol: {"marketCap": 2e11, "sector": "Technology"}
+                                               for symbol in symbols}}, f)
+    return dates
+
+
+class TestReplayProvider(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dates = write_fixtures(self.tmp_dir.name, ["AAA", "BBB"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_periods_are_measured_from_the_last_recorded_date(self):
+        provider = ReplayProvider(self.tmp_dir.name)
+        prices = provider.download(["AAA", "BBB", "MISSING"], period="6mo")
+        self.assertEqual(list(prices.columns), ["AAA", "BBB"])
+        self.assertEqual(prices.index[-1], self.dates[-1])
+        self.assertGreaterEqual(prices.index[0], self.dates[-1] - pd.DateOffset(months=6))
+        self.assertEqual(len(provider.download(["AAA"], start="2024-01-02", end="2024-01-31")), 22)
+
+        self.assertEqual(provider.info("AAA")["sector"], "Technology")
+        self.assertAlmostEqual(provider.risk_free_rate(), 0.045)
+        self.assertTrue(provider.history("MISSING").empty)
+
+    def test_daily_fixtures_are_resampled_to_the_requested_interval(self):
+        provider = ReplayProvider(self.tmp_dir.name)
+        daily = provider.download(["AAA"], period="1y")
+        weekly = provider.download(["AAA"], period="1y", interval="1wk")
+        self.assertTrue(50 <= len(weekly) <= 54)
+        self.assertEqual(weekly["AAA"].iloc[-1], daily["AAA"].iloc[-1])
+        self.assertTrue(11 <= len(provider.download(["AAA"], period="1y", interval="1mo")) <= 13)
+
+        bars = provider.history("AAA", period="1y")
+        monthly = provider.history("AAA", period="1y", interval="1mo")
+        june = bars.loc["2024-06"]
+        self.assertEqual(monthly["High"].iloc[-1], june["High"].max())
+        self.assertEqual(monthly["Open"].iloc[-1], june["Open"].iloc[0])
+        self.assertEqual(monthly["Volume"].iloc[-1], june["Volume"].sum())
+
+        with self.assertRaises(ProviderError):
+            provider.download(["AAA"], period="5d", interval="1h")
+
+    def test_provider_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            MarketDataProvider()
+
+    def test_injected_errors_are_seeded_and_latency_is_applied(self):
+        def failures(seed):
+            provider = ReplayProvider(self.tmp_dir.name, error_rate=0.5, seed=seed)
+            outcomes = []
+            for _ in range(20):
+                try:
+                    provider.info("AAA")
+                    outcomes.append(False)
+                except ProviderError:
+                    outcomes.append(True)
+            return outcomes
+
+        self.assertEqual(failures(7), failures(7))
+        self.assertTrue(0 < sum(failures(7)) < 20)
+
+        provider = ReplayProvider(self.tmp_dir.name, latency=0.05)
+        start = time.monotonic()
+        provider.history("AAA")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_validator_runs_offline_against_fixtures(self):
+        validator = StockValidator(provider=ReplayProvider(self.tmp_dir.name))
+        result = validator._validate_single_stock({"symbol": "AAA"})
+        self.assertNotIn("Data fetch error", result.get("failure_reason") or "")
+        self.assertEqual(result["validation_metrics"]["market_cap"], 2e11)
+
+
+if __name__ == '__main__':
+    unittest.main()
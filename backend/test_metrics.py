@@ -0,0 +1,48 @@
+import unittest
+from metrics import MetricsRegistry, Timer
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_gauge_render(self):
+        hits = self.registry.counter("cache_hits_total", "Cache hits")
+        hits.inc(cache="result")
+        hits.inc(2, cache="result")
+        in_flight = self.registry.gauge("in_flight", "In flight")
+        in_flight.inc(endpoint="optimize")
+        in_flight.dec(endpoint="optimize")
+
+        text = self.registry.render()
+        self.assertIn("# TYPE cache_hits_total counter", text)
+        self.assertIn('cache_hits_total{cache="result"} 3', text)
+        self.assertIn('in_flight{endpoint="optimize"} 0', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = self.registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        latency.observe(0.05, stage="solve")
+        latency.observe(0.5, stage="solve")
+        latency.observe(5.0, stage="solve")
+
+        text = self.registry.render()
+        self.assertIn('latency_seconds_bucket{stage="solve",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="solve",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="solve",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{stage="solve"} 3', text)
+        self.assertEqual(latency.count(stage="solve"), 3)
+
+    def test_timer_records_elapsed(self):
+        latency = self.registry.histogram("stage_seconds", "Stage latency")
+        with Timer(latency, {"stage": "fetch"}) as timer:
+            pass
+        self.assertGreaterEqual(timer.elapsed, 0)
+        self.assertEqual(latency.count(stage="fetch"), 1)
+
+    def test_label_values_are_escaped(self):
+        self.registry.counter("errors_total").inc(reason='bad "quote"')
+        self.assertIn('errors_total{reason="bad \\"quote\\""} 1', self.registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+import pandas as pd
+from moments import annualization_factor, streaming_moments, streaming_portfolio_returns, to_float32_memmap
+
+
+class TestStreamingMoments(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.prices = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0.0005, 0.02, (1000, 4)), axis=0),
+                                   columns=['A', 'B', 'C', 'D'])
+        self.returns = self.prices.astype(np.float32).pct_change().dropna()
+
+    def test_chunked_moments_match_pandas(self):
+        mean, cov, n_obs = streaming_moments(self.prices, chunk_rows=97)
+        self.assertEqual(n_obs, len(self.returns))
+        np.testing.assert_allclose(mean, self.returns.mean().values, atol=1e-7)
+        np.testing.assert_allclose(cov, self.returns.cov().values, atol=1e-8)
+
+    def test_memmap_input_matches_frame_input(self):
+        mapped = to_float32_memmap(self.prices, chunk_rows=128)
+        weights = np.array([0.1, 0.2, 0.3, 0.4])
+        np.testing.assert_allclose(streaming_portfolio_returns(mapped, weights, chunk_rows=50),
+                                   streaming_portfolio_returns(self.prices, weights))
+
+    def test_annualization_factor(self):
+        self.assertEqual(annualization_factor('1d'), 252)
+        self.assertEqual(annualization_factor('1h'), 252 * 6.5)
+        with self.assertRaises(ValueError):
+            annualization_factor('7d')
+
+
+if __name__ == '__main__':
+    unittest.main()
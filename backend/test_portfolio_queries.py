@@ -0,0 +1,114 @@
+import time
+import threading
+import unittest
+from flask import Flask
+from sqlalchemy import event
+from models import db, User, Portfolio, PortfolioStock, ValidatedStock
+from portfolio_queries import list_portfolios, parse_portfolio_payload, save_portfolios
+
+
+class SlowStockDataService:
+    """Stub quote provider that records concurrent get_stock_info calls"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_stock_info(self, symbol):
+        with self._lock:
+            self.calls.append(symbol)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {"sector": "Technology", "current_price": 100.0, "market_cap": 1e12}
+
+
+def make_portfolio(name, symbols):
+    return parse_portfolio_payload({
+        "name": name,
+        "allocations": [{"symbol": symbol, "weight": 1 / len(symbols)} for symbol in symbols]
+    })
+
+
+class TestPortfolioQueries(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+        db.session.add(ValidatedStock(symbol="AAPL", name="Apple Inc.", industry="Technology", quality_score=90))
+        user = User(username="alice", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.stock_data_service = SlowStockDataService()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_parse_rejects_missing_allocations_and_symbols(self):
+        with self.assertRaises(ValueError):
+            parse_portfolio_payload({"name": "empty"})
+        with self.assertRaises(ValueError):
+            parse_portfolio_payload({"allocations": [{"weight": 1.0}]})
+
+    def test_save_fetches_only_unknown_symbols_once_and_concurrently(self):
+        portfolios = [
+            make_portfolio("one", ["AAPL", "MSFT", "NVDA"]),
+            make_portfolio("two", ["MSFT", "GOOG", "AMZN"])
+        ]
+        saved = save_portfolios(self.user_id, portfolios, self.stock_data_service)
+        db.session.commit()
+
+        self.assertEqual([name for _, name in saved], ["one", "two"])
+        self.assertEqual(sorted(self.stock_data_service.calls), ["AMZN", "GOOG", "MSFT", "NVDA"])
+        self.assertGreater(self.stock_data_service.max_active, 1)
+        self.assertEqual(ValidatedStock.query.count(), 5)
+        self.assertEqual(PortfolioStock.query.filter_by(portfolio_id=saved[1][0]).count(), 3)
+        self.assertEqual(ValidatedStock.query.filter_by(symbol="NVDA").one().industry, "Technology")
+
+    def test_save_inserts_holdings_and_stocks_in_one_statement_each(self):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            save_portfolios(self.user_id, [make_portfolio(f"p{i}", ["AAPL", f"S{i}"]) for i in range(20)],
+                            self.stock_data_service)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+        def inserts_into(table):
+            return [statement for statement in statements if statement.lstrip().startswith(f"INSERT INTO {table} ")]
+
+        self.assertEqual(len(inserts_into("validated_stocks")), 1)
+        self.assertEqual(len(inserts_into("portfolio_stocks")), 1)
+        self.assertEqual(PortfolioStock.query.count(), 40)
+        self.assertEqual(Portfolio.query.count(), 20)
+
+    def test_list_paginates_with_cursor(self):
+        save_portfolios(self.user_id, [make_portfolio(f"p{i}", ["AAPL"]) for i in range(5)], self.stock_data_service)
+        db.session.commit()
+
+        page, cursor = list_portfolios(self.user_id, limit=2)
+        names = [portfolio["name"] for portfolio in page]
+        while cursor is not None:
+            page, cursor = list_portfolios(self.user_id, limit=2, cursor=cursor)
+            names.extend(portfolio["name"] for portfolio in page)
+
+        self.assertEqual(names, [f"p{i}" for i in range(5)])
+        self.assertEqual(list_portfolios(self.user_id)[0][0]["stocks"][0]["name"], "Apple Inc.")
+
+
+if __name__ == '__main__':
+    unittest.main()
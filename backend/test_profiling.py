@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask, jsonify
+from profiling import RequestProfiler
+
+
+def make_app(**profiler_options):
+    app = Flask(__name__)
+    profiler = RequestProfiler(app, **profiler_options)
+
+    @app.route('/work')
+    def work():
+        return jsonify({"total": sum(i * i for i in range(10000))})
+
+    return app, profiler
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir)
+
+    def test_header_with_token_triggers_profile(self):
+        app, _ = make_app(profile_dir=self.profile_dir, sample_rate=0, top_n=5, token="secret")
+        response = app.test_client().get('/work', headers={'X-Profile': 'secret', 'X-Request-Id': 'req-1'})
+
+        body = response.get_json()
+        self.assertEqual(body["total"], sum(i * i for i in range(10000)))
+        self.assertEqual(body["profile"]["request_id"], "req-1")
+        self.assertLessEqual(len(body["profile"]["top_functions"]), 5)
+        self.assertNotIn("path", body["profile"])
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, "req-1.prof")))
+
+    def test_requests_are_not_profiled_by_default(self):
+        app, _ = make_app(profile_dir=self.profile_dir, sample_rate=0)
+        response = app.test_client().get('/work')
+        self.assertNotIn("profile", response.get_json())
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_sampling_rate_profiles_requests(self):
+        app, _ = make_app(profile_dir=self.profile_dir, sample_rate=1.0)
+        response = app.test_client().get('/work')
+        self.assertIn("profile", response.get_json())
+
+    def test_header_needs_the_token(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('PROFILE_TOKEN', None)
+            app, _ = make_app(profile_dir=self.profile_dir, sample_rate=0)
+        self.assertNotIn("profile", app.test_client().get('/work', headers={'X-Profile': '1'}).get_json())
+
+        app, _ = make_app(profile_dir=self.profile_dir, sample_rate=0, token="secret")
+        client = app.test_client()
+        self.assertNotIn("profile", client.get('/work', headers={'X-Profile': '1'}).get_json())
+        self.assertIn("profile", client.get('/work', headers={'X-Profile': 'secret'}).get_json())
+
+    def test_only_the_newest_dumps_are_kept(self):
+        app, _ = make_app(profile_dir=self.profile_dir, sample_rate=1.0, max_files=3)
+        client = app.test_client()
+        for i in range(5):
+            client.get('/work', headers={'X-Request-Id': f'req-{i}'})
+            # Distinct modification times
+            os.utime(os.path.join(self.profile_dir, f'req-{i}.prof'), (i, i))
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), ['req-2.prof', 'req-3.prof', 'req-4.prof'])
+
+
+if __name__ == '__main__':
+    unittest.main()
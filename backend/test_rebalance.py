@@ -0,0 +1,101 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import pandas as pd
+from portfolio_optimizer import PortfolioOptimizer
+from rebalance_job import rebalance_portfolios
+
+
+class FixedPriceService:
+    def __init__(self, prices):
+        self.prices = prices
+
+    def get_symbol_histories(self, symbols, period="2y"):
+        return self.prices[[symbol for symbol in symbols if symbol in self.prices.columns]]
+
+
+class TestRebalanceWeights(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = PortfolioOptimizer()
+        # The optimum is far from the current, equally weighted holdings
+        self.mu = np.array([0.08, 0.04, 0.02, 0.02])
+        self.cov = np.diag([0.04, 0.04, 0.04, 0.04])
+        self.current = np.array([0.25, 0.25, 0.25, 0.25])
+
+    def turnover(self, target):
+        return np.abs(target - self.current).sum()
+
+    def test_turnover_cap_is_respected(self):
+        for max_turnover in (0.1, 0.3):
+            target = self.optimizer.rebalance_weights(self.mu, self.cov, self.current,
+                                                      turnover_penalty=0.0, max_turnover=max_turnover)
+            self.assertAlmostEqual(target.sum(), 1.0)
+            self.assertLessEqual(self.turnover(target), max_turnover + 1e-3)
+
+    def test_penalty_reduces_turnover(self):
+        free = self.optimizer.rebalance_weights(self.mu, self.cov, self.current,
+                                                turnover_penalty=0.0, max_turnover=2.0)
+        penalized = self.optimizer.rebalance_weights(self.mu, self.cov, self.current,
+                                                     turnover_penalty=0.05, max_turnover=2.0)
+        self.assertLess(self.turnover(penalized), self.turnover(free) - 1e-3)
+
+    def test_trades_net_to_zero(self):
+        target = self.optimizer.rebalance_weights(self.mu, self.cov, self.current, max_turnover=0.4)
+        trades = self.optimizer.generate_trade_list(list("ABCD"), self.current, target, portfolio_value=10000)
+        self.assertTrue(trades)
+        self.assertAlmostEqual(sum(trade["trade_weight"] for trade in trades), 0.0, places=3)
+        self.assertAlmostEqual(sum(trade["trade_amount"] for trade in trades), 0.0, delta=10)
+        for trade in trades:
+            self.assertEqual(trade["action"], "buy" if trade["trade_weight"] > 0 else "sell")
+
+
+def portfolio(portfolio_id, weights):
+    stocks = [SimpleNamespace(stock_symbol=symbol, weight=weight) for symbol, weight in weights]
+    return SimpleNamespace(id=portfolio_id, stocks=stocks)
+
+
+class TestRebalanceJob(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.prices = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0.0005, 0.01, (300, 4)), axis=0),
+                                   columns=list("ABCD"))
+
+    def test_each_portfolio_respects_the_turnover_cap(self):
+        # D listed late: only the portfolio holding it is estimated over the shorter window
+        self.prices.loc[:199, "D"] = np.nan
+        portfolios = [portfolio(1, [("A", 0.5), ("B", 0.5)]),
+                      portfolio(2, [("B", 0.2), ("C", 0.3), ("D", 0.5)])]
+        results = rebalance_portfolios(portfolios, FixedPriceService(self.prices), PortfolioOptimizer(),
+                                       max_turnover=0.2)
+
+        self.assertEqual([result["portfolio_id"] for result in results], [1, 2])
+        for result in results:
+            self.assertLessEqual(result["turnover"], 0.2 + 1e-3)
+            self.assertAlmostEqual(sum(trade["trade_weight"] for trade in result["trades"]), 0.0, places=3)
+
+    @mock.patch("rebalance_job.db")
+    def test_nothing_is_written_without_real_prices(self, db):
+        # The provider is down and nothing is stored: no real prices at all
+        service = FixedPriceService(pd.DataFrame())
+        portfolios = [portfolio(1, [("A", 0.5), ("B", 0.5)])]
+        results = rebalance_portfolios(portfolios, service, PortfolioOptimizer(), apply=True)
+
+        self.assertEqual(results, [{"portfolio_id": 1, "error": "No historical data for: A, B"}])
+        self.assertEqual([ps.weight for ps in portfolios[0].stocks], [0.5, 0.5])
+        db.session.commit.assert_not_called()
+
+    @mock.patch("rebalance_job.db")
+    def test_only_portfolios_with_real_prices_are_applied(self, db):
+        portfolios = [portfolio(1, [("A", 0.5), ("E", 0.5)]),
+                      portfolio(2, [("A", 0.5), ("B", 0.5)])]
+        results = rebalance_portfolios(portfolios, FixedPriceService(self.prices), PortfolioOptimizer(), apply=True)
+
+        self.assertEqual(results[0], {"portfolio_id": 1, "error": "No historical data for: E"})
+        self.assertEqual([ps.weight for ps in portfolios[0].stocks], [0.5, 0.5])
+        self.assertNotEqual([ps.weight for ps in portfolios[1].stocks], [0.5, 0.5])
+        db.session.commit.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import unittest
+from gemini import GeminiService, StubGenerativeModel
+from stock_validator import StockValidator
+from recommendation_stream import recommendation_events, format_event, format_market_cap, format_price
+
+CATALOG = {
+    "Technology": [
+        {"symbol": symbol, "name": f"{symbol} Inc.", "description": "Tech", "industry": "Technology"}
+        for symbol in ("AAA", "BBB", "CCC", "DDD")
+    ]
+}
+SCORES = {"AAA": 70.0, "BBB": 90.0, "CCC": 0.0, "DDD": 80.0}
+
+
+class ScriptedValidator(StockValidator):
+    """StockValidator whose per-stock check returns fixed scores and records the order of checks"""
+
+    def __init__(self, log):
+        super().__init__(provider=object())
+        self.log = log
+
+    def _validate_single_stock(self, stock):
+        self.log.append(("validate", stock['symbol']))
+        score = SCORES[stock['symbol']]
+        if not score:
+            return {'is_valid': False, 'failure_reason': 'Low market cap', 'quality_score': 0.0}
+        return {'is_valid': True, 'quality_score': score, 'validation_metrics': {}}
+
+
+class QuoteService:
+    def __init__(self, log):
+        self.log = log
+
+    def get_stock_info(self, symbol):
+        self.log.append(("quote", symbol))
+        return {"current_price": 123.456, "market_cap": 2.5e12}
+
+
+class TestRecommendationStream(unittest.TestCase):
+    def setUp(self):
+        self.log = []
+        self.validator = ScriptedValidator(self.log)
+        self.gemini = GeminiService(None, validator=self.validator, model=StubGenerativeModel(CATALOG))
+        self.quotes = QuoteService(self.log)
+
+    def test_emits_each_stage_as_it_completes(self):
+        events = recommendation_events(["Technology"], self.gemini, self.validator, self.quotes)
+        self.assertEqual(next(events)[0], "started")
+        name, data = next(events)
+        self.assertEqual(name, "generated")
+        self.assertEqual([stock["symbol"] for stock in data["stocks"]], ["AAA", "BBB", "CCC", "DDD"])
+
+        # The first stock is streamed before the remaining candidates are validated
+        name, data = next(events)
+        self.assertEqual((name, data["stock"]["symbol"]), ("stock", "AAA"))
+        self.assertEqual(data["stock"]["current_price"], "$123.46")
+        self.assertEqual(data["stock"]["market_cap"], "$2500.0B")
+        self.assertEqual(self.log, [("validate", "AAA"), ("quote", "AAA")])
+
+        rest = list(events)
+        self.assertEqual([name for name, _ in rest], ["stock", "rejected", "stock", "done"])
+        self.assertEqual(rest[1][1], {"symbol": "CCC", "reason": "Low market cap", "elapsed": rest[1][1]["elapsed"]})
+        ranking = [stock["symbol"] for stock in rest[-1][1]["stocks"]]
+        self.assertEqual(ranking, ["BBB", "DDD", "AAA"])
+        # Each passing stock is quoted once, rejected ones never
+        self.assertEqual(sum(1 for entry in self.log if entry[0] == "quote"), 3)
+
+    def test_ends_with_an_error_when_too_few_stocks_pass(self):
+        catalog = {"Energy": [{"symbol": "CCC", "name": "C", "description": "", "industry": "Energy"}]}
+        gemini = GeminiService(None, validator=self.validator, model=StubGenerativeModel(catalog))
+        events = list(recommendation_events(["Energy"], gemini, self.validator, self.quotes))
+        self.assertEqual(events[-1][0], "failed")
+        self.assertIn("No stocks passed", events[-1][1]["error"])
+
+    def test_validate_stocks_ranks_like_the_stream(self):
+        candidates = CATALOG["Technology"]
+        ranked = self.validator.validate_stocks(candidates, max_stocks=2)
+        self.assertEqual([stock["symbol"] for stock in ranked], ["BBB", "DDD"])
+
+    def test_formatting(self):
+        self.assertEqual(format_price("12.5"), "$12.50")
+        self.assertEqual(format_price(0), "N/A")
+        self.assertEqual(format_market_cap(None), "N/A")
+        self.assertEqual(format_market_cap(5e6), "$5.0M")
+        message = format_event("stock", {"symbol": "AAA"})
+        self.assertEqual(message, 'event: stock\ndata: {"symbol": "AAA"}\n\n')
+        self.assertEqual(json.loads(message.split("data: ")[1]), {"symbol": "AAA"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from optimization_pipeline import OptimizationError, parse_optimize_request
+from resampling import resampled_max_sharpe, shutdown_pool
+
+
+class TestResampledMaxSharpe(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(7)
+        cls.returns = rng.normal(0.0005, 0.02, (300, 5))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_pool()
+
+    def test_weights_are_long_only_and_sum_to_one(self):
+        weights, stats = resampled_max_sharpe(self.returns, n_resamples=20, seed=1)
+        self.assertEqual(len(weights), 5)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        self.assertTrue((weights >= 0).all())
+        self.assertEqual(stats['n_solved'], 20)
+
+    def test_same_seed_gives_same_weights(self):
+        first, _ = resampled_max_sharpe(self.returns, n_resamples=10, seed=3)
+        second, _ = resampled_max_sharpe(self.returns, n_resamples=10, seed=3)
+        np.testing.assert_allclose(first, second, atol=1e-8)
+
+
+class TestResampleRequest(unittest.TestCase):
+    def test_n_resamples_must_be_an_integer(self):
+        stocks = [{"symbol": "A"}, {"symbol": "B"}]
+        self.assertEqual(parse_optimize_request({"stocks": stocks, "n_resamples": "20"})["n_resamples"], 20)
+        for n_resamples in ("many", None, [1]):
+            with self.assertRaises(OptimizationError) as raised:
+                parse_optimize_request({"stocks": stocks, "method": "resampled", "n_resamples": n_resamples})
+            self.assertEqual(raised.exception.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
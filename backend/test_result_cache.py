@@ -0,0 +1,95 @@
+import unittest
+from types import SimpleNamespace
+from optimization_pipeline import run_cached_optimization
+from portfolio_optimizer import PortfolioOptimizer
+from result_cache import OptimizationResultCache
+from synthetic_market import SyntheticMarket
+
+
+def make_params(stocks, investment_amount=10000, method="max_sharpe"):
+    return {
+        "stocks": [{"symbol": symbol, "name": symbol.lower()} for symbol in stocks],
+        "investment_amount": investment_amount,
+        "data_period": "2y",
+        "interval": "1d",
+        "method": method,
+        "n_resamples": 500
+    }
+
+
+RESPONSE = {
+    "allocations": [
+        {"symbol": "AAA", "weight": 0.25, "amount": 2500.0, "name": "aaa"},
+        {"symbol": "BBB", "weight": 0.75, "amount": 7500.0, "name": "bbb"}
+    ],
+    "explanation": "...",
+    "total_investment": 10000,
+    "method": "max_sharpe",
+    "risk_metrics": {"annual_return": 0.1},
+    "performance_info": {"total_time": "1.00s"}
+}
+
+
+class TestOptimizationResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = OptimizationResultCache(max_entries=2, ttl=60)
+
+    def test_key_ignores_symbol_order_but_not_data_version_or_rate(self):
+        key = self.cache.make_key(make_params(["AAA", "BBB"]), "v1", 0.04)
+        self.assertEqual(key, self.cache.make_key(make_params(["BBB", "AAA"]), "v1", 0.04))
+        self.assertNotEqual(key, self.cache.make_key(make_params(["AAA", "BBB"]), "v2", 0.04))
+        self.assertNotEqual(key, self.cache.make_key(make_params(["AAA", "BBB"], method="min_variance"), "v1", 0.04))
+        self.assertNotEqual(key, self.cache.make_key(make_params(["AAA", "BBB"]), "v1", 0.045))
+
+    def test_hit_rescales_amounts_and_follows_request_order(self):
+        key = self.cache.make_key(make_params(["AAA", "BBB"]), "v1", 0.04)
+        self.cache.put(key, RESPONSE)
+
+        params = make_params(["BBB", "AAA"], investment_amount=20000)
+        response = self.cache.build_response(self.cache.get(key), params)
+        self.assertEqual([a["symbol"] for a in response["allocations"]], ["BBB", "AAA"])
+        self.assertEqual(response["allocations"][0]["amount"], 15000.0)
+        self.assertEqual(response["total_investment"], 20000)
+        self.assertEqual(response["performance_info"]["cache"], "hit")
+
+    def test_etag_changes_with_amount(self):
+        key = self.cache.make_key(make_params(["AAA", "BBB"]), "v1", 0.04)
+        self.assertNotEqual(self.cache.make_etag(key, make_params(["AAA", "BBB"])),
+                            self.cache.make_etag(key, make_params(["AAA", "BBB"], investment_amount=5)))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for version in ("v1", "v2", "v3"):
+            self.cache.put(version, RESPONSE)
+        self.assertIsNone(self.cache.get("v1"))
+        self.assertIsNotNone(self.cache.get("v3"))
+
+
+class MockDataService:
+    """Serves synthetic fallback history, as StockDataService does while the provider is down"""
+
+    def __init__(self):
+        self.risk_free_rates = SimpleNamespace(get=lambda: (0.04, None))
+
+    def data_version(self, symbols, interval):
+        return "v1"
+
+    def get_historical_data(self, symbols, period="2y", interval="1d", latency_budget=None):
+        data = SyntheticMarket(seed=1).generate(symbols, period=period)
+        data.attrs["synthetic"] = True
+        return data
+
+
+class TestCachedOptimization(unittest.TestCase):
+    def test_synthetic_results_are_marked_and_not_cached(self):
+        cache = OptimizationResultCache(max_entries=2, ttl=60)
+        params = make_params(["AAA", "BBB"])
+        response, cache_key = run_cached_optimization(params, MockDataService(), PortfolioOptimizer(), cache)
+
+        self.assertIsNone(cache_key)
+        self.assertEqual(response["performance_info"]["data_source"], "synthetic")
+        self.assertEqual(response["performance_info"]["cache"], "bypass")
+        self.assertIsNone(cache.get(cache.make_key(params, "v1", response["risk_metrics"]["risk_free_rate"])))
+
+
+if __name__ == '__main__':
+    unittest.main()
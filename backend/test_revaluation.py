@@ -0,0 +1,160 @@
+import tempfile
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from flask import Flask
+from market_data_providers import ReplayProvider
+from models import db, User, Portfolio, PortfolioStock, ValidatedStock
+from price_store import PriceStore
+from shared_panels import SharedPanelStore
+from stock_data_service import StockDataService
+from synthetic_market import SyntheticMarket
+from revaluation_job import load_holdings, revalue_portfolios, revaluation_period
+
+DATES = pd.bdate_range('2024-01-01', periods=5)
+
+
+class FixedPriceService:
+    """Stub history source returning a fixed frame and recording each fetch"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def get_symbol_histories(self, symbols, period="2y"):
+        self.calls.append((tuple(symbols), period))
+        return self.prices[[symbol for symbol in symbols if symbol in self.prices.columns]]
+
+
+class TestRevaluation(unittest.TestCase):
+    def setUp(self):
+        self.service = FixedPriceService(pd.DataFrame({
+            "AAA": [10.0, 11.0, 12.0, 13.0, 20.0],
+            "BBB": [50.0, 50.0, 40.0, 40.0, 25.0]
+        }, index=DATES))
+
+    def test_values_every_portfolio_from_one_fetch(self):
+        holdings = [
+            (1, "Both", datetime(2024, 1, 1, 15), [("AAA", 0.5), ("BBB", 0.5)]),
+            # Bought at the close of the last bar on or before the (weekend) creation date
+            (2, "Weekend", datetime(2024, 1, 6, 9), [("AAA", 3.0), ("BBB", 1.0)]),
+            (3, "Empty", datetime(2024, 1, 1), [])
+        ]
+        revaluation = revalue_portfolios(holdings, self.service, investment_amount=1000)
+        self.assertEqual(len(self.service.calls), 1)
+        self.assertEqual(self.service.calls[0][0], ("AAA", "BBB"))
+        self.assertEqual(revaluation["as_of"], "2024-01-05")
+        self.assertEqual([p["portfolio_id"] for p in revaluation["portfolios"]], [1, 2])
+
+        both, weekend = revaluation["portfolios"]
+        # 0.5 * 20/10 + 0.5 * 25/50 = 1.25
+        self.assertAlmostEqual(both["return_since_inception"], 0.25)
+        self.assertAlmostEqual(both["current_value"], 1250)
+        self.assertAlmostEqual(both["pnl"], 250)
+        self.assertEqual(both["inception_date"], "2024-01-01")
+        current_weights = {h["symbol"]: h["current_weight"] for h in both["holdings"]}
+        self.assertAlmostEqual(current_weights["AAA"], 1.0 / 1.25)
+
+        # Weights are normalized; inception is the 2024-01-05 close, so nothing has moved
+        self.assertEqual(weekend["inception_date"], "2024-01-05")
+        self.assertAlmostEqual(weekend["return_since_inception"], 0.0)
+        self.assertAlmostEqual(weekend["holdings"][0]["current_weight"], 0.75)
+
+    def test_missing_symbols_and_early_inception_are_reported_per_portfolio(self):
+        holdings = [
+            (1, "Unknown", datetime(2024, 1, 2), [("AAA", 0.5), ("ZZZ", 0.5)]),
+            (2, "Too early", datetime(2023, 6, 1), [("AAA", 1.0)]),
+            (3, "Fine", datetime(2024, 1, 2), [("BBB", 1.0)])
+        ]
+        results = revalue_portfolios(holdings, self.service)["portfolios"]
+        self.assertIn("ZZZ", results[0]["error"])
+        self.assertIn("inception", results[1]["error"])
+        self.assertAlmostEqual(results[2]["return_since_inception"], -0.5)
+
+    def test_revaluation_period_covers_the_oldest_inception(self):
+        now = pd.Timestamp('2025-06-30')
+        self.assertEqual(revaluation_period([pd.Timestamp('2025-06-01')], now=now), '3mo')
+        self.assertEqual(revaluation_period([pd.Timestamp('2025-06-01'), pd.Timestamp('2024-01-01')], now=now), '2y')
+        self.assertEqual(revaluation_period([pd.Timestamp('2000-01-01')], now=now), 'max')
+
+
+class TestRevaluationWithStockDataService(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        fixture_dir = self.tmp_dir.name + "/fixtures"
+        self.prices = SyntheticMarket(seed=2).write_fixtures(["OLD", "NEW"], fixture_dir, period="2y")
+        # NEW listed 100 bars before the end of the recorded history
+        new_bars = pd.read_csv(fixture_dir + "/NEW.csv", index_col=0)
+        new_bars.iloc[-100:].to_csv(fixture_dir + "/NEW.csv")
+        self.provider = ReplayProvider(fixture_dir)
+        self.service = StockDataService(
+            price_store=PriceStore(self.tmp_dir.name + "/store"),
+            shared_panels=SharedPanelStore(self.tmp_dir.name + "/panels"),
+            provider=self.provider
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_late_listed_symbol_does_not_truncate_other_portfolios(self):
+        dates = self.prices.index
+        holdings = [
+            (1, "Old only", dates[-300].to_pydatetime(), [("OLD", 1.0)]),
+            (2, "Both", dates[-50].to_pydatetime(), [("OLD", 0.5), ("NEW", 0.5)]),
+            (3, "Before listing", dates[-200].to_pydatetime(), [("OLD", 0.5), ("NEW", 0.5)])
+        ]
+        old_only, both, before_listing = revalue_portfolios(holdings, self.service)["portfolios"]
+
+        self.assertEqual(old_only["inception_date"], dates[-300].strftime('%Y-%m-%d'))
+        self.assertAlmostEqual(old_only["return_since_inception"],
+                               self.prices["OLD"].iloc[-1] / self.prices["OLD"].iloc[-300] - 1, places=5)
+        self.assertEqual(both["inception_date"], dates[-50].strftime('%Y-%m-%d'))
+        self.assertIn("NEW", before_listing["error"])
+
+    def test_mock_data_is_never_valued(self):
+        def unavailable(*args, **kwargs):
+            raise ConnectionError("provider down")
+        self.provider.download = unavailable
+        holdings = [(1, "Old only", self.prices.index[-300].to_pydatetime(), [("OLD", 1.0)])]
+        revaluation = revalue_portfolios(holdings, self.service)
+        self.assertEqual(revaluation["portfolios"][0]["error"], "No price data")
+        self.assertNotIn("current_value", revaluation["portfolios"][0])
+
+
+class TestLoadHoldings(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+        db.session.add(ValidatedStock(symbol="AAA", name="A Corp."))
+        users = [User(username="alice", password_hash="x"), User(username="bob", password_hash="x")]
+        db.session.add_all(users)
+        db.session.flush()
+        for user in users:
+            portfolio = Portfolio(user_id=user.id, name=f"{user.username}'s")
+            db.session.add(portfolio)
+            db.session.flush()
+            db.session.add(PortfolioStock(portfolio_id=portfolio.id, stock_symbol="AAA", weight=1.0))
+        db.session.commit()
+        self.user_ids = [user.id for user in users]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_loads_one_user_or_everyone(self):
+        holdings = load_holdings(self.user_ids[0])
+        self.assertEqual(len(holdings), 1)
+        self.assertEqual(holdings[0][1], "alice's")
+        self.assertEqual(holdings[0][3], [("AAA", 1.0)])
+        self.assertEqual(len(load_holdings()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import time
+import unittest
+from unittest import mock
+import threading
+import numpy as np
+import pandas as pd
+from market_data_providers import MarketDataProvider, ProviderError, DEFAULT_RISK_FREE_RATE
+from risk_free_rate import RiskFreeRateService
+from portfolio_optimizer import PortfolioOptimizer
+
+
+class StubRateProvider(MarketDataProvider):
+    name = "stub"
+
+    def __init__(self, rates):
+        self.rates = list(rates)
+        self.calls = 0
+        self.fetched = threading.Event()
+
+    def risk_free_rate(self):
+        self.calls += 1
+        rate = self.rates.pop(0) if self.rates else None
+        self.fetched.set()
+        if isinstance(rate, Exception) or rate is None:
+            raise rate or RuntimeError("no rate")
+        return rate
+
+    def history(self, symbol, period="1y", interval="1d"):
+        raise ProviderError("not recorded")
+
+    def info(self, symbol):
+        raise ProviderError("not recorded")
+
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        raise ProviderError("not recorded")
+
+
+class TestRiskFreeRateService(unittest.TestCase):
+    def test_serves_default_until_refreshed_and_keeps_last_value_on_failure(self):
+        provider = StubRateProvider([0.045, RuntimeError("provider down")])
+        service = RiskFreeRateService(provider, clock=lambda: 1000.0)
+        self.assertEqual(service.get(), (DEFAULT_RISK_FREE_RATE, None))
+        self.assertEqual(provider.calls, 0)
+
+        self.assertTrue(service.refresh())
+        self.assertEqual(service.get(), (0.045, 1000.0))
+        self.assertFalse(service.refresh())
+        self.assertEqual(service.get(), (0.045, 1000.0))
+
+    def test_background_thread_refreshes_without_blocking_get(self):
+        provider = StubRateProvider([0.05])
+        service = RiskFreeRateService(provider, refresh_seconds=3600)
+        service.start()
+        service.start()
+        self.assertTrue(provider.fetched.wait(5))
+        deadline = time.time() + 5
+        while service.get()[1] is None and time.time() < deadline:
+            time.sleep(0.01)
+        service.stop()
+        self.assertEqual(service.get()[0], 0.05)
+        self.assertEqual(provider.calls, 1)
+
+    def test_forked_process_starts_its_own_thread(self):
+        service = RiskFreeRateService(StubRateProvider([]), retry_seconds=3600)
+        service.start()
+        parent_thread = service._thread
+        with mock.patch("risk_free_rate.os.getpid", return_value=-1):
+            service.start()
+            self.assertIsNot(service._thread, parent_thread)
+            child_thread = service._thread
+            service.start()
+            self.assertIs(service._thread, child_thread)
+        service.stop()
+
+    def test_optimizer_sharpe_uses_injected_rate(self):
+        service = RiskFreeRateService(StubRateProvider([0.05]))
+        service.refresh()
+        optimizer = PortfolioOptimizer(risk_free_rates=service)
+        rng = np.random.default_rng(0)
+        prices = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0.0005, 0.01, (300, 2)), axis=0), columns=["A", "B"])
+        weights = np.array([0.5, 0.5])
+
+        injected = optimizer.calculate_risk_metrics(prices, weights)
+        explicit = optimizer.calculate_risk_metrics(prices, weights, risk_free_rate=0.0)
+        self.assertEqual(injected["risk_free_rate"], 0.05)
+        self.assertAlmostEqual(explicit["sharpe_ratio"] - injected["sharpe_ratio"],
+                               0.05 / injected["annual_volatility"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from price_store import PriceStore
+from shared_panels import SharedPanelStore, period_start
+from stock_data_service import StockDataService
+
+
+def make_prices(symbols, n_days=600, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=n_days)
+    returns = rng.normal(0.0005, 0.01, size=(n_days, len(symbols)))
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=dates, columns=symbols)
+
+
+class TestSharedPanelStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SharedPanelStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_frames_are_views_into_the_mapped_panel(self):
+        prices = make_prices(["AAA", "BBB", "CCC"])
+        self.store.publish(prices)
+
+        frame = self.store.get_prices(["CCC", "AAA"], period="1y")
+        panel = self.store._load("daily")["array"]
+        self.assertEqual(list(frame.columns), ["CCC", "AAA"])
+        self.assertTrue(np.shares_memory(frame["CCC"].to_numpy(), panel))
+        self.assertGreaterEqual(frame.index[0], period_start("1y"))
+        np.testing.assert_allclose(frame["AAA"].to_numpy(), prices["AAA"].loc[frame.index].to_numpy(), rtol=1e-6)
+
+    def test_unknown_symbol_or_short_panel_is_not_served(self):
+        self.store.publish(make_prices(["AAA", "BBB"], n_days=100))
+        self.assertIsNone(self.store.get_prices(["AAA", "ZZZ"], period="3mo"))
+        self.assertIsNone(self.store.get_prices(["AAA", "BBB"], period="2y"))
+        self.assertIsNotNone(self.store.get_prices(["AAA", "BBB"], period="3mo"))
+
+    def test_rows_start_where_every_symbol_has_prices(self):
+        prices = make_prices(["AAA", "NEW"])
+        prices.iloc[:300, 1] = np.nan
+        self.store.publish(prices)
+
+        frame = self.store.get_prices(["AAA", "NEW"], period="2y")
+        self.assertEqual(frame.index[0], prices.index[300])
+        self.assertFalse(frame.isna().any().any())
+
+    def test_republish_is_picked_up_by_readers(self):
+        self.store.publish(make_prices(["AAA", "BBB"]))
+        reader = SharedPanelStore(self.tmp_dir.name)
+        before = reader.get_prices(["AAA", "BBB"], period="1y")
+
+        self.store.publish(make_prices(["AAA", "BBB", "CCC"], seed=1))
+        self.assertEqual(reader.symbols(), ["AAA", "BBB", "CCC"])
+        # Frames handed out before the swap stay readable
+        self.assertEqual(len(before), len(before.dropna()))
+
+
+class WeeklyProvider:
+    name = "weekly"
+
+    def __init__(self):
+        self.downloads = []
+
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        self.downloads.append(interval)
+        return make_prices(symbols, n_days=104).resample("W-FRI").last()
+
+
+class TestSharedPanelRouting(unittest.TestCase):
+    def test_only_daily_requests_are_served_from_the_panel(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            panels = SharedPanelStore(tmp_dir + "/panels")
+            panels.publish(make_prices(["AAA", "BBB"]))
+            provider = WeeklyProvider()
+            service = StockDataService(price_store=PriceStore(tmp_dir + "/store"), shared_panels=panels,
+                                       provider=provider)
+
+            self.assertGreater(len(service.get_historical_data(["AAA", "BBB"], period="1y")), 240)
+            self.assertEqual(provider.downloads, [])
+
+            weekly = service.get_historical_data(["AAA", "BBB"], period="1y", interval="1wk")
+            self.assertEqual(provider.downloads, ["1wk"])
+            self.assertLess(len(weekly), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
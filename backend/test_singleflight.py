@@ -0,0 +1,149 @@
+import time
+import tempfile
+import threading
+import unittest
+import numpy as np
+import pandas as pd
+from singleflight import SingleFlight
+from price_store import PriceStore
+from shared_panels import SharedPanelStore
+from stock_data_service import StockDataService
+from market_data_providers import MarketDataProvider, ProviderError
+
+
+def run_concurrently(fn, n_threads):
+    results = [None] * n_threads
+    errors = [None] * n_threads
+    barrier = threading.Barrier(n_threads)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class SlowProvider(MarketDataProvider):
+    """Local provider that counts calls and answers slowly"""
+
+    name = "slow_stub"
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.download_calls = 0
+        self.info_calls = 0
+        self._lock = threading.Lock()
+
+    def download(self, symbols, period=None, interval="1d", start=None, end=None, timeout=30):
+        with self._lock:
+            self.download_calls += 1
+        time.sleep(self.delay)
+        dates = pd.bdate_range(end="2024-06-28", periods=60)
+        return pd.DataFrame({symbol: np.linspace(100, 110, len(dates)) for symbol in sorted(symbols)}, index=dates)
+
+    def info(self, symbol):
+        with self._lock:
+            self.info_calls += 1
+        time.sleep(self.delay)
+        return {"currentPrice": 10.0, "marketCap": 1e9, "sector": "Technology"}
+
+    def history(self, symbol, period="1y", interval="1d"):
+        raise ProviderError("not recorded")
+
+    def risk_free_rate(self):
+        raise ProviderError("not recorded")
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results, errors = run_concurrently(lambda i: flight.do("key", slow), 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], ["value"] * 8)
+        self.assertEqual(sum(shared for _, shared in results), 7)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        flight = SingleFlight("test")
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("provider down")
+
+        _, errors = run_concurrently(lambda i: flight.do("key", failing), 4)
+        self.assertTrue(all(isinstance(error, RuntimeError) for error in errors))
+        self.assertEqual(flight.do("key", lambda: "recovered"), ("recovered", False))
+
+    def test_followers_stop_waiting_after_their_timeout(self):
+        flight = SingleFlight("test")
+        leader = threading.Thread(target=flight.do, args=("key", lambda: time.sleep(0.5)))
+        leader.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            flight.do("key", lambda: "unused", timeout=0.1)
+        self.assertLess(time.monotonic() - start, 0.4)
+        leader.join()
+
+
+class TestStockDataServiceCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.provider = SlowProvider()
+        self.service = StockDataService(
+            price_store=PriceStore(self.tmp_dir.name),
+            shared_panels=SharedPanelStore(self.tmp_dir.name + "/panels"),
+            provider=self.provider
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_identical_history_requests_fetch_once(self):
+        baskets = [["AAPL", "MSFT"], ["MSFT", "AAPL"]]
+        results, errors = run_concurrently(
+            lambda i: self.service.get_historical_data(baskets[i % 2], period="3mo", use_shared_panel=False), 6
+        )
+        self.assertEqual(errors, [None] * 6)
+        self.assertEqual(self.provider.download_calls, 1)
+        for i, frame in enumerate(results):
+            self.assertEqual(list(frame.columns), baskets[i % 2])
+
+    def test_follower_with_a_shorter_budget_does_not_wait_for_the_leader(self):
+        self.provider.delay = 1.0
+        leader = threading.Thread(target=self.service.get_historical_data, args=(["AAPL", "MSFT"], "3mo"),
+                                  kwargs={"use_shared_panel": False, "latency_budget": 10})
+        leader.start()
+        time.sleep(0.1)
+        start = time.monotonic()
+        data = self.service.get_historical_data(["AAPL", "MSFT"], period="3mo", use_shared_panel=False,
+                                                latency_budget=0.2)
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual(list(data.columns), ["AAPL", "MSFT"])
+        leader.join()
+        self.assertEqual(self.provider.download_calls, 1)
+
+    def test_identical_info_requests_fetch_once(self):
+        results, errors = run_concurrently(lambda i: self.service.get_stock_info("AAPL"), 5)
+        self.assertEqual(self.provider.info_calls, 1)
+        self.assertEqual({result["sector"] for result in results}, {"Technology"})
+        self.assertEqual(len({id(result) for result in results}), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from market_data_providers import ReplayProvider
+from price_store import PriceStore
+from shared_panels import SharedPanelStore
+from stock_data_service import StockDataService
+from stress_scenarios import StressScenarioEngine
+
+SCENARIOS = {
+    "crash": {"name": "Crash", "type": "historical", "start": "2020-01-01", "end": "2020-01-10",
+              "default_shock": -0.30, "version": 1},
+    "rates": {"name": "Rates", "type": "factor", "shocks": {"Finance": 0.05},
+              "default_shock": -0.10, "version": 1}
+}
+
+
+class StubDataService:
+    def __init__(self, price_store):
+        self.price_store = price_store
+        self.window_calls = 0
+
+    def get_price_window(self, symbols, start, end):
+        self.window_calls += 1
+        stored = [symbol for symbol in symbols if self.price_store.get_series(symbol) is not None]
+        return self.price_store.get_prices(stored, start, end), []
+
+
+class TestStressScenarioEngine(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        store = PriceStore(self.root_dir)
+        dates = pd.bdate_range('2020-01-01', '2020-01-10')
+        store.append(pd.DataFrame({'AAA': [100.0] * (len(dates) - 1) + [80.0],
+                                   'BBB': [50.0] * (len(dates) - 1) + [55.0]}, index=dates))
+        self.service = StubDataService(store)
+        self.engine = StressScenarioEngine(self.service, scenarios=SCENARIOS)
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def test_portfolio_returns_are_weighted_shocks(self):
+        results = self.engine.run(
+            {1: {'AAA': 0.5, 'BBB': 0.5}, 2: {'AAA': 0.5, 'CCC': 0.5}},
+            industries={'BBB': 'Finance'}
+        )
+        self.assertAlmostEqual(results[1]['crash']['return'], 0.5 * -0.20 + 0.5 * 0.10)
+        self.assertAlmostEqual(results[1]['crash']['coverage'], 1.0)
+        # CCC has no stored history, so it takes the scenario's default shock
+        self.assertAlmostEqual(results[2]['crash']['return'], 0.5 * -0.20 + 0.5 * -0.30)
+        self.assertAlmostEqual(results[2]['crash']['coverage'], 0.5)
+        self.assertAlmostEqual(results[1]['rates']['return'], 0.5 * -0.10 + 0.5 * 0.05)
+
+    def test_historical_shocks_are_cached_per_version(self):
+        self.engine.run({1: {'AAA': 1.0}})
+        self.engine.run({1: {'AAA': 1.0}})
+        self.assertEqual(self.service.window_calls, 1)
+
+        fresh_engine = StressScenarioEngine(self.service, scenarios=SCENARIOS)
+        fresh_engine.run({1: {'AAA': 1.0}})
+        self.assertEqual(self.service.window_calls, 1)
+
+    def test_fallback_shocks_are_not_cached(self):
+        self.service.get_price_window = lambda symbols, start, end: (pd.DataFrame(), list(symbols))
+        results = self.engine.run({1: {'AAA': 1.0}})
+        self.assertAlmostEqual(results[1]['crash']['return'], -0.30)
+        self.assertAlmostEqual(results[1]['crash']['coverage'], 0.0)
+
+        # Once the window can be fetched, the measured shock replaces the fallback
+        del self.service.get_price_window
+        results = StressScenarioEngine(self.service, scenarios=SCENARIOS).run({1: {'AAA': 1.0}})
+        self.assertAlmostEqual(results[1]['crash']['return'], -0.20)
+        self.assertAlmostEqual(results[1]['crash']['coverage'], 1.0)
+
+    def test_symbols_without_history_in_window_are_cached(self):
+        results = self.engine.run({1: {'CCC': 1.0}})
+        self.assertAlmostEqual(results[1]['crash']['return'], -0.30)
+        self.assertAlmostEqual(results[1]['crash']['coverage'], 0.0)
+
+        StressScenarioEngine(self.service, scenarios=SCENARIOS).run({1: {'CCC': 1.0}})
+        self.assertEqual(self.service.window_calls, 1)
+
+
+class TestScenarioWindowsWithStockDataService(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        dates = pd.bdate_range('2019-01-01', '2021-12-31')
+        rng = np.random.default_rng(3)
+        self.prices = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.01, len(dates))), index=dates)
+        self.prices.to_frame('Close').to_csv(self.tmp_dir + '/AAA.csv')
+        self.service = StockDataService(
+            price_store=PriceStore(self.tmp_dir + '/store'),
+            shared_panels=SharedPanelStore(self.tmp_dir + '/panels'),
+            provider=ReplayProvider(self.tmp_dir)
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_disjoint_windows_are_each_fetched(self):
+        scenarios = {
+            "first": {"name": "First", "type": "historical", "start": "2019-03-01", "end": "2019-04-30",
+                      "default_shock": -0.30, "version": 1},
+            "second": {"name": "Second", "type": "historical", "start": "2020-06-01", "end": "2020-07-31",
+                       "default_shock": -0.30, "version": 1}
+        }
+        engine = StressScenarioEngine(self.service, scenarios=scenarios)
+        for scenario_id, scenario in scenarios.items():
+            results = engine.run({1: {'AAA': 1.0}}, scenario_ids=[scenario_id])
+            window = self.prices.loc[scenario["start"]:scenario["end"]]
+            self.assertAlmostEqual(results[1][scenario_id]['coverage'], 1.0)
+            self.assertAlmostEqual(results[1][scenario_id]['return'], window.iloc[-1] / window.iloc[0] - 1, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
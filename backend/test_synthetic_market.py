@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from synthetic_market import SyntheticMarket
+from market_data_providers import ReplayProvider
+
+
+class TestSyntheticMarket(unittest.TestCase):
+    def setUp(self):
+        self.market = SyntheticMarket(seed=3)
+        self.end = "2024-06-28"
+
+    def test_symbol_paths_are_deterministic_and_basket_independent(self):
+        alone = self.market.generate(["AAPL"], period="1y", end=self.end)
+        basket = self.market.generate(["XOM", "AAPL", "JNJ"], period="1y", end=self.end)
+        np.testing.assert_array_equal(alone["AAPL"].to_numpy(), basket["AAPL"].to_numpy())
+        other_seed = SyntheticMarket(seed=4).generate(["AAPL"], period="1y", end=self.end)
+        self.assertFalse(np.allclose(alone["AAPL"], other_seed["AAPL"]))
+
+    def test_factor_paths_follow_the_date_grid(self):
+        later_end = (pd.Timestamp(self.end) + pd.offsets.BDay(5)).strftime("%Y-%m-%d")
+        first = self.market.generate(["AAPL"], period="1y", end=self.end)
+        shifted = self.market.generate(["AAPL"], period="1y", end=later_end)
+        self.assertFalse(np.allclose(first["AAPL"].pct_change().iloc[-20:],
+                                     shifted["AAPL"].pct_change().iloc[-20:]))
+
+    def test_periods_and_intervals_set_the_grid(self):
+        two_years = self.market.generate(["AAPL"], period="2y", end=self.end)
+        self.assertGreater(len(two_years), 500)
+        self.assertEqual(two_years.index[-1], pd.Timestamp(self.end))
+        self.assertTrue((two_years.index.dayofweek < 5).all())
+        self.assertLess(len(self.market.generate(["AAPL"], period="2y", interval="1wk", end=self.end)), 110)
+        hourly = self.market.generate(["AAPL"], period="1mo", interval="1h", end=self.end)
+        self.assertEqual(hourly.index[1] - hourly.index[0], pd.Timedelta(hours=1))
+
+    def test_factor_structure_and_fat_tails(self):
+        symbols = [f"S{i:03d}" for i in range(120)]
+        prices = self.market.generate(symbols, period="5y", end=self.end)
+        self.assertTrue((prices > 0).all().all())
+        returns = np.log(prices).diff().dropna()
+        corr = returns.corr().to_numpy()
+        sectors = np.array([self.market.sector_of(symbol) for symbol in symbols])
+        same_sector = (sectors[:, None] == sectors[None, :]) & ~np.eye(len(symbols), dtype=bool)
+        other_sector = sectors[:, None] != sectors[None, :]
+        self.assertGreater(corr[other_sector].mean(), 0.1)
+        self.assertGreater(corr[same_sector].mean(), corr[other_sector].mean() + 0.05)
+        self.assertGreater(returns.kurt().median(), 0.5)
+
+    def test_fixtures_replay_through_the_provider(self):
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            prices = self.market.write_fixtures(["AAA", "BBB"], fixture_dir, period="1y")
+            provider = ReplayProvider(fixture_dir)
+            replayed = provider.download(["AAA", "BBB"], period="1y")
+            np.testing.assert_allclose(replayed.to_numpy(), prices.loc[replayed.index].to_numpy(), rtol=1e-6)
+            self.assertGreater(provider.info("AAA")["averageVolume"], 1_000_000)
+
+
+if __name__ == '__main__':
+    unittest.main()